@@ -0,0 +1,60 @@
+"""
+runs the api layer against the local twitch api stand-in (tests/fake_twitch_api.py), with a fixed latency,
+so polling / caching changes can be compared without network access and without twitch's numbers moving around
+
+usage: python benchmarks/api_polling.py [channels, default 2000] [latency in seconds, default .02]
+"""
+import os
+import sys
+import tempfile
+import time
+from asyncio import gather, get_event_loop
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(tempfile.mkdtemp(prefix='twitchbot-bench-'))
+
+from tests.fake_twitch_api import FakeTwitchApi  # noqa: E402
+from twitchbot import StreamInfoApi, StreamPoller, close_http_session, util  # noqa: E402
+
+
+async def measure(name, api, coro):
+    requests = len(api.requests)
+    start = time.perf_counter()
+    await coro
+    seconds = time.perf_counter() - start
+    print(f'{name:>36}: {seconds:7.3f}s | {len(api.requests) - requests:5} request(s)')
+
+
+async def main():
+    channels = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else .02
+
+    api = FakeTwitchApi(latency=latency, ratelimit=10 ** 6)
+    for i in range(channels):
+        if i % 10 == 0:
+            api.start_stream(f'channel{i}', viewers=i)
+        else:
+            api.add_user(f'channel{i}')
+    api.add_followers('channel0', [f'follower{i}' for i in range(5000)])
+    print(f'{channels} channels, {latency * 1000:.0f} ms latency per request')
+
+    async with api:
+        poller = StreamPoller()
+        for i in range(channels):
+            poller.register(StreamInfoApi('client_id', f'channel{i}'))
+        await measure('stream status of every channel', api, poller.poll())
+
+        await measure('look up every channel (cold cache)', api,
+                      gather(*(util.get_user_id(f'channel{i}') for i in range(channels))))
+        await measure('look up every channel (warm cache)', api,
+                      gather(*(util.get_user_id(f'channel{i}') for i in range(channels))))
+
+        await measure('500 concurrent follower lookups', api,
+                      gather(*(util.get_user_followers('channel0') for _ in range(500))))
+        await measure('every follower of a channel', api, util.get_all_user_followers('channel0'))
+
+    await close_http_session()
+
+
+if __name__ == '__main__':
+    get_event_loop().run_until_complete(main())
@@ -0,0 +1,69 @@
+"""
+times exporting and importing 100k and 1M balances as jsonl and csv, and measures the peak memory used
+
+memory is measured with tracemalloc in a separate run of each step, since tracing slows the step down,
+the peak should stay about the same for both table sizes since rows are streamed `chunk_size` at a time
+
+usage: python benchmarks/bulk_export_import.py [working_dir]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp(prefix='twitchbot-bench-'))
+
+from twitchbot import (  # noqa: E402
+    Balance,
+    engine,
+    export_to_file,
+    import_from_file,
+    init_tables,
+)
+
+ROW_COUNTS = (100000, 1000000)
+
+
+def fill(channel: str, count: int):
+    table = Balance.__table__
+    engine.execute(table.delete().where(table.c.channel == channel))
+    for start in range(0, count, 10000):
+        engine.execute(table.insert(), [{'channel': channel, 'user': f'user{i}', 'balance': i}
+                                        for i in range(start, min(count, start + 10000))])
+
+
+def measure(func, *args, **kwargs):
+    start = time.perf_counter()
+    count = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, seconds, peak
+
+
+def main():
+    init_tables()
+    print(f'database: {engine.url.drivername}, working dir: {os.getcwd()}')
+
+    for count in ROW_COUNTS:
+        channel = f'bench_{count}'
+        fill(channel, count)
+
+        for format in ('jsonl', 'csv'):
+            path = f'balances_{count}.{format}'
+            for step, func, kwargs in (
+                    ('export', export_to_file, {'channel': channel}),
+                    ('import', import_from_file, {'channel': f'{channel}_copy', 'replace': True})):
+                rows, seconds, peak = measure(func, 'balances', path, **kwargs)
+                assert rows == count
+                print(f'{count:>8} rows | {format:>5} {step}: {seconds:7.2f}s {rows / seconds:>10,.0f} rows/s '
+                      f'| peak memory {peak / 1024 / 1024:6.2f} MiB')
+
+
+if __name__ == '__main__':
+    main()
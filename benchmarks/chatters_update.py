@@ -0,0 +1,95 @@
+"""
+measures applying a chatters api response to a channel with a large chat
+
+compares applying the response as a diff against the current chatters with rebuilding every role set
+and the union of all chatters from the response, which is how responses used to be applied
+
+usage: python benchmarks/chatters_update.py [chatters, default 50000]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from asyncio import get_event_loop
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(tempfile.mkdtemp(prefix='twitchbot-bench-'))
+
+from twitchbot import Chatters  # noqa: E402
+
+chatters_module = sys.modules['twitchbot.api.chatters']
+
+POLLS = 20
+# fraction of the chatters replaced between polls
+CHURN = .01
+ROLES = ('moderators', 'vips', 'staff', 'admins', 'global_mods', 'viewers')
+
+
+def response(chatters: int, poll: int) -> dict:
+    replaced = int(chatters * CHURN) * poll
+    viewers = [f'viewer{i}' for i in range(replaced, replaced + chatters)]
+    return {'chatter_count': chatters + 20,
+            'chatters': {'moderators': [f'mod{i}' for i in range(10)], 'vips': [f'vip{i}' for i in range(10)],
+                         'staff': [], 'admins': [], 'global_mods': [], 'viewers': viewers}}
+
+
+def rebuild(channel: str, chatters: dict):
+    sets = {role: frozenset(chatters[role]) for role in ROLES}
+    return sets, frozenset().union(*sets.values(), (channel,))
+
+
+def measure(name, make_apply, responses):
+    # timed without tracemalloc, which slows python code down a lot more than the C code building sets
+    apply = make_apply(responses[0])
+    start = time.perf_counter()
+    for json in responses[1:]:
+        apply(json)
+    seconds = time.perf_counter() - start
+
+    apply = make_apply(responses[0])
+    peak = 0
+    tracemalloc.start()
+    for json in responses[1:]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        apply(json)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    print(f'{name:>8}: {seconds / (len(responses) - 1) * 1e3:8.2f} ms/poll | peak allocation {peak / 2 ** 20:6.2f} MiB')
+
+
+def rebuilder(first):
+    def apply(json):
+        rebuild('benchmark', json['chatters'])
+
+    apply(first)
+    return apply
+
+
+def differ(first):
+    chatters = Chatters('benchmark')
+    pending = []
+
+    async def get_channel_chatters(channel):
+        return pending.pop()
+
+    def apply(json):
+        pending.append(json)
+        get_event_loop().run_until_complete(chatters.update())
+
+    chatters_module.get_channel_chatters = get_channel_chatters
+    apply(first)
+    return apply
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    responses = [response(size, poll) for poll in range(POLLS)]
+    print(f'{size} chatters, {CHURN:.0%} replaced between polls')
+
+    measure('rebuild', rebuilder, responses)
+    measure('diff', differ, responses)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+measures the per call cost of the database lookups that run for most chat messages
+
+each function is called with a mix of existing and missing rows, using the long lived session of the sync functions
+
+usage: python benchmarks/db_lookups.py [calls per function, default 20000]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(tempfile.mkdtemp(prefix='twitchbot-bench-'))
+
+from twitchbot import (  # noqa: E402
+    CustomCommand,
+    Quote,
+    add_custom_command,
+    add_quote,
+    custom_command_exist,
+    get_custom_command,
+    get_message_timer,
+    init_tables,
+    message_timer_exist,
+    quote_exist,
+    session,
+    set_balance,
+    set_message_timer,
+    balance_ledger,
+)
+from twitchbot.database.balance_ledger import _load_balance  # noqa: E402
+
+CHANNEL = 'benchmark'
+ROWS = 1000
+
+
+def prepare():
+    init_tables()
+    for i in range(ROWS):
+        add_custom_command(CustomCommand.create(CHANNEL, f'cmd{i}', 'response'))
+        add_quote(Quote.create(CHANNEL, 'quote', alias=f'quote{i}'))
+        set_message_timer(CHANNEL, f'timer{i}', 'message', 60)
+        set_balance(CHANNEL, f'user{i}', i)
+    balance_ledger.flush()
+
+
+LOOKUPS = {
+    'get_custom_command': lambda i: get_custom_command(CHANNEL, f'cmd{i}'),
+    'custom_command_exist': lambda i: custom_command_exist(CHANNEL, f'cmd{i}'),
+    'get_message_timer': lambda i: get_message_timer(CHANNEL, f'timer{i}'),
+    'message_timer_exist': lambda i: message_timer_exist(CHANNEL, f'timer{i}'),
+    'quote_exist (alias)': lambda i: quote_exist(CHANNEL, alias=f'quote{i}'),
+    'quote_exist (id)': lambda i: quote_exist(CHANNEL, id=i),
+    'load balance': lambda i: _load_balance(session, CHANNEL, f'user{i}'),
+}
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    prepare()
+
+    for name, lookup in LOOKUPS.items():
+        # a quarter of the lookups are for rows that do not exist
+        keys = [i % (ROWS + ROWS // 3) for i in range(calls)]
+        start = time.perf_counter()
+        for i in keys:
+            lookup(i)
+        seconds = time.perf_counter() - start
+        print(f'{name:>22}: {seconds / calls * 1e6:8.1f} us/call')
+
+
+if __name__ == '__main__':
+    main()
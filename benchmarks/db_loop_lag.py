@@ -0,0 +1,78 @@
+"""
+measures how much event loop lag the database functions cause while the bot is flooded with custom commands
+
+compares the sync functions (query on the event loop) with the *_async functions (query on the database executor)
+
+usage: python benchmarks/db_loop_lag.py [messages] [concurrency]
+"""
+import os
+import sys
+import tempfile
+from asyncio import gather, get_event_loop, ensure_future, sleep
+
+# the bot's config and database files are created in the working directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(tempfile.mkdtemp(prefix='twitchbot-bench-'))
+
+from twitchbot import (  # noqa: E402
+    CustomCommand,
+    add_custom_command,
+    get_custom_command,
+    get_custom_command_async,
+    init_tables,
+    measure_loop_lag,
+    metrics,
+)
+
+CHANNEL = 'benchmark'
+COMMAND_COUNT = 500
+
+
+async def flood_sync(messages: int, concurrency: int):
+    async def worker(offset):
+        for i in range(offset, messages, concurrency):
+            get_custom_command(CHANNEL, f'cmd{i % COMMAND_COUNT}')
+            await sleep(0)
+
+    await gather(*(worker(i) for i in range(concurrency)))
+
+
+async def flood_async(messages: int, concurrency: int):
+    async def worker(offset):
+        for i in range(offset, messages, concurrency):
+            await get_custom_command_async(CHANNEL, f'cmd{i % COMMAND_COUNT}')
+
+    await gather(*(worker(i) for i in range(concurrency)))
+
+
+async def run(name: str, flood, messages: int, concurrency: int):
+    metrics.reset()
+    loop = get_event_loop()
+    monitor = ensure_future(measure_loop_lag(interval=.01))
+    start = loop.time()
+    await flood(messages, concurrency)
+    elapsed = loop.time() - start
+    monitor.cancel()
+
+    lag = metrics.histogram('loop.lag')
+    print(f'{name:>6}: {messages / elapsed:8.0f} msg/s | loop lag ms '
+          f'p50 {lag.percentile(50) * 1000:7.2f}  p99 {lag.percentile(99) * 1000:7.2f}  '
+          f'max {max(lag.values, default=0) * 1000:7.2f}  ({lag.count} samples)')
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    init_tables()
+    for i in range(COMMAND_COUNT):
+        add_custom_command(CustomCommand.create(CHANNEL, f'cmd{i}', f'response {i}'))
+
+    print(f'{messages} custom command lookups, {concurrency} concurrent senders, working dir: {os.getcwd()}')
+    loop = get_event_loop()
+    loop.run_until_complete(run('sync', flood_sync, messages, concurrency))
+    loop.run_until_complete(run('async', flood_async, messages, concurrency))
+
+
+if __name__ == '__main__':
+    main()
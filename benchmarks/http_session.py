@@ -0,0 +1,78 @@
+"""
+compares a new ClientSession per request (how get_url() used to work) with the shared http session,
+against a local stand-in http server that counts the tcp connections it accepts
+
+a local server has no DNS lookup or TLS handshake, so against api.twitch.tv the difference per new connection is larger
+
+usage: python benchmarks/http_session.py [requests] [concurrency]
+"""
+import os
+import sys
+import tempfile
+import time
+from asyncio import gather, get_event_loop
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(tempfile.mkdtemp(prefix='twitchbot-bench-'))
+
+from aiohttp import ClientSession, web  # noqa: E402
+
+from twitchbot import close_http_session, get_url  # noqa: E402
+
+peers = set()
+
+
+async def handle(request: web.Request):
+    peers.add(request.transport.get_extra_info('peername'))
+    return web.json_response({'data': [{'id': '1', 'login': 'stand_in'}]})
+
+
+async def get_url_new_session(url: str, headers: dict):
+    async with ClientSession(headers=headers) as session:
+        async with session.get(url) as resp:
+            return resp, await resp.json()
+
+
+async def run(name: str, get, url: str, requests: int, concurrency: int):
+    peers.clear()
+    latencies = []
+
+    async def worker(count):
+        for _ in range(count):
+            start = time.perf_counter()
+            await get(url, {'Client-ID': 'benchmark'})
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    print(f'{name:>14}: {len(latencies) / total:7.0f} req/s | '
+          f'p50 {latencies[len(latencies) // 2] * 1000:6.2f}ms | '
+          f'p99 {latencies[int(len(latencies) * .99)] * 1000:6.2f}ms | '
+          f'{len(peers)} connections')
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    app = web.Application()
+    app.router.add_get('/helix/users', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f'http://127.0.0.1:{port}/helix/users?login=stand_in'
+
+    await run('new session', get_url_new_session, url, requests, concurrency)
+    await run('shared session', get_url, url, requests, concurrency)
+
+    await close_http_session()
+    await runner.cleanup()
+
+
+if __name__ == '__main__':
+    get_event_loop().run_until_complete(main())
@@ -0,0 +1,77 @@
+"""
+times one loyalty ticker tick for channels with 1k, 10k and 100k viewers
+
+compares giving points one viewer at a time (how the ticker used to work, without its .2 second sleeps)
+with the set based upsert the ticker uses now, half of the viewers already have a balance before each tick
+
+the database configured in mysql.json of the working directory is used, so to benchmark MySQL run this from a folder
+whose configs/mysql.json is enabled, otherwise a temporary sqlite database is used
+
+usage: python benchmarks/loyalty_upsert.py [working_dir] [max viewers for the per viewer run, default 10000]
+"""
+import os
+import sys
+import tempfile
+import time
+from asyncio import get_event_loop
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.chdir(sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp(prefix='twitchbot-bench-'))
+
+from twitchbot import (  # noqa: E402
+    Balance,
+    add_balance_to_users_async,
+    balance_ledger,
+    cfg,
+    engine,
+    init_tables,
+    session_scope,
+)
+
+VIEWER_COUNTS = (1000, 10000, 100000)
+
+
+def prepare(channel: str, viewers):
+    with session_scope() as s:
+        s.query(Balance).filter(Balance.channel == channel).delete(synchronize_session=False)
+        s.bulk_insert_mappings(Balance, [{'channel': channel, 'user': user, 'balance': 0} for user in viewers[::2]])
+    balance_ledger.forget(channel)
+
+
+def per_viewer_tick(channel: str, viewers):
+    with session_scope() as s:
+        for viewer in viewers:
+            bal = s.query(Balance).filter(Balance.channel == channel, Balance.user == viewer).one_or_none()
+            if bal is None:
+                bal = Balance.create(channel, viewer)
+                s.add(bal)
+            bal.balance += cfg.loyalty_amount
+
+
+def main():
+    max_per_viewer = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    init_tables()
+    loop = get_event_loop()
+    print(f'database: {engine.url.drivername}, working dir: {os.getcwd()}')
+
+    for count in VIEWER_COUNTS:
+        channel = f'bench_{count}'
+        viewers = [f'viewer{i}' for i in range(count)]
+
+        if count <= max_per_viewer:
+            prepare(channel, viewers)
+            start = time.perf_counter()
+            per_viewer_tick(channel, viewers)
+            print(f'{count:>7} viewers | per viewer: {time.perf_counter() - start:8.3f}s')
+
+        prepare(channel, viewers)
+        start = time.perf_counter()
+        loop.run_until_complete(add_balance_to_users_async(channel, viewers, cfg.loyalty_amount))
+        print(f'{count:>7} viewers |     upsert: {time.perf_counter() - start:8.3f}s')
+
+        with session_scope() as s:
+            assert s.query(Balance).filter(Balance.channel == channel).count() == count
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+from asyncio import get_event_loop
+
+__all__ = ('run',)
+
+
+def run(coro):
+    """runs the coroutine on the event loop shared by the tests until it is done, returns its result"""
+    return get_event_loop().run_until_complete(coro)
@@ -0,0 +1,108 @@
+import asyncio
+from asyncio import StreamReader, StreamWriter
+from typing import List, Set
+
+__all__ = ['FakeIrcServer', 'FakeIrcClient', 'wait_until']
+
+
+class FakeIrcClient:
+    def __init__(self, writer: StreamWriter):
+        self.writer: StreamWriter = writer
+        self.nick: str = ''
+        self.lines: List[str] = []
+        self.channels: Set[str] = set()
+
+    def send(self, line: str):
+        self.writer.write(f'{line}\r\n'.encode())
+
+    def sent(self, command: str) -> List[str]:
+        """all lines this client sent to the server that start with `command`"""
+        return [line for line in self.lines if line.startswith(command)]
+
+
+class FakeIrcServer:
+    """
+    minimal local stand-in for twitch's irc server,
+    accepts any PASS / NICK, acknowledges CAP REQs, echos JOIN / PART and answers PINGs
+
+    JOINs for channels in `ignored_joins` are silently dropped, like twitch does when the join ratelimit is exceeded,
+    setting `answer_pings` to False simulates a half-open connection
+    """
+
+    def __init__(self):
+        self.clients: List[FakeIrcClient] = []
+        self.ignored_joins: Set[str] = set()
+        self.answer_pings: bool = True
+        self.server = None
+        self.port: int = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_client, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        for client in self.clients:
+            client.writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def connect(self):
+        """connection factory for IrcPool"""
+        return await asyncio.open_connection('127.0.0.1', self.port)
+
+    def disconnect(self, client: FakeIrcClient):
+        """closes the socket of the client, like twitch does when it restarts a server"""
+        client.channels.clear()
+        client.writer.close()
+
+    def clients_in(self, channel: str) -> List[FakeIrcClient]:
+        return [client for client in self.clients if channel in client.channels]
+
+    def send_privmsg(self, channel: str, user: str, content: str):
+        for client in self.clients_in(channel):
+            client.send(f'@badges= :{user}!{user}@{user}.tmi.twitch.tv PRIVMSG #{channel} :{content}')
+
+    async def _handle_client(self, reader: StreamReader, writer: StreamWriter):
+        client = FakeIrcClient(writer)
+        self.clients.append(client)
+
+        while True:
+            line = (await reader.readline()).decode().strip()
+            if not line:
+                if reader.at_eof():
+                    return
+                continue
+
+            client.lines.append(line)
+            command, _, params = line.partition(' ')
+
+            if command == 'NICK':
+                client.nick = params
+                client.send(f':tmi.twitch.tv 001 {client.nick} :Welcome, GLHF!')
+            elif command == 'CAP':
+                client.send(f':tmi.twitch.tv CAP * ACK {params[4:]}')
+            elif command in ('JOIN', 'PART'):
+                for channel in params.split(','):
+                    channel = channel.strip().lstrip('#')
+                    if command == 'JOIN' and channel in self.ignored_joins:
+                        continue
+                    if command == 'JOIN':
+                        client.channels.add(channel)
+                    else:
+                        client.channels.discard(channel)
+                    client.send(f':{client.nick}!{client.nick}@{client.nick}.tmi.twitch.tv {command} #{channel}')
+            elif command == 'PING' and self.answer_pings:
+                client.send(f':tmi.twitch.tv PONG tmi.twitch.tv {params}')
+            elif command == 'QUIT':
+                writer.close()
+                return
+
+
+async def wait_until(predicate, timeout=2.0):
+    """polls `predicate` until it returns True, fails the test if it does not within `timeout` seconds"""
+    loop = asyncio.get_event_loop()
+    end = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < end, 'timed out waiting for condition'
+        await asyncio.sleep(.01)
@@ -0,0 +1,297 @@
+"""
+local stand-in for the twitch http apis the bot uses: helix, the tmi chatters endpoint and the global emote api
+
+can also be run on its own, to serve fixtures to a bot pointed at it (see the twitch_api_url / tmi_api_url /
+emote_api_url config keys), or to record the responses of the real apis into a fixtures file:
+
+    python -m tests.fake_twitch_api [--fixtures FILE] [--port PORT] [--latency SECONDS] [--error-rate RATE]
+    python -m tests.fake_twitch_api --record FILE [--port PORT]
+"""
+import argparse
+import json
+import time
+from asyncio import get_event_loop, sleep
+from random import Random
+from typing import Dict, List, Optional, Union
+
+from aiohttp import ClientSession, web
+
+from twitchbot.util import twitch_api_util
+
+__all__ = ['FakeTwitchApi']
+
+# path prefix -> the api the request is recorded from
+UPSTREAMS = {
+    '/helix/': twitch_api_util.TWITCH_API_BASE_URL,
+    '/kraken/': twitch_api_util.TWITCH_API_BASE_URL,
+    '/group/': twitch_api_util.TMI_API_BASE_URL,
+    '/emotes/': twitch_api_util.EMOTE_API_BASE_URL,
+}
+
+
+class FakeTwitchApi:
+    """
+    serves helix / tmi / emote api responses from local state, so the api layer can be tested and benchmarked
+    without network access, every host is served by the same server (emote api urls start with /emotes)
+
+    - `responses` holds recorded responses (`'GET /path?query'` -> status and json), they are served as is,
+      everything else is answered from `users`, `streams`, `follows`, `chatters` and `global_emotes`
+    - `latency` (+ up to `latency_jitter`) seconds are waited before every response
+    - `error_rate` of the responses are a 500
+    - helix responses have Ratelimit-* headers, `ratelimit` requests are allowed per `ratelimit_window` seconds,
+      requests past that get a 429
+    - if `record` is True, requests without a recorded response are sent to the real apis and their responses
+      recorded, `save()` writes them to a fixtures file
+
+    random latency / errors come from `seed`, so a run can be repeated exactly
+    """
+
+    def __init__(self, fixtures: Union[str, dict] = None, latency: float = 0, latency_jitter: float = 0,
+                 error_rate: float = 0, ratelimit: int = 800, ratelimit_window: float = 60, record: bool = False,
+                 seed: int = 0):
+        self.latency: float = latency
+        self.latency_jitter: float = latency_jitter
+        self.error_rate: float = error_rate
+        self.ratelimit: int = ratelimit
+        self.ratelimit_window: float = ratelimit_window
+        self.record: bool = record
+        self.random: Random = Random(seed)
+
+        self.responses: Dict[str, dict] = {}
+        # login -> helix user
+        self.users: Dict[str, dict] = {}
+        # login -> helix stream, for the channels that are live
+        self.streams: Dict[str, dict] = {}
+        # user id -> helix follows of the user, newest first
+        self.follows: Dict[str, List[dict]] = {}
+        # channel -> tmi chatters response
+        self.chatters: Dict[str, dict] = {}
+        self.global_emotes: List[dict] = []
+        # 'GET /path?query' of every request received
+        self.requests: List[str] = []
+
+        self.remaining: int = ratelimit
+        self.reset: float = 0
+        self.port: int = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._previous_urls: Optional[Dict[str, str]] = None
+
+        if fixtures is not None:
+            self.load(fixtures)
+
+    # region state
+
+    def load(self, fixtures: Union[str, dict]):
+        """loads recorded responses / state from a fixtures file (or its already parsed contents)"""
+        if isinstance(fixtures, str):
+            with open(fixtures, encoding='utf-8') as file:
+                fixtures = json.load(file)
+
+        self.responses.update(fixtures.get('responses', {}))
+        self.users.update(fixtures.get('users', {}))
+        self.streams.update(fixtures.get('streams', {}))
+        self.follows.update(fixtures.get('follows', {}))
+        self.chatters.update(fixtures.get('chatters', {}))
+        self.global_emotes.extend(fixtures.get('global_emotes', ()))
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'responses': self.responses, 'users': self.users, 'streams': self.streams,
+                       'follows': self.follows, 'chatters': self.chatters, 'global_emotes': self.global_emotes},
+                      file, indent=2)
+
+    def add_user(self, login: str, **fields) -> dict:
+        login = login.lower()
+        user = self.users[login] = {
+            'id': str(len(self.users) + 1), 'login': login, 'display_name': login, 'type': '', 'broadcaster_type': '',
+            'description': '', 'profile_image_url': '', 'offline_image_url': '', 'view_count': 0,
+            'created_at': '2015-05-01T12:00:00Z', **fields,
+        }
+        return user
+
+    def start_stream(self, login: str, viewers: int = 0, title: str = '', **fields) -> dict:
+        login = login.lower()
+        user = self.users.get(login) or self.add_user(login)
+        stream = self.streams[login] = {
+            'id': str(len(self.streams) + 1), 'user_id': user['id'], 'user_login': login, 'user_name': login,
+            'game_id': '0', 'type': 'live', 'title': title, 'viewer_count': viewers,
+            'started_at': '2020-05-17T16:47:46Z', 'language': 'en', 'tag_ids': [], **fields,
+        }
+        return stream
+
+    def end_stream(self, login: str):
+        self.streams.pop(login.lower(), None)
+
+    def add_followers(self, login: str, followers: List[str]):
+        user = self.users.get(login.lower()) or self.add_user(login)
+        follows = self.follows.setdefault(user['id'], [])
+        for follower in followers:
+            follower = self.users.get(follower.lower()) or self.add_user(follower)
+            follows.insert(0, {'from_id': follower['id'], 'from_login': follower['login'],
+                               'from_name': follower['display_name'], 'to_id': user['id'],
+                               'to_login': user['login'], 'to_name': user['display_name'],
+                               'followed_at': '2020-05-17T16:47:46Z'})
+
+    def set_chatters(self, channel: str, viewers: List[str] = (), moderators: List[str] = (), vips: List[str] = ()):
+        groups = {'broadcaster': [channel], 'vips': list(vips), 'moderators': list(moderators), 'staff': [],
+                  'admins': [], 'global_mods': [], 'viewers': list(viewers)}
+        self.chatters[channel.lower()] = {'_links': {}, 'chatter_count': sum(map(len, groups.values())),
+                                          'chatters': groups}
+
+    def set_global_emotes(self, codes: List[str]):
+        self.global_emotes = [{'code': code, 'emoticon_set': 0, 'id': i} for i, code in enumerate(codes, 1)]
+
+    # endregion
+
+    # region server
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    @property
+    def urls(self) -> Dict[str, str]:
+        """the base urls to pass to set_api_base_urls() to send the bot's requests here"""
+        return {'twitch': self.url, 'tmi': self.url, 'emotes': f'{self.url}/emotes'}
+
+    async def start(self, port: int = 0) -> 'FakeTwitchApi':
+        app = web.Application()
+        app.router.add_route('GET', '/{path:.*}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', port).start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> 'FakeTwitchApi':
+        """starts the server and points the api helpers at it until the block exits"""
+        await self.start()
+        self._previous_urls = twitch_api_util.get_api_base_urls()
+        twitch_api_util.set_api_base_urls(**self.urls)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        twitch_api_util.set_api_base_urls(**self._previous_urls)
+        await self.close()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        key = f'{request.method} {request.path_qs}'
+        self.requests.append(key)
+
+        if self.latency or self.latency_jitter:
+            await sleep(self.latency + self.random.uniform(0, self.latency_jitter))
+
+        headers = {}
+        if request.path.startswith('/helix/'):
+            headers = self._take_ratelimit()
+            if headers['Ratelimit-Remaining'] == '-1':
+                headers['Ratelimit-Remaining'] = '0'
+                return web.json_response({'error': 'Too Many Requests', 'status': 429, 'message': ''},
+                                         status=429, headers=headers)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            return web.json_response({'error': 'Internal Server Error', 'status': 500, 'message': ''},
+                                     status=500, headers=headers)
+
+        if key not in self.responses and self.record:
+            self.responses[key] = await self._fetch_upstream(request)
+
+        if key in self.responses:
+            response = self.responses[key]
+            return web.json_response(response['json'], status=response.get('status', 200), headers=headers)
+
+        status, body = self._route(request)
+        return web.json_response(body, status=status, headers=headers)
+
+    def _take_ratelimit(self) -> Dict[str, str]:
+        now = time.time()
+        if now >= self.reset:
+            self.remaining, self.reset = self.ratelimit, now + self.ratelimit_window
+        self.remaining -= 1
+        return {'Ratelimit-Limit': str(self.ratelimit), 'Ratelimit-Remaining': str(max(-1, self.remaining)),
+                'Ratelimit-Reset': str(int(self.reset + .999))}
+
+    async def _fetch_upstream(self, request: web.Request) -> dict:
+        prefix = next(prefix for prefix in UPSTREAMS if request.path.startswith(prefix))
+        path = request.path_qs[len('/emotes'):] if prefix == '/emotes/' else request.path_qs
+        headers = {key: value for key, value in request.headers.items() if key in ('Client-ID', 'Authorization')}
+        async with ClientSession() as session:
+            async with session.get(f'{UPSTREAMS[prefix]}{path}', headers=headers) as resp:
+                return {'status': resp.status, 'json': await resp.json(content_type=None)}
+
+    # endregion
+
+    # region routes
+
+    def _route(self, request: web.Request):
+        path, query = request.path, request.query
+        if path == '/helix/users':
+            logins = [login.lower() for login in query.getall('login', ())]
+            return 200, {'data': [self.users[login] for login in logins if login in self.users]}
+
+        if path == '/helix/streams':
+            logins = [login.lower() for login in query.getall('user_login', ())]
+            return 200, {'data': [self.streams[login] for login in logins if login in self.streams],
+                         'pagination': {}}
+
+        if path == '/helix/users/follows':
+            return self._follows(query.get('to_id', ''), int(query.get('first', 20)), int(query.get('after', 0)))
+
+        if path.startswith('/group/user/') and path.endswith('/chatters'):
+            channel = path[len('/group/user/'):-len('/chatters')].lower()
+            if channel not in self.chatters:
+                self.set_chatters(channel)
+            return 200, self.chatters[channel]
+
+        if path == '/emotes/channels/0':
+            return 200, {'channel_name': None, 'channel_id': '0', 'emotes': self.global_emotes}
+
+        return 404, {'error': 'Not Found', 'status': 404, 'message': ''}
+
+    def _follows(self, to_id: str, first: int, after: int):
+        if to_id not in self.follows and to_id not in {user['id'] for user in self.users.values()}:
+            return 400, {'error': 'Bad Request', 'status': 400, 'message': 'Invalid to_id'}
+
+        follows = self.follows.get(to_id, [])
+        page = follows[after:after + first]
+        pagination = {'cursor': str(after + first)} if after + first < len(follows) else {}
+        return 200, {'total': len(follows), 'data': page, 'pagination': pagination}
+
+    # endregion
+
+
+def main():
+    parser = argparse.ArgumentParser(description='local stand-in for the twitch apis the bot uses')
+    parser.add_argument('--fixtures', help='fixtures file to serve')
+    parser.add_argument('--record', help='send requests to the real apis and record the responses to this file')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help='seconds waited before every response')
+    parser.add_argument('--latency-jitter', type=float, default=0, help='up to this many extra seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of responses that are a 500')
+    parser.add_argument('--ratelimit', type=int, default=800, help='helix requests allowed per minute')
+    args = parser.parse_args()
+
+    api = FakeTwitchApi(args.fixtures, latency=args.latency, latency_jitter=args.latency_jitter,
+                        error_rate=args.error_rate, ratelimit=args.ratelimit, record=bool(args.record))
+    loop = get_event_loop()
+    loop.run_until_complete(api.start(args.port))
+    print(f'serving on {api.url}, set the config keys: twitch_api_url={api.url} tmi_api_url={api.url} '
+          f'emote_api_url={api.url}/emotes')
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.record:
+            api.save(args.record)
+            print(f'recorded {len(api.responses)} response(s) to {args.record}')
+        loop.run_until_complete(api.close())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import sys
+from asyncio import TimeoutError, get_event_loop, sleep, wait_for
+
+import pytest
+
+from tests.async_util import run
+from twitchbot import Channel, ChatterPollScheduler, StreamPoller
+
+channel_module = sys.modules['twitchbot.channel']
+
+
+class FakeChannel:
+    def __init__(self, name, live=False):
+        self.name = name
+        self.live = live
+
+
+def test_interval_adapts_to_activity():
+    scheduler = ChatterPollScheduler(interval=60, idle_interval=300, busy_interval=30, busy_chat_rate=30, jitter=0)
+    scheduler.register(FakeChannel('offline'))
+    scheduler.register(FakeChannel('live', live=True))
+    offline, live = scheduler.polls['offline'], scheduler.polls['live']
+    now = live.last_poll + 60
+
+    assert scheduler.next_interval(offline, now) == 300
+    assert scheduler.next_interval(live, now) == 60
+
+    for _ in range(10):
+        scheduler.record_message('offline')
+    assert scheduler.next_interval(offline, now) == 60
+
+    for _ in range(40):
+        scheduler.record_message('live')
+    assert scheduler.next_interval(live, now) == 30
+
+
+def test_first_polls_are_spread_over_the_interval():
+    scheduler = ChatterPollScheduler(interval=60)
+    now = get_event_loop().time()
+    for i in range(200):
+        scheduler.register(FakeChannel(f'channel{i}'))
+
+    due = sorted(poll.due - now for poll in scheduler.polls.values())
+    assert 0 <= due[0] < 10 and 50 < due[-1] <= 61
+
+
+def test_polls_repeat_with_limited_concurrency(monkeypatch):
+    monkeypatch.setattr(sys.modules['twitchbot.chatter_scheduler'], 'get_client_id', lambda: 'client_id')
+    scheduler = ChatterPollScheduler(interval=.05, idle_interval=.05, busy_interval=.05, max_concurrent=2)
+    polls, running, most_running = [], [0], [0]
+
+    class PolledChannel(FakeChannel):
+        async def update_chatters(self):
+            polls.append(self.name)
+            running[0] += 1
+            most_running[0] = max(most_running[0], running[0])
+            await sleep(.01)
+            running[0] -= 1
+
+    for i in range(6):
+        scheduler.register(PolledChannel(f'channel{i}'))
+
+    try:
+        run(wait_for(scheduler.run(), .3))
+    except TimeoutError:
+        pass
+
+    assert set(polls) == {f'channel{i}' for i in range(6)}
+    assert len(polls) > 6
+    assert most_running[0] <= 2
+
+
+def test_deprecated_update_loop_registers_the_channel(monkeypatch):
+    monkeypatch.setattr(channel_module, 'chatter_poller', ChatterPollScheduler())
+    monkeypatch.setattr(channel_module, 'stream_poller', StreamPoller())
+    channel = Channel('Deprecated_Loop', irc=None, register_globally=False)
+
+    with pytest.warns(DeprecationWarning):
+        run(channel.update_loop())
+    poll = channel_module.chatter_poller.polls['deprecated_loop']
+    assert 'deprecated_loop' in channel_module.stream_poller.apis
+
+    # already registered, the scheduled poll is kept
+    with pytest.warns(DeprecationWarning):
+        run(channel.update_loop())
+    assert channel_module.chatter_poller.polls['deprecated_loop'] is poll
@@ -0,0 +1,70 @@
+import sys
+
+from tests.async_util import run
+from twitchbot import Chatters
+
+chatters_module = sys.modules['twitchbot.api.chatters']
+
+
+def response(moderators=(), vips=(), viewers=()):
+    return {'chatter_count': len(moderators) + len(vips) + len(viewers),
+            'chatters': {'moderators': list(moderators), 'vips': list(vips), 'staff': [], 'admins': [],
+                         'global_mods': [], 'viewers': list(viewers)}}
+
+
+def test_joins_and_parts_update_membership():
+    chatters = Chatters('Channel')
+    assert 'channel' in chatters and len(chatters) == 1
+
+    chatters.join('Alice')
+    assert 'alice' in chatters and 'alice' in chatters.viewers and chatters.role('ALICE') == 'viewers'
+
+    chatters.part('alice')
+    assert 'alice' not in chatters and not chatters.viewers
+    # the broadcaster is always in chat
+    chatters.part('channel')
+    assert 'channel' in chatters
+
+
+def test_responses_are_applied_as_a_diff(monkeypatch):
+    responses = [response(moderators=['mod'], viewers=['alice', 'bob']),
+                 response(moderators=['mod', 'bob'], viewers=['carl'])]
+
+    async def get_channel_chatters(channel):
+        return responses.pop(0)
+
+    monkeypatch.setattr(chatters_module, 'get_channel_chatters', get_channel_chatters)
+    chatters = Chatters('channel')
+    assert run(chatters.update())
+    assert chatters.all_viewers == {'channel', 'mod', 'alice', 'bob'}
+    all_viewers, viewers = chatters.all_viewers, chatters._viewers
+
+    # dave joins after the next response was made, so it does not include him yet
+    async def join_during_request(channel):
+        chatters.join('dave')
+        return await get_channel_chatters(channel)
+
+    monkeypatch.setattr(chatters_module, 'get_channel_chatters', join_during_request)
+    assert run(chatters.update())
+    assert chatters.all_viewers == {'channel', 'mod', 'bob', 'carl', 'dave'}
+    assert chatters.mods == {'mod', 'bob'} and chatters.viewers == {'carl', 'dave'}
+    # the role sets are updated in place instead of being rebuilt
+    assert chatters._viewers is viewers
+    # snapshots taken before the update are not changed by it
+    assert all_viewers == {'channel', 'mod', 'alice', 'bob'}
+
+
+def test_snapshots_can_be_iterated_while_users_join_and_part():
+    chatters = Chatters('channel')
+    chatters.join('alice')
+    all_viewers, viewers = chatters.all_viewers, chatters.viewers
+    assert isinstance(all_viewers, frozenset) and isinstance(viewers, frozenset)
+    # unchanged chatters reuse the same snapshot
+    assert chatters.all_viewers is all_viewers
+
+    for user in all_viewers:
+        chatters.join(f'{user}_friend')
+        chatters.part('alice')
+
+    assert all_viewers == {'channel', 'alice'} and viewers == {'alice'}
+    assert chatters.all_viewers == {'channel', 'channel_friend', 'alice_friend'}
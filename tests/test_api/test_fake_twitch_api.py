@@ -0,0 +1,113 @@
+import os
+from asyncio import gather
+from datetime import datetime
+
+from tests.async_util import run
+from tests.fake_twitch_api import FakeTwitchApi
+from twitchbot import Chatters, HelixScheduler, StreamInfoApi, StreamPoller, metrics, util
+from twitchbot.emote import get_global_emotes, update_global_emotes
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'fixtures', 'twitch_api.json')
+
+
+def test_api_helpers_against_the_stand_in(tmp_path):
+    api = FakeTwitchApi()
+    api.start_stream('live_channel', viewers=42)
+    api.add_user('offline_channel')
+    api.set_chatters('live_channel', viewers=['alice', 'bob'], moderators=['mod'])
+    api.add_followers('live_channel', [f'follower{i}' for i in range(250)])
+    api.set_global_emotes(['Kappa'])
+    util.user_resolver.invalidate()
+    util.api_cache.invalidate()
+
+    async def main():
+        async with api:
+            poller = StreamPoller()
+            live, offline = StreamInfoApi('client_id', 'live_channel'), StreamInfoApi('client_id', 'offline_channel')
+            poller.register(live)
+            poller.register(offline)
+            assert await poller.poll() == 1
+            assert live.viewer_count == 42 and offline.started_at == datetime.min
+
+            chatters = Chatters('live_channel')
+            assert await chatters.update()
+            assert 'alice' in chatters and chatters.mods == {'mod'}
+
+            followers = await util.get_all_user_followers('live_channel')
+            assert len(followers) == 250 and 'follower0' in followers
+
+            await update_global_emotes(str(tmp_path / 'global_emotes.json'))
+            assert 'Kappa' in get_global_emotes()
+
+    run(main())
+    # 1 streams request, 1 users request for the follows' to_id, 3 pages of follows
+    assert sum(key.startswith('GET /helix/') for key in api.requests) == 5
+    assert not util.twitch_api_util.HELIX_API_URL.startswith(api.url)
+    util.api_cache.invalidate()
+
+
+def test_ratelimited_requests_are_retried_after_the_reset(monkeypatch):
+    monkeypatch.setattr(util.twitch_api_util, 'helix_scheduler', HelixScheduler())
+    api = FakeTwitchApi(ratelimit=5, ratelimit_window=1)
+    api.add_user('someone')
+    metrics.reset()
+
+    async def main():
+        async with api:
+            return await gather(*(util.get_users_data(['someone']) for _ in range(8)))
+
+    assert all('someone' in users for users in run(main()))
+    assert metrics.counters['helix.ratelimited_requests'] == 3
+    assert len(api.requests) == 11
+
+
+def test_recorded_responses_and_errors():
+    api = FakeTwitchApi(FIXTURES)
+    util.user_resolver.invalidate()
+
+    async def main():
+        async with api:
+            streams = await util.get_streams_data(['recorded_channel'])
+            user = await util.get_user_data('recorded_channel')
+            api.error_rate = 1
+            util.user_resolver.invalidate()
+            return streams, user, await util.get_user_data('recorded_channel')
+
+    streams, user, failed = run(main())
+    assert streams['recorded_channel']['viewer_count'] == 1234
+    assert user['broadcaster_type'] == 'partner'
+    assert failed == {}
+
+
+def test_follower_errors_return_no_followers():
+    api = FakeTwitchApi()
+    api.add_user('someone')
+    util.user_resolver.invalidate()
+    util.api_cache.invalidate()
+
+    async def main():
+        async with api:
+            await util.get_user_id('someone')
+            api.error_rate = 1
+            return await util.get_user_followers('someone')
+
+    assert run(main()).follower_count == -1
+    util.user_resolver.invalidate()
+    util.api_cache.invalidate()
+
+
+def test_user_lookups_with_other_headers_are_not_batched():
+    api = FakeTwitchApi()
+    api.add_user('someone')
+    util.user_resolver.invalidate()
+
+    async def main():
+        async with api:
+            headers = {'Client-ID': 'other_client_id'}
+            return await util.get_user_id('someone', headers), await util.get_user_data('not a login', headers)
+
+    user_id, invalid = run(main())
+    assert user_id != -1 and invalid == {}
+    # requested on its own, not through (and not cached by) the resolver shared with the default headers
+    assert api.requests == ['GET /helix/users?login=someone']
+    assert 'someone' not in util.user_resolver.cache
@@ -0,0 +1,95 @@
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from tests.async_util import run
+from tests.fake_twitch_api import FakeTwitchApi
+from twitchbot import BadTwitchAPIResponse, Follower, FollowerList, util
+
+
+def follow(i):
+    return {'from_id': str(i), 'from_login': f'user{i}', 'from_name': f'User{i}', 'to_id': '1', 'to_name': 'Channel'}
+
+
+def fake_follows_api(monkeypatch, followers, page_size=3):
+    requests = []
+
+    async def get_url(url, headers=None, priority=None):
+        query = parse_qs(urlparse(url).query)
+        requests.append(query)
+        start = int(query.get('after', ['0'])[0])
+        page = [follow(i) for i in followers[start:start + page_size]]
+        cursor = str(start + page_size) if start + page_size < len(followers) else None
+        return None, {'total': len(followers), 'data': page, 'pagination': {'cursor': cursor} if cursor else {}}
+
+    async def get_user_id(user, headers=None):
+        return '1'
+
+    monkeypatch.setattr(util.twitch_api_util, 'get_url', get_url)
+    monkeypatch.setattr(util.twitch_api_util, 'get_user_id', get_user_id)
+    util.api_cache.invalidate()
+    return requests
+
+
+def test_follower_list_membership():
+    followers = FollowerList('channel', 1)
+    assert followers.extend([follow(i) for i in (5, 3, 9)]) == 3
+    # pages can overlap while people follow / unfollow
+    assert followers.extend([follow(9), follow(1)]) == 2
+
+    assert len(followers) == 4 and 9 in followers and 4 not in followers
+    assert 'USER3' in followers and 'user4' not in followers
+    assert followers.get('user5') == Follower(following_id=1, following='channel', id=5, name='User5')
+    assert [follower.id for follower in followers] == [5, 3, 9, 1]
+
+
+def test_follower_list_is_a_sequence():
+    followers = FollowerList('channel', 1)
+    followers.extend([follow(i) for i in range(5)])
+    as_list = [Follower(following_id=1, following='channel', id=i, name=f'User{i}') for i in range(5)]
+
+    assert list(followers) == as_list and followers == as_list and followers == tuple(as_list)
+    assert followers[:2] == as_list[:2] and isinstance(followers[:2], list)
+    assert followers[::-2] == as_list[::-2] and followers[-1] == as_list[-1]
+    assert list(reversed(followers)) == as_list[::-1]
+    assert followers.index(as_list[3]) == 3 and followers.count(as_list[0]) == 1
+    assert followers != as_list[:4]
+
+
+def test_every_page_of_followers_is_requested(monkeypatch):
+    requests = fake_follows_api(monkeypatch, list(range(8)))
+
+    async def collect():
+        return [follower async for follower in util.iter_user_followers('channel')]
+
+    followers = run(collect())
+    assert [follower.id for follower in followers] == list(range(8))
+    assert [query.get('after') for query in requests] == [None, ['3'], ['6']]
+
+    requests.clear()
+    all_followers = run(util.get_all_user_followers('Channel'))
+    assert len(all_followers) == 8 and 'user7' in all_followers and all_followers.following_id == 1
+    assert len(requests) == 3
+    # cached
+    assert run(util.get_all_user_followers('channel')) is all_followers
+    util.api_cache.invalidate()
+
+
+def test_followers_of_unknown_user_raise():
+    api = FakeTwitchApi()
+    util.user_resolver.invalidate()
+    util.api_cache.invalidate()
+
+    async def main():
+        async with api:
+            with pytest.raises(BadTwitchAPIResponse):
+                async for _ in util.iter_user_followers('unknown_user'):
+                    pass
+            with pytest.raises(BadTwitchAPIResponse):
+                await util.get_all_user_followers('unknown_user')
+
+    run(main())
+    # the user was looked up, but no follows were requested for the -1 user id
+    assert api.requests and not any('/helix/users/follows' in key for key in api.requests)
+    util.user_resolver.invalidate()
+    util.api_cache.invalidate()
@@ -0,0 +1,54 @@
+import sys
+from asyncio import sleep
+
+import pytest
+
+from tests.async_util import run
+from twitchbot.emote import Emote, emotes, get_global_emotes, load_global_emotes, update_global_emotes
+
+emote_module = sys.modules['twitchbot.emote']
+
+
+def response(*codes):
+    return {'emotes': [{'id': str(i), 'code': code, 'emoticon_set': 0} for i, code in enumerate(codes)]}
+
+
+def test_emotes_are_saved_and_loaded_from_the_snapshot(monkeypatch, tmp_path):
+    path = str(tmp_path / 'global_emotes.json')
+    assert not load_global_emotes(path)
+
+    async def get_url(url, headers=None):
+        return None, response('Kappa', 'PogChamp')
+
+    emotes.clear()
+    monkeypatch.setattr(emote_module, 'get_url', get_url)
+    run(update_global_emotes(path))
+    # changed in place, so the mapping imported by this module sees the update
+    assert get_global_emotes() is emotes and emotes['Kappa'] == Emote(0, 'Kappa')
+
+    emotes.clear()
+    assert load_global_emotes(path)
+    assert set(emotes) == {'Kappa', 'PogChamp'}
+    emotes.clear()
+
+
+def test_a_slow_or_failed_update_keeps_the_current_emotes(monkeypatch, tmp_path):
+    path = str(tmp_path / 'global_emotes.json')
+    current = {'Kappa': Emote(0, 'Kappa')}
+    emotes.clear()
+    emotes.update(current)
+
+    async def slow_get_url(url, headers=None):
+        await sleep(1)
+
+    monkeypatch.setattr(emote_module, 'get_url', slow_get_url)
+    with pytest.raises(Exception):
+        run(update_global_emotes(path, timeout=.05))
+
+    assert get_global_emotes() == current
+
+    with open(path, 'w') as file:
+        file.write('{"emotes": [')
+    assert not load_global_emotes(path)
+    assert get_global_emotes() == current
+    emotes.clear()
@@ -0,0 +1,64 @@
+import time
+from asyncio import ensure_future, sleep
+
+from tests.async_util import run
+from twitchbot import HelixScheduler, RequestPriority
+
+
+def release(scheduler, remaining, limit=100, reset_in=.2):
+    scheduler.release({'Ratelimit-Limit': str(limit), 'Ratelimit-Remaining': str(remaining),
+                       'Ratelimit-Reset': str(int(time.time()) + 60)})
+    assert scheduler.remaining == remaining
+    # twitch sends whole seconds, the reset is moved closer to keep the test fast
+    scheduler.reset = time.time() + reset_in
+
+
+def test_low_priority_requests_wait_for_the_bucket_to_reset():
+    scheduler = HelixScheduler()
+    sent = []
+
+    async def request(name, priority):
+        await scheduler.acquire(priority)
+        sent.append(name)
+        scheduler.release()
+
+    async def main():
+        # 15 of 100 left: below the 20% low priority reserve, above the 5% normal priority reserve
+        await scheduler.acquire()
+        release(scheduler, 15)
+
+        low = ensure_future(request('low', RequestPriority.LOW))
+        high = ensure_future(request('high', RequestPriority.HIGH))
+        await sleep(.05)
+        assert sent == ['high'] and high.done() and not low.done()
+
+        await sleep(.3)
+        assert sent == ['high', 'low']
+
+    run(main())
+
+
+def test_waiting_requests_are_sent_in_priority_order():
+    scheduler = HelixScheduler()
+    sent = []
+
+    async def request(name, priority):
+        await scheduler.acquire(priority)
+        sent.append(name)
+
+    async def main():
+        await scheduler.acquire()
+        release(scheduler, 0, reset_in=.1)
+
+        tasks = [ensure_future(request(name, priority)) for name, priority in
+                 (('low', RequestPriority.LOW), ('normal', RequestPriority.NORMAL), ('high', RequestPriority.HIGH))]
+        await sleep(.05)
+        assert not sent
+
+        await sleep(.2)
+        assert sent == ['high', 'normal', 'low']
+        assert scheduler.in_flight == 3
+        for task in tasks:
+            await task
+
+    run(main())
@@ -0,0 +1,48 @@
+from aiohttp import web
+
+from tests.async_util import run
+from twitchbot import close_http_session, get_http_session, get_url
+
+
+async def _requests_over_one_connection(count):
+    peers = []
+
+    async def handle(request):
+        peers.append(request.transport.get_extra_info('peername'))
+        return web.json_response({'data': []})
+
+    app = web.Application()
+    app.router.add_get('/', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    url = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/'
+
+    try:
+        for _ in range(count):
+            _, json = await get_url(url, {'Client-ID': 'test'})
+            assert json == {'data': []}
+        return peers
+    finally:
+        await close_http_session()
+        await runner.cleanup()
+
+
+def test_requests_reuse_the_shared_session():
+    peers = run(_requests_over_one_connection(5))
+
+    assert len(peers) == 5
+    assert len(set(peers)) == 1
+
+
+def test_closed_session_is_replaced():
+    async def replace():
+        session = get_http_session()
+        assert get_http_session() is session
+        await close_http_session()
+        assert session.closed
+        assert get_http_session() is not session
+        await close_http_session()
+
+    run(replace())
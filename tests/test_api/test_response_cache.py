@@ -0,0 +1,77 @@
+from asyncio import gather, sleep
+
+import pytest
+
+from tests.async_util import run
+from twitchbot import ResponseCache, metrics, util
+
+
+class FakeEndpoint:
+    def __init__(self):
+        self.requests = 0
+        self.error = None
+
+    async def fetch(self):
+        self.requests += 1
+        await sleep(.01)
+        if self.error:
+            raise self.error
+        return self.requests
+
+
+def test_concurrent_requests_share_one_fetch():
+    metrics.reset()
+    cache, endpoint = ResponseCache(), FakeEndpoint()
+
+    async def spam():
+        return await gather(*(cache.get('followers', 'channel', endpoint.fetch) for _ in range(20)))
+
+    assert run(spam()) == [1] * 20
+    assert run(cache.get('followers', 'channel', endpoint.fetch)) == 1
+    assert endpoint.requests == 1
+    assert metrics.counters['api_cache.followers.misses'] == 20
+    assert metrics.counters['api_cache.followers.hits'] == 1
+
+
+def test_stale_responses_are_returned_while_refreshing():
+    cache, endpoint = ResponseCache(), FakeEndpoint()
+    assert run(cache.get('stream', 'channel', endpoint.fetch, ttl=0, stale_ttl=60)) == 1
+
+    # the stale response is returned right away, the refresh happens in the background
+    assert run(cache.get('stream', 'channel', endpoint.fetch, ttl=0, stale_ttl=60)) == 1
+    run(sleep(.05))
+    assert endpoint.requests == 2
+    assert run(cache.get('stream', 'channel', endpoint.fetch, ttl=60)) == 2
+
+    # a failed refresh keeps the stale response
+    cache.entries[('stream', 'channel')] = 0, float('inf'), 'stale'
+    endpoint.error = RuntimeError('api down')
+    assert run(cache.get('stream', 'channel', endpoint.fetch)) == 'stale'
+    run(sleep(.05))
+    assert cache.entries[('stream', 'channel')][2] == 'stale'
+
+
+def test_failed_requests_are_not_cached():
+    cache, endpoint = ResponseCache(), FakeEndpoint()
+    endpoint.error = RuntimeError('api down')
+    with pytest.raises(RuntimeError):
+        run(cache.get('followers', 'channel', endpoint.fetch))
+
+    endpoint.error = None
+    assert run(cache.get('followers', 'channel', endpoint.fetch)) == 2
+
+
+def test_stream_data_is_cached(monkeypatch):
+    requests = []
+
+    async def get_url(url, headers=None, priority=None):
+        requests.append(url)
+        return None, {'data': [{'user_login': 'channel', 'viewer_count': 5}]}
+
+    monkeypatch.setattr(util.twitch_api_util, 'get_url', get_url)
+    util.api_cache.invalidate()
+
+    assert run(util.get_stream_data('channel', {}))['viewer_count'] == 5
+    assert run(util.get_stream_data('Channel', {}))['viewer_count'] == 5
+    assert len(requests) == 1
+    util.api_cache.invalidate()
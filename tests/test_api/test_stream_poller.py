@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from tests.async_util import run
+from tests.fake_twitch_api import FakeTwitchApi
+from twitchbot import StreamInfoApi, StreamPoller, metrics, util
+
+
+def stream(login, viewers):
+    return {'user_login': login, 'viewer_count': viewers, 'title': f'{login} title', 'game_id': '1',
+            'community_ids': [], 'started_at': '2020-05-17T16:47:46Z', 'user_id': '1', 'tag_ids': []}
+
+
+def test_channels_are_polled_in_batches(monkeypatch):
+    requests = []
+
+    async def get_streams_data(logins, headers=None):
+        requests.append(logins)
+        return {login: stream(login, int(login[7:])) for login in logins if int(login[7:]) % 2 == 0}
+
+    monkeypatch.setattr(util, 'get_streams_data', get_streams_data)
+    poller = StreamPoller()
+    apis = [StreamInfoApi('client_id', f'channel{i}') for i in range(250)]
+    for api in apis:
+        poller.register(api)
+
+    assert run(poller.poll()) == 3
+    assert [len(batch) for batch in requests] == [100, 100, 50]
+    assert apis[42].viewer_count == 42 and apis[42].started_at == datetime(2020, 5, 17, 16, 47, 46)
+    # offline channels are not given stream data
+    assert apis[43].viewer_count == 0 and apis[43].started_at == datetime.min
+
+
+def test_api_errors_are_not_applied_as_offline():
+    api = FakeTwitchApi()
+    api.start_stream('live_channel', viewers=42)
+    metrics.reset()
+
+    async def main():
+        async with api:
+            poller = StreamPoller()
+            live = StreamInfoApi('client_id', 'live_channel')
+            poller.register(live)
+            await poller.poll()
+
+            api.error_rate = 1
+            await poller.poll()
+            return live
+
+    live = run(main())
+    assert live.viewer_count == 42
+    assert metrics.counters['streams.poll_failures'] == 1
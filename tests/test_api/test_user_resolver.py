@@ -0,0 +1,66 @@
+from asyncio import gather
+
+import pytest
+
+from tests.async_util import run
+from twitchbot import UserResolver
+
+
+class FakeUsers:
+    def __init__(self, existing):
+        self.existing = set(existing)
+        self.requests = []
+        self.error = None
+
+    async def fetch(self, logins):
+        self.requests.append(list(logins))
+        if self.error:
+            raise self.error
+        return {login: {'login': login, 'id': str(len(login))} for login in logins if login in self.existing}
+
+
+def test_concurrent_lookups_are_batched_and_cached():
+    users = FakeUsers(f'user{i}' for i in range(0, 250, 2))
+    resolver = UserResolver(users.fetch, batch_window=.01)
+
+    async def look_up_all():
+        return await gather(*(resolver.get(f'User{i}') for i in range(250)))
+
+    results = run(look_up_all())
+    assert sorted(len(request) for request in users.requests) == [50, 100, 100]
+    assert results[2] == {'login': 'user2', 'id': '5'} and results[3] is None
+
+    # found and unknown users are both answered from the cache
+    assert run(resolver.get_many(['user2', 'user3'])) == {'user2': results[2], 'user3': None}
+    assert len(users.requests) == 3
+
+
+def test_expired_evicted_and_failed_lookups_are_requested_again():
+    users = FakeUsers(['a', 'b', 'c'])
+    resolver = UserResolver(users.fetch, negative_ttl=0, max_size=2, batch_window=0)
+
+    run(resolver.get_many(['missing', 'a', 'b']))
+    run(resolver.get('c'))
+    assert list(resolver.cache) == ['b', 'c']
+
+    users.requests.clear()
+    run(resolver.get_many(['a', 'missing']))
+    assert sorted(users.requests[0]) == ['a', 'missing']
+
+    users.error = RuntimeError('api down')
+    with pytest.raises(RuntimeError):
+        run(resolver.get('d'))
+    assert 'd' not in resolver.cache
+
+
+def test_invalid_logins_are_not_requested():
+    users = FakeUsers(['alice'])
+    resolver = UserResolver(users.fetch, batch_window=0)
+
+    results = run(resolver.get_many(['alice', 'not a login', 'x' * 26, '']))
+    assert results == {'alice': {'login': 'alice', 'id': '5'}, 'not a login': None, 'x' * 26: None, '': None}
+    assert users.requests == [['alice']]
+
+    # remembered as not existing
+    assert run(resolver.get('NOT A LOGIN')) is None
+    assert 'not a login' in resolver.cache and len(users.requests) == 1
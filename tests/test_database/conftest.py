@@ -0,0 +1,38 @@
+import pytest
+
+from twitchbot import (
+    Partition,
+    STORAGE_PROFILES,
+    balance_ledger,
+    create_or_upgrade_database,
+    create_sqlite_engine,
+    database_router,
+    leaderboards,
+)
+from twitchbot.database.currency import currency_name_cache
+
+
+@pytest.fixture(autouse=True)
+def database(tmp_path_factory, monkeypatch) -> Partition:
+    """
+    points the shared database at a new sqlite file in a temporary folder, so every test starts with a empty
+    database and nothing is written to the bot's database file, the caches in front of the database are emptied too
+    """
+    filename = tmp_path_factory.mktemp('database') / 'database.sqlite'
+    partition = Partition(create_sqlite_engine(str(filename), STORAGE_PROFILES['fast']))
+    create_or_upgrade_database(partition.engine)
+    monkeypatch.setattr(database_router, 'shared', partition)
+
+    # a new ledger state, the old one is put back afterwards so balances left by the test are never flushed
+    monkeypatch.setattr(balance_ledger, 'balances', {})
+    monkeypatch.setattr(balance_ledger, 'persisted', set())
+    monkeypatch.setattr(balance_ledger, 'dirty', set())
+    monkeypatch.setattr(balance_ledger, 'writing', set())
+    leaderboards.clear()
+    currency_name_cache.clear()
+
+    yield partition
+
+    leaderboards.clear()
+    currency_name_cache.clear()
+    partition.close()
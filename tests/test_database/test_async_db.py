@@ -0,0 +1,53 @@
+from asyncio import gather
+
+from tests.async_util import run
+from twitchbot import (
+    BatchedLookup,
+    CustomCommand,
+    add_custom_command_async,
+    get_custom_command,
+    get_custom_command_async,
+    set_custom_command_response_async,
+    delete_custom_command_async,
+)
+
+
+def test_async_functions_share_the_database_with_the_sync_functions():
+    async def _test():
+        assert await add_custom_command_async(CustomCommand.create('test_async_db', 'hello', 'hi'))
+        assert not await add_custom_command_async(CustomCommand.create('test_async_db', 'hello', 'hi'))
+
+        cmd = await get_custom_command_async('test_async_db', 'hello')
+        # detached objects keep their loaded values
+        assert cmd.response == 'hi'
+
+        # loaded into the long lived session of the sync functions, the async change must not leave it stale
+        sync_cmd = get_custom_command('test_async_db', 'hello')
+        assert await set_custom_command_response_async('test_async_db', 'hello', 'hey')
+        assert sync_cmd.response == 'hey'
+        assert (await get_custom_command_async('test_async_db', 'hello')).response == 'hey'
+        assert get_custom_command('test_async_db', 'hello').response == 'hey'
+
+        assert await delete_custom_command_async('test_async_db', 'hello')
+        assert await get_custom_command_async('test_async_db', 'hello') is None
+        assert not await set_custom_command_response_async('test_async_db', 'hello', 'hey')
+
+    run(_test())
+
+
+def test_lookups_made_together_run_as_one_batch():
+    async def _test():
+        calls = []
+
+        def lookup(s, channel, keys):
+            calls.append((channel, sorted(keys)))
+            return {key: key.upper() for key in keys if key != 'missing'}
+
+        lookups = BatchedLookup(lookup)
+        results = await gather(lookups.get('a', 'x'), lookups.get('a', 'y'), lookups.get('b', 'x'),
+                               lookups.get('a', 'x'), lookups.get('a', 'missing'))
+
+        assert results == ['X', 'Y', 'X', 'X', None]
+        assert sorted(calls) == [('a', ['missing', 'x', 'y']), ('b', ['x'])]
+
+    run(_test())
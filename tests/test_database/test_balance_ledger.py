@@ -0,0 +1,163 @@
+from asyncio import ensure_future, sleep
+
+from tests.async_util import run
+from twitchbot import (
+    Balance,
+    BalanceLedger,
+    cfg,
+    channel_session_scope,
+    add_balance_to_all,
+    add_balance_to_users_async,
+    balance_ledger,
+    get_balance,
+)
+
+
+def db_balances(channel):
+    with channel_session_scope(channel) as s:
+        return dict(s.query(Balance.user, Balance.balance).filter(Balance.channel == channel))
+
+
+def test_changes_stay_in_memory_until_flushed():
+    ledger = BalanceLedger(flush_interval=60, flush_threshold=1000)
+
+    assert ledger.get('ledger_flush', 'Alice').balance == cfg.default_balance
+    ledger.add('ledger_flush', 'alice', 50)
+    ledger.set('ledger_flush', 'bob', 10)
+    ledger.get('ledger_flush', 'bob').balance -= 5
+    assert db_balances('ledger_flush') == {}
+
+    assert ledger.flush() == 2
+    assert db_balances('ledger_flush') == {'alice': cfg.default_balance + 50, 'bob': 5}
+    assert not ledger.dirty
+
+    ledger.add('ledger_flush', 'alice', 1)
+    assert run(ledger.flush_async()) == 1
+    assert db_balances('ledger_flush')['alice'] == cfg.default_balance + 51
+
+    # a new ledger loads the flushed balances instead of creating new ones
+    assert BalanceLedger().get('ledger_flush', 'bob').balance == 5
+
+
+def test_flushes_once_threshold_is_reached():
+    ledger = BalanceLedger(flush_interval=60, flush_threshold=3)
+
+    ledger.set('ledger_threshold', 'a', 1)
+    ledger.set('ledger_threshold', 'b', 2)
+    assert db_balances('ledger_threshold') == {}
+
+    # the event loop is not running, so the flush happens right away
+    ledger.set('ledger_threshold', 'c', 3)
+    assert db_balances('ledger_threshold') == {'a': 1, 'b': 2, 'c': 3}
+
+
+def test_add_balance_to_all_keeps_ledger_and_database_in_sync():
+    get_balance('ledger_all', 'a').balance = 10
+    balance_ledger.flush('ledger_all')
+    get_balance('ledger_all', 'a').balance += 5
+    get_balance('ledger_all', 'b').balance = 1
+
+    add_balance_to_all('ledger_all', 100)
+
+    assert get_balance('ledger_all', 'a').balance == 115
+    assert get_balance('ledger_all', 'b').balance == 101
+    assert db_balances('ledger_all') == {'a': 115, 'b': 101}
+
+
+def test_add_balance_to_users_upserts_and_updates_the_ledger():
+    async def _test():
+        get_balance('ledger_users', 'old').balance = 10
+        balance_ledger.flush('ledger_users')
+        get_balance('ledger_users', 'changed').balance = 20
+        get_balance('ledger_users', 'absent').balance = 30
+
+        await add_balance_to_users_async('ledger_users', ['Old', 'changed', 'new'], 2)
+
+        assert db_balances('ledger_users') == {'old': 12, 'changed': 22, 'new': cfg.default_balance + 2,
+                                               'absent': 30}
+        assert get_balance('ledger_users', 'old').balance == 12
+        assert get_balance('ledger_users', 'changed').balance == 22
+        assert get_balance('ledger_users', 'new').balance == cfg.default_balance + 2
+        assert not balance_ledger.dirty
+
+    run(_test())
+
+
+def test_transfer_and_settle_only_happen_when_affordable():
+    ledger = BalanceLedger(flush_interval=60, flush_threshold=1000)
+    ledger.set('ledger_transfer', 'a', 30)
+    ledger.set('ledger_transfer', 'b', 5)
+
+    assert ledger.transfer('ledger_transfer', 'a', 'b', 31) is None
+    assert ledger.transfer('ledger_transfer', 'A', 'b', 30) == (0, 35)
+    assert ledger.transfer('ledger_transfer', 'b', 'b', 10) == (35, 35)
+
+    assert ledger.settle('ledger_transfer', 'b', 36, 100) is None
+    assert ledger.settle('ledger_transfer', 'b', 35, 50) == 50
+    assert ledger.settle('ledger_transfer', 'b', 10) == 40
+
+    ledger.flush()
+    assert db_balances('ledger_transfer') == {'a': 0, 'b': 40}
+
+
+def test_entry_reloads_forgotten_balance():
+    ledger = BalanceLedger(flush_interval=60, flush_threshold=1000)
+    entry = ledger.get('ledger_forget', 'alice')
+    entry.balance = 42
+    ledger.flush()
+    ledger.forget()
+
+    assert entry.balance == 42
+    entry.balance += 1
+    assert ledger.get('ledger_forget', 'alice').balance == 43
+
+
+def test_balance_being_written_is_left_out_of_other_flushes():
+    async def _test():
+        ledger = BalanceLedger(flush_interval=60, flush_threshold=1000)
+        ledger.set('ledger_race', 'alice', 1)
+
+        # holds the INSERT of the async flush on the executor
+        lock = ledger._write_lock(None)
+        lock.acquire()
+        flush = ensure_future(ledger.flush_async())
+        await sleep(.05)
+
+        ledger.set('ledger_race', 'alice', 2)
+        assert ledger.flush() == 0
+        lock.release()
+        assert await flush == 1
+
+        # the newer balance is still dirty and written by the next flush
+        assert db_balances('ledger_race') == {'alice': 1}
+        assert ledger.flush() == 1
+        assert db_balances('ledger_race') == {'alice': 2}
+        assert not ledger.dirty and not ledger.writing
+
+    run(_test())
+
+
+def test_new_balance_whose_row_was_created_meanwhile_is_updated():
+    ledger = BalanceLedger(flush_interval=60, flush_threshold=1000)
+    ledger.set('ledger_upsert', 'alice', 5)
+
+    # ex: add_balance_to_users() gave alice a balance after the ledger found none
+    with channel_session_scope('ledger_upsert') as s:
+        s.add(Balance.create('ledger_upsert', 'alice', 1))
+
+    assert ledger.flush() == 1
+    assert db_balances('ledger_upsert') == {'alice': 5}
+
+
+def test_least_recently_used_unchanged_balances_are_evicted():
+    ledger = BalanceLedger(flush_interval=60, flush_threshold=1000, max_size=2)
+    for user in 'abc':
+        ledger.set('ledger_evict', user, 1)
+    # changed balances are kept until they are written
+    assert ledger.evict() == 0
+
+    ledger.flush()
+    ledger.get('ledger_evict', 'a')
+    assert ledger.evict() == 1
+    assert set(ledger.balances) == {('ledger_evict', 'a'), ('ledger_evict', 'c')}
+    assert ledger.get('ledger_evict', 'b').balance == 1
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from twitchbot import (
+    Quote,
+    add_quote,
+    balance_ledger,
+    export_to_file,
+    get_balance,
+    get_quote,
+    import_from_file,
+    import_rows,
+    iter_export_rows,
+)
+
+
+@pytest.mark.parametrize('format', ['jsonl', 'csv'])
+def test_export_then_import_into_another_channel(tmp_path, format):
+    source, target = f'bulk_{format}', f'bulk_{format}_copy'
+    balance_ledger.set(source, 'alice', 10)
+    balance_ledger.set(source, 'bob', 20)
+    add_quote(Quote.create(source, 'no alias'))
+    add_quote(Quote.create(source, 'with alias', alias='q'))
+
+    # changed balances are flushed before exporting
+    assert export_to_file('balances', str(tmp_path / f'balances.{format}'), channel=source, chunk_size=1) == 2
+    assert export_to_file('quotes', str(tmp_path / f'quotes.{format}'), channel=source) == 2
+
+    balance_ledger.set(target, 'alice', 99)
+    assert import_from_file('balances', str(tmp_path / f'balances.{format}'), channel=target, replace=True,
+                            batch_size=1) == 2
+    assert import_from_file('quotes', str(tmp_path / f'quotes.{format}'), channel=target, keep_ids=False) == 2
+
+    # the ledger loads the imported balances instead of keeping its own
+    assert get_balance(target, 'alice').balance == 10
+    assert get_balance(target, 'bob').balance == 20
+    assert get_quote(target, 'q').value == 'with alias'
+    assert [row['alias'] for row in iter_export_rows('quotes', channel=target)] == [None, 'q']
+
+
+def test_failed_import_changes_nothing():
+    rows = [{'channel': 'bulk_fail', 'user': 'alice', 'balance': 1},
+            {'channel': 'bulk_fail', 'user': 'alice', 'balance': 2}]
+
+    with pytest.raises(IntegrityError):
+        import_rows('balances', rows, batch_size=1)
+    assert list(iter_export_rows('balances', channel='bulk_fail')) == []
@@ -0,0 +1,73 @@
+from random import Random
+
+from tests.async_util import run
+from twitchbot import (
+    RankedList,
+    Leaderboard,
+    balance_ledger,
+    get_balance,
+    add_balance_to_all,
+    add_balance_to_users_async,
+    get_leaderboard_async,
+    cfg,
+)
+
+
+def test_ranked_list_matches_sorted_list():
+    rng = Random(1)
+    ranked = RankedList(chunk_size=4)
+    expected = []
+
+    for _ in range(500):
+        value = rng.randrange(100)
+        if expected and rng.random() < .4:
+            value = rng.choice(expected)
+            ranked.remove(value)
+            expected.remove(value)
+        else:
+            ranked.add(value)
+            expected.append(value)
+
+        expected.sort()
+        assert list(ranked) == expected
+        assert len(ranked) == len(expected)
+        assert ranked.first(5) == expected[:5]
+        if expected:
+            value = rng.choice(expected)
+            assert ranked.index(value) == expected.index(value)
+
+
+def test_leaderboard_ranks_and_excludes_users():
+    leaderboard = Leaderboard('chan', [('a', 5), ('b', 10), ('chan', 100), ('bot', 1000)], excluded=('chan', 'Bot'))
+
+    assert leaderboard.top() == [('b', 10), ('a', 5)]
+    assert leaderboard.rank('chan') is None
+
+    leaderboard.set('a', 20)
+    leaderboard.add('c', 1, default=7)
+    leaderboard.add_to_all(3)
+
+    assert leaderboard.top(2) == [('a', 23), ('b', 13)]
+    assert leaderboard.rank('c') == 3
+    assert leaderboard.balance('c') == 11
+
+
+def test_leaderboard_follows_balance_changes():
+    async def _test():
+        get_balance('leaderboard', 'a').balance = 10
+        get_balance('leaderboard', 'b').balance = 20
+        balance_ledger.flush()
+        balance_ledger.forget('leaderboard')
+
+        leaderboard = await get_leaderboard_async('leaderboard')
+        assert leaderboard.top() == [('b', 20), ('a', 10)]
+
+        get_balance('leaderboard', 'a').balance += 15
+        assert leaderboard.rank('a') == 1
+
+        add_balance_to_all('leaderboard', 1)
+        await add_balance_to_users_async('leaderboard', ['b', 'c'], 100)
+
+        assert leaderboard.top() == [('c', cfg.default_balance + 100), ('b', 121), ('a', 26)]
+
+    run(_test())
@@ -0,0 +1,72 @@
+import os
+import runpy
+import sys
+
+from sqlalchemy import create_engine, inspect
+
+from twitchbot import create_or_upgrade_database, get_schema_version, latest_schema_version
+
+MIGRATE_SCRIPT = os.path.join(os.path.dirname(__file__), '..', '..', 'util', 'migrate_database.py')
+
+# the tables as the bot created them before it had migrations
+OLD_SCHEMA = (
+    'CREATE TABLE quotes (id INTEGER PRIMARY KEY, user VARCHAR(255), channel VARCHAR(255) NOT NULL, '
+    'alias VARCHAR(255), value VARCHAR(255) NOT NULL)',
+    'CREATE TABLE commands (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, channel VARCHAR(255) NOT NULL, '
+    'response VARCHAR(255) NOT NULL)',
+    'CREATE TABLE balance (id INTEGER PRIMARY KEY, channel VARCHAR(255) NOT NULL, user VARCHAR(255) NOT NULL, '
+    'balance INTEGER NOT NULL)',
+    'CREATE TABLE currency_names (id INTEGER PRIMARY KEY, channel VARCHAR(255) NOT NULL, name VARCHAR(255) NOT NULL)',
+)
+
+
+def test_new_database_starts_at_latest_version(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "new.sqlite"}')
+
+    assert create_or_upgrade_database(engine) == []
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == latest_schema_version()
+    assert 'ux_balance_channel_user' in {index['name'] for index in inspect(engine).get_indexes('balance')}
+
+
+def test_old_database_is_deduplicated_and_indexed(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "old.sqlite"}')
+    for statement in OLD_SCHEMA:
+        engine.execute(statement)
+    engine.execute("INSERT INTO balance (channel, user, balance) VALUES "
+                   "('c', 'a', 5), ('c', 'a', 50), ('c', 'b', 1), ('d', 'a', 2)")
+    engine.execute("INSERT INTO quotes (channel, alias, value) VALUES ('c', 'x', 'one'), ('c', 'x', 'two'), "
+                   "('c', NULL, 'three'), ('c', NULL, 'four')")
+    engine.execute("INSERT INTO commands (channel, name, response) VALUES ('c', 'hi', 'first'), ('c', 'hi', 'second')")
+
+    applied = create_or_upgrade_database(engine)
+
+    assert [migration.version for migration in applied] == list(range(1, latest_schema_version() + 1))
+    assert engine.execute('SELECT channel, user, balance FROM balance ORDER BY id').fetchall() == [
+        ('c', 'a', 50), ('c', 'b', 1), ('d', 'a', 2)]
+    assert engine.execute('SELECT alias, value FROM quotes ORDER BY id').fetchall() == [
+        ('x', 'one'), (None, 'two'), (None, 'three'), (None, 'four')]
+    assert engine.execute('SELECT response FROM commands').fetchall() == [('first',)]
+    # the table that did not exist yet was created
+    assert 'message_timers' in inspect(engine).get_table_names()
+
+    # running it again does nothing
+    assert create_or_upgrade_database(engine) == []
+
+
+def test_migrate_script_on_empty_database(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'empty.sqlite'
+    path.touch()
+    monkeypatch.setattr(sys, 'argv', ['migrate_database.py', str(path)])
+
+    runpy.run_path(MIGRATE_SCRIPT, run_name='__main__')
+
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == latest_schema_version()
+    assert 'balance' in inspect(engine).get_table_names()
+    assert 'created the tables of the latest schema' in capsys.readouterr().out
+
+    # running it again has nothing to do
+    runpy.run_path(MIGRATE_SCRIPT, run_name='__main__')
+    assert 'database is already up to date' in capsys.readouterr().out
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import create_engine
+
+from twitchbot import (
+    Balance,
+    DatabaseRouter,
+    Quote,
+    STORAGE_PROFILES,
+    add_quote,
+    balance_ledger,
+    create_or_upgrade_database,
+    database_router,
+    get_quote,
+    session_scope,
+    split_database,
+)
+
+
+@pytest.fixture
+def partitioned(tmp_path):
+    folder = database_router.folder
+    database_router.partitioned, database_router.folder = True, tmp_path
+    yield database_router
+    for channel in database_router.channels():
+        database_router.close(channel)
+    database_router.partitioned, database_router.folder = False, folder
+
+
+def test_channels_are_stored_in_their_own_database(partitioned, database):
+    assert add_quote(Quote.create('partition_a', 'first quote', alias='q'))
+    assert add_quote(Quote.create('partition_b', 'other quote', alias='q'))
+    balance_ledger.set('partition_a', 'alice', 50)
+    balance_ledger.set('partition_b', 'alice', 70)
+    balance_ledger.flush()
+
+    assert partitioned.channels() == ['partition_a', 'partition_b']
+    assert get_quote('partition_a', 'q').value == 'first quote'
+    for channel, balance in (('partition_a', 50), ('partition_b', 70)):
+        with partitioned.engine_for(channel).connect() as connection:
+            assert connection.execute(Balance.__table__.select()).fetchall() == [(1, channel, 'alice', balance)]
+
+    # nothing is written to the shared database
+    with session_scope(database.Session) as s:
+        assert not s.query(Quote).filter(Quote.channel.like('partition_%')).count()
+
+
+def test_invalid_channel_names_are_rejected(partitioned):
+    with pytest.raises(ValueError):
+        partitioned.engine_for('../escape')
+
+
+def test_split_database_copies_each_channel(tmp_path):
+    source = create_engine(f'sqlite:///{tmp_path / "single.sqlite"}')
+    create_or_upgrade_database(source)
+    quotes = Quote.__table__
+    source.execute(quotes.insert(), [{'id': 5, 'channel': 'one', 'value': 'a'},
+                                     {'id': 6, 'channel': 'two', 'value': 'b'},
+                                     {'id': 7, 'channel': 'one', 'value': 'c'}])
+
+    router = DatabaseRouter(partitioned=True, folder=str(tmp_path / 'channels'), profile=STORAGE_PROFILES['fast'])
+    assert split_database(source, router, batch_size=1) == {'one': 2, 'two': 1}
+    # running it again replaces the rows instead of duplicating them
+    assert split_database(source, router) == {'one': 2, 'two': 1}
+
+    with router.engine_for('one').connect() as connection:
+        assert [(row.id, row.value) for row in connection.execute(quotes.select())] == [(5, 'a'), (7, 'c')]
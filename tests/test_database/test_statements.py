@@ -0,0 +1,17 @@
+from sqlalchemy import bindparam
+
+from twitchbot import CustomCommand, add_custom_command, custom_command_exist, exists_statement
+
+
+def test_exists_statement_is_compiled_once(database):
+    session = database.session
+    statement = exists_statement(CustomCommand.__table__, CustomCommand.channel == bindparam('channel'))
+    add_custom_command(CustomCommand.create('statements', 'hello', 'world'))
+
+    assert statement.exists(session, channel='statements')
+    assert not statement.exists(session, channel='statements_missing')
+
+    compiled = statement._compiled[session.bind.dialect.name]
+    assert str(compiled).startswith('SELECT 1 \nFROM commands') and 'LIMIT' in str(compiled)
+    assert list(statement._compiled.values()) == [compiled]
+    assert custom_command_exist('statements', 'hello')
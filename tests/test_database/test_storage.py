@@ -0,0 +1,30 @@
+from twitchbot import STORAGE_PROFILES, create_sqlite_engine
+
+
+def test_profile_pragmas_are_set_on_connections(tmp_path):
+    engine = create_sqlite_engine(str(tmp_path / 'profile.sqlite'), STORAGE_PROFILES['balanced'])
+
+    with engine.connect() as connection:
+        assert connection.execute('PRAGMA journal_mode').scalar() == 'wal'
+        # 1 is NORMAL
+        assert connection.execute('PRAGMA synchronous').scalar() == 1
+        assert connection.execute('PRAGMA cache_size').scalar() == -64000
+
+
+def test_wal_readers_are_not_blocked_by_a_writer(tmp_path):
+    engine = create_sqlite_engine(str(tmp_path / 'wal.sqlite'), STORAGE_PROFILES['balanced'])
+    engine.execute('CREATE TABLE t (x INTEGER)')
+    engine.execute('INSERT INTO t VALUES (1)')
+
+    with engine.connect() as writer:
+        transaction = writer.begin()
+        writer.execute('INSERT INTO t VALUES (2)')
+        writer.execute('UPDATE t SET x = x + 10')
+
+        # readers see the last committed data while the write is in progress
+        with engine.connect() as reader:
+            assert reader.execute('SELECT x FROM t').fetchall() == [(1,)]
+
+        transaction.commit()
+
+    assert sorted(engine.execute('SELECT x FROM t').fetchall()) == [(11,), (12,)]
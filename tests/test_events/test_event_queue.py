@@ -0,0 +1,93 @@
+from asyncio import sleep
+
+from tests.async_util import run
+from twitchbot import EventQueue, metrics
+
+
+def test_handlers_run_in_order_per_key():
+    async def _test():
+        queue = EventQueue(max_size=100)
+        seen = []
+
+        async def handler(key, i):
+            # later handlers for the other key must not wait for this one
+            await sleep(.01 if key == 'slow' else 0)
+            seen.append((key, i))
+
+        for i in range(5):
+            queue.publish('slow', handler, 'slow', i)
+            queue.publish('fast', handler, 'fast', i)
+
+        await queue.drain()
+
+        assert [i for key, i in seen if key == 'slow'] == list(range(5))
+        assert [i for key, i in seen if key == 'fast'] == list(range(5))
+        # all fast handlers finished before the slow ones
+        assert [key for key, _ in seen[:5]] == ['fast'] * 5
+        assert not queue.workers and not queue.queues and queue.size == 0
+
+    run(_test())
+
+
+def test_handlers_are_dropped_when_full():
+    async def _test():
+        metrics.reset()
+        queue = EventQueue(max_size=3, name='test')
+        ran = []
+
+        async def handler(i):
+            ran.append(i)
+
+        results = [queue.publish('chan', handler, i) for i in range(5)]
+        await queue.drain()
+
+        assert results == [True, True, True, False, False]
+        assert ran == [0, 1, 2]
+        assert metrics.counters['test.dropped'] == 2
+
+    run(_test())
+
+
+def test_failing_handler_does_not_stop_queue():
+    async def _test():
+        queue = EventQueue(max_size=10)
+        ran = []
+
+        async def bad():
+            raise ValueError('oops')
+
+        async def good():
+            ran.append(True)
+
+        queue.publish('chan', bad)
+        queue.publish('chan', good)
+        await queue.drain()
+
+        assert ran == [True]
+
+    run(_test())
+
+
+def test_cancelled_worker_drops_its_handlers():
+    async def _test():
+        metrics.reset()
+        queue = EventQueue(max_size=10, name='test')
+
+        async def handler():
+            await sleep(10)
+
+        for _ in range(3):
+            queue.publish('chan', handler)
+        await sleep(0)
+
+        queue.workers['chan'].cancel()
+        await queue.drain()
+
+        assert not queue.workers and not queue.queues and queue.size == 0
+        assert metrics.counters['test.dropped'] == 2
+        # the key can be published to again
+        assert queue.publish('chan', sleep, 0)
+        await queue.drain()
+        assert queue.size == 0
+
+    run(_test())
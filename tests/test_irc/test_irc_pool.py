@@ -0,0 +1,116 @@
+from twitchbot import IrcPool, metrics
+from tests.async_util import run
+from tests.fake_irc_server import FakeIrcServer, wait_until
+
+
+async def _start_pool(channels, **kwargs):
+    server = await FakeIrcServer().start()
+    pool = IrcPool(connection_factory=server.connect, **kwargs)
+    await pool.connect(channels)
+    return server, pool
+
+
+def test_channels_are_sharded_across_read_connections():
+    async def _test():
+        server, pool = await _start_pool('abcde', channels_per_connection=2, read_connections=1, write_connections=1)
+        await wait_until(lambda: sum(len(c.channels) for c in server.clients) == 5)
+
+        assert len(pool.readers) == 3
+        assert len(pool.writers) == 1
+        assert all(conn.load <= 2 for conn in pool.readers)
+        assert pool.channels == set('abcde')
+        # each channel is joined exactly once, and never on the write connection
+        assert sorted(chan for client in server.clients for chan in client.channels) == list('abcde')
+        assert not server.clients[-1].sent('JOIN')
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_messages_are_sent_on_write_connection_and_merged_from_readers():
+    async def _test():
+        server, pool = await _start_pool('abcd', channels_per_connection=2, read_connections=1, write_connections=1)
+        await wait_until(lambda: len(server.clients_in('d')) == 1)
+
+        pool.send('PRIVMSG #a :hello')
+        writer = server.clients[-1]
+        await wait_until(lambda: writer.sent('PRIVMSG'))
+        assert writer.sent('PRIVMSG') == ['PRIVMSG #a :hello']
+
+        server.send_privmsg('d', 'bob', 'hi from d')
+        while True:
+            line = await pool.get_next_message()
+            if 'PRIVMSG' in line:
+                break
+        assert line.endswith('PRIVMSG #d :hi from d')
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_failed_raw_joins_are_reported():
+    async def _test():
+        server, pool = await _start_pool('ab', channels_per_connection=2, read_connections=1, write_connections=0)
+        metrics.reset()
+
+        async def refuse_connection():
+            raise ConnectionRefusedError('no more connections')
+
+        pool.connection_factory = refuse_connection
+        pool.send('JOIN #c')
+        assert len(pool.join_tasks) == 1
+        await wait_until(lambda: not pool.join_tasks)
+
+        assert 'c' not in pool.channels
+        assert metrics.counters['irc.join_failures'] == 1
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_joining_at_runtime_opens_connection_and_rebalances():
+    async def _test():
+        server, pool = await _start_pool('ab', channels_per_connection=2, read_connections=1, write_connections=0)
+        assert len(pool.readers) == 1
+
+        await pool.join('c')
+        pool.send('JOIN #d')
+        await wait_until(lambda: pool.channels == set('abcd'))
+
+        assert len(pool.readers) == 2
+        assert sorted(conn.load for conn in pool.readers) == [2, 2]
+
+        pool.part('a')
+        assert 'a' not in pool.channels
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_chat_text_is_not_mistaken_for_a_command():
+    async def _test():
+        server, pool = await _start_pool('ab', channels_per_connection=1, read_connections=1, write_connections=0)
+        await wait_until(lambda: len(server.clients_in('a')) == len(server.clients_in('b')) == 1)
+        # only the primary reader forwards whispers, the other one must still forward chat that mentions them
+        channel = next(chan for chan, conn in pool.channel_connections.items() if not conn.is_primary)
+
+        for content in ('a WHISPER b', 'ping PONG lol'):
+            server.send_privmsg(channel, 'bob', content)
+            while True:
+                line = await pool.get_next_message()
+                if 'PRIVMSG' in line:
+                    break
+            assert line.endswith(f'PRIVMSG #{channel} :{content}')
+
+        pool.close()
+        await server.close()
+
+    run(_test())
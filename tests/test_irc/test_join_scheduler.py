@@ -0,0 +1,80 @@
+from twitchbot import IrcPool, JoinScheduler
+from tests.async_util import run
+from tests.fake_irc_server import FakeIrcServer, wait_until
+
+
+async def _start_pool(channels, join_scheduler: JoinScheduler, server: FakeIrcServer = None):
+    server = server or await FakeIrcServer().start()
+    pool = IrcPool(connection_factory=server.connect, channels_per_connection=0, read_connections=1,
+                   write_connections=0)
+    pool.join_scheduler = join_scheduler
+    await pool.connect(channels)
+    return server, pool
+
+
+def _join_attempts(client, channel):
+    return sum(f'#{channel}' in line.split(' ', 1)[1].split(',') for line in client.sent('JOIN'))
+
+
+def test_joins_are_batched_within_ratelimit():
+    async def _test():
+        channels = [f'channel{i}' for i in range(12)]
+        server, pool = await _start_pool(channels, JoinScheduler(rate_limit=5, rate_window=.3))
+        client = server.clients[0]
+
+        await wait_until(lambda: client.sent('JOIN'))
+        # only the first 5 channels fit in the first window, and they are sent as a single JOIN
+        assert client.sent('JOIN') == ['JOIN ' + ','.join(f'#{chan}' for chan in channels[:5])]
+
+        await wait_until(lambda: pool.join_scheduler.joined == set(channels))
+        assert [len(line.split(',')) for line in client.sent('JOIN')] == [5, 5, 2]
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_unconfirmed_joins_are_retried():
+    async def _test():
+        scheduler = JoinScheduler(rate_limit=20, rate_window=1, confirm_timeout=.1, max_retries=2)
+        server = await FakeIrcServer().start()
+        server.ignored_joins.add('flaky')
+        server.ignored_joins.add('banned')
+        pool = IrcPool(connection_factory=server.connect, channels_per_connection=0, read_connections=1,
+                       write_connections=0)
+        pool.join_scheduler = scheduler
+        await pool.connect(['good', 'flaky', 'banned'])
+
+        await wait_until(lambda: _join_attempts(server.clients[0], 'flaky') == 2)
+        server.ignored_joins.discard('flaky')
+        await wait_until(lambda: 'flaky' in scheduler.joined and 'banned' in scheduler.failed)
+
+        assert scheduler.joined == {'good', 'flaky'}
+        # the first attempt plus 2 retries
+        assert _join_attempts(server.clients[0], 'banned') == 3
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_join_in_chat_text_does_not_confirm_join():
+    async def _test():
+        server = await FakeIrcServer().start()
+        server.ignored_joins.add('ignored')
+        server, pool = await _start_pool(['good', 'ignored'], JoinScheduler(confirm_timeout=5), server)
+        await wait_until(lambda: 'good' in pool.join_scheduler.joined)
+
+        nick = server.clients[0].nick
+        server.send_privmsg('good', 'bob', f':{nick}!{nick}@{nick}.tmi.twitch.tv JOIN #ignored')
+        while 'PRIVMSG' not in await pool.get_next_message():
+            pass
+
+        assert not pool.join_scheduler.is_joined('ignored')
+
+        pool.close()
+        await server.close()
+
+    run(_test())
@@ -0,0 +1,117 @@
+from twitchbot import IrcPool, metrics
+from tests.async_util import run
+from tests.fake_irc_server import FakeIrcServer, wait_until
+
+
+async def _start_pool(channels):
+    server = await FakeIrcServer().start()
+    pool = IrcPool(connection_factory=server.connect, channels_per_connection=0, read_connections=1,
+                   write_connections=0)
+    pool.reconnect_base_delay = .2
+    await pool.connect(channels)
+    return server, pool
+
+
+def test_reconnects_and_rejoins_after_server_closes_connection():
+    async def _test():
+        metrics.reset()
+        server, pool = await _start_pool(['a', 'b'])
+        conn = pool.readers[0]
+        await wait_until(lambda: pool.join_scheduler.joined == {'a', 'b'})
+
+        server.disconnect(server.clients[0])
+        await wait_until(lambda: not conn.connected)
+        # sent while the connection is down, must be delivered once it is back
+        pool.send('PRIVMSG #a :still here')
+
+        await wait_until(lambda: len(server.clients) == 2 and server.clients[1].channels == {'a', 'b'})
+        new_client = server.clients[1]
+        assert new_client.sent('PASS') and new_client.sent('NICK')
+        assert len(new_client.sent('CAP REQ')) == 3
+        assert new_client.sent('PRIVMSG') == ['PRIVMSG #a :still here']
+        await wait_until(lambda: pool.join_scheduler.joined == {'a', 'b'})
+
+        assert metrics.counters['irc.reconnects'] == 1
+        assert metrics.histogram('irc.reconnect_downtime').count == 1
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_reconnects_when_connection_goes_silent():
+    async def _test():
+        server, pool = await _start_pool(['a'])
+        pool.read_timeout = .3
+
+        await wait_until(lambda: len(server.clients) == 2 and server.clients[1].channels == {'a'})
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_quit_wakes_up_reader():
+    async def _test():
+        server, pool = await _start_pool(['a'])
+
+        pool.send('QUIT')
+        while await pool.get_next_message():
+            pass
+
+        assert pool.closing
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_ping_latency_is_measured():
+    async def _test():
+        metrics.reset()
+        server, pool = await _start_pool(['a'])
+        pool.ping_interval = .05
+
+        await wait_until(lambda: pool.readers[0].latency.count >= 2)
+        assert metrics.histogram('irc.ping_latency').count >= 2
+        assert server.clients[0].sent('PING :1')
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_reconnects_when_pong_is_missing():
+    async def _test():
+        metrics.reset()
+        server, pool = await _start_pool(['a'])
+        server.answer_pings = False
+        pool.ping_interval = .05
+        pool.pong_timeout = .1
+
+        await wait_until(lambda: metrics.counters['irc.pong_timeouts'] >= 1)
+        await wait_until(lambda: len(server.clients) == 2 and server.clients[1].channels == {'a'})
+
+        pool.close()
+        await server.close()
+
+    run(_test())
+
+
+def test_reconnects_after_read_error():
+    async def _test():
+        server, pool = await _start_pool(['a'])
+        await wait_until(lambda: server.clients[0].channels == {'a'})
+
+        # longer than the stream reader's limit, readline raises a ValueError
+        server.clients[0].send('x' * 2 ** 17)
+
+        await wait_until(lambda: len(server.clients) == 2 and server.clients[1].channels == {'a'})
+
+        pool.close()
+        await server.close()
+
+    run(_test())
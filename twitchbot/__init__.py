@@ -11,10 +11,15 @@ from .permission import *
 from .ratelimit import *
 from .regex import *
 from .util import *
+from .metrics import *
+from .join_scheduler import *
+from .chatter_scheduler import *
+from .irc_pool import *
 from .database import *
 from .bots import *
 from .api import *
 from .events import *
+from .event_queue import *
 from .loyalty_ticker import *
 from .disabled_commands import *
 from .duel import *
@@ -1,3 +1,4 @@
 from .streaminfoapi import *
+from .streampoller import *
 from .userinfoapi import *
 from .baseapi import *
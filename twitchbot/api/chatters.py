@@ -1,6 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
 
 from ..exceptions import BadTwitchAPIResponse
+from ..metrics import metrics
 from ..util import get_channel_chatters, CHANNEL_CHATTERS_URL
 
 __all__ = [
@@ -16,21 +18,125 @@ GLOBAL_MODS = 'global_mods'
 VIEWERS = 'viewers'
 CHATTER_COUNT = 'chatter_count'
 CHATTERS = 'chatters'
+# role of the channel's owner, who is always counted as a chatter but is not in any of the role sets
+BROADCASTER = 'broadcaster'
+
+# role in the chatters response -> the private Chatters attribute holding the users with that role
+ROLE_ATTRIBUTES = {
+    MODERATORS: '_mods',
+    VIPS: '_vips',
+    STAFF: '_staff',
+    ADMINS: '_admins',
+    GLOBAL_MODS: '_global_mods',
+    VIEWERS: '_viewers',
+}
+# key of the all_viewers snapshot in Chatters._snapshots
+ALL_VIEWERS = 'all_viewers'
 
 
 @dataclass
 class Chatters:
+    """
+    the users in a channel's chat, kept up to date from the channel's JOIN / PART messages
+    and the chatters api, whose responses are applied as a diff against the current chatters
+
+    every chatter has exactly one role, so the role sets are changed in place
+    and checking if a user is in chat is a single dict lookup,
+    the public role sets (ex: mods, viewers) and all_viewers are frozenset snapshots that are
+    only rebuilt after the chatters changed, so they can be iterated across awaits
+    """
     channel: str
-    mods: frozenset = frozenset()
-    vips: frozenset = frozenset()
-    staff: frozenset = frozenset()
-    admins: frozenset = frozenset()
-    global_mods: frozenset = frozenset()
-    viewers: frozenset = frozenset()
-    all_viewers: frozenset = frozenset()
     viewer_count: int = 0
+    _mods: Set[str] = field(default_factory=set, init=False, repr=False)
+    _vips: Set[str] = field(default_factory=set, init=False, repr=False)
+    _staff: Set[str] = field(default_factory=set, init=False, repr=False)
+    _admins: Set[str] = field(default_factory=set, init=False, repr=False)
+    _global_mods: Set[str] = field(default_factory=set, init=False, repr=False)
+    _viewers: Set[str] = field(default_factory=set, init=False, repr=False)
+    # chatter -> role
+    _roles: Dict[str, str] = field(default_factory=dict, init=False, repr=False)
+    # chatter -> the last update their role was confirmed in, chatters not in an update's response are removed
+    _seen: Dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    _generation: int = field(default=0, init=False, repr=False)
+    # users that joined / parted since the last update was requested, the response may not include that yet
+    _joined: Set[str] = field(default_factory=set, init=False, repr=False)
+    _parted: Set[str] = field(default_factory=set, init=False, repr=False)
+    # the chatters of the last response, used to skip applying it when nothing changed
+    _last_chatters: dict = field(default=None, init=False, repr=False, compare=False)
+    # attribute -> frozenset of it, cleared whenever a chatter is added, removed or changes role
+    _snapshots: Dict[str, frozenset] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.channel = self.channel.lower()
+        self._set_role(self.channel, BROADCASTER)
+
+    @property
+    def all_viewers(self) -> frozenset:
+        """every chatter including the broadcaster"""
+        return self._snapshot(ALL_VIEWERS, self._roles)
+
+    @property
+    def mods(self) -> frozenset:
+        return self._snapshot('_mods', self._mods)
+
+    @property
+    def vips(self) -> frozenset:
+        return self._snapshot('_vips', self._vips)
+
+    @property
+    def staff(self) -> frozenset:
+        return self._snapshot('_staff', self._staff)
+
+    @property
+    def admins(self) -> frozenset:
+        return self._snapshot('_admins', self._admins)
+
+    @property
+    def global_mods(self) -> frozenset:
+        return self._snapshot('_global_mods', self._global_mods)
+
+    @property
+    def viewers(self) -> frozenset:
+        return self._snapshot('_viewers', self._viewers)
+
+    def _snapshot(self, key: str, users) -> frozenset:
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = self._snapshots[key] = frozenset(users)
+        return snapshot
+
+    def role(self, user: str) -> Optional[str]:
+        """returns the user's role (ex: moderators, viewers), or None if the user is not in chat"""
+        return self._roles.get(user.lower())
+
+    def join(self, user: str):
+        """adds a user that joined the channel as a viewer, users already in chat keep their role"""
+        user = user.lower()
+        self._parted.discard(user)
+        self._joined.add(user)
+        self._seen[user] = self._generation
+        if user not in self._roles:
+            self._set_role(user, VIEWERS)
+            self.viewer_count += 1
+
+    def part(self, user: str):
+        """removes a user that left the channel"""
+        user = user.lower()
+        if user == self.channel:
+            return
+
+        self._joined.discard(user)
+        self._parted.add(user)
+        if user in self._roles:
+            self._remove(user)
+            self.viewer_count = max(0, self.viewer_count - 1)
+
+    async def update(self) -> bool:
+        """requests the channel's chatters, returns True if they changed since the last update"""
+        # only JOIN / PART messages received from here on are newer than the response
+        self._joined.clear()
+        self._parted.clear()
 
-    async def update(self):
         json = ''
         try:
             json = await get_channel_chatters(self.channel)
@@ -38,22 +144,70 @@ class Chatters:
             chatters = json['chatters']
             self._verify_chatters_response_is_valid(chatters)
 
-            self.mods = frozenset(chatters[MODERATORS])
-            self.vips = frozenset(chatters[VIPS])
-            self.staff = frozenset(chatters[STAFF])
-            self.admins = frozenset(chatters[ADMINS])
-            self.global_mods = frozenset(chatters[GLOBAL_MODS])
-            self.viewers = frozenset(chatters[VIEWERS])
             self.viewer_count = json[CHATTER_COUNT]
-            self.all_viewers = self.vips | self.mods | self.staff | self.admins | self.global_mods | self.viewers | {self.channel}
+            if chatters == self._last_chatters:
+                metrics.increment('chatters.unchanged')
+                return False
+
+            self._last_chatters = chatters
+            return self._apply(chatters)
         except Exception as e:
             print(f'\nCHATTERS API ERROR\njson received: {json}\n{e}\nEND CHATTERS API ERROR\n')
+            return False
+
+    def _apply(self, chatters: dict) -> bool:
+        self._generation += 1
+        generation = self._generation
+        changed = 0
+
+        seen, roles, parted = self._seen, self._roles, self._parted
+        for role in ROLE_ATTRIBUTES:
+            for user in chatters[role]:
+                if parted and user in parted:
+                    continue
+                seen[user] = generation
+                if roles.get(user) != role:
+                    self._set_role(user, role)
+                    changed += 1
+
+        for user in self._joined:
+            seen[user] = generation
+        seen[self.channel] = generation
+
+        stale = [user for user, last_seen in seen.items() if last_seen != generation]
+        for user in stale:
+            self._remove(user)
+
+        changed += len(stale)
+        metrics.increment('chatters.changes', changed)
+        return changed > 0
+
+    def _set_role(self, user: str, role: str):
+        self._snapshots.clear()
+        old_role = self._roles.get(user)
+        if old_role in ROLE_ATTRIBUTES:
+            getattr(self, ROLE_ATTRIBUTES[old_role]).discard(user)
+
+        self._roles[user] = role
+        self._seen.setdefault(user, self._generation)
+        if role in ROLE_ATTRIBUTES:
+            getattr(self, ROLE_ATTRIBUTES[role]).add(user)
+
+    def _remove(self, user: str):
+        self._snapshots.clear()
+        role = self._roles.pop(user, None)
+        self._seen.pop(user, None)
+        if role in ROLE_ATTRIBUTES:
+            getattr(self, ROLE_ATTRIBUTES[role]).discard(user)
 
     def __contains__(self, item):
-        return item.lower() in self.all_viewers
+        return item.lower() in self._roles
 
     def __iter__(self):
-        yield from self.all_viewers
+        yield from tuple(self._roles)
+
+    def __len__(self):
+        return len(self._roles)
 
     def _verify_response_is_dict(self, json):
         if not isinstance(json, dict):
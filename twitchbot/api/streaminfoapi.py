@@ -26,7 +26,13 @@ class StreamInfoApi(Api):
 
         :param log: should errors be logged?
         """
-        data = await util.get_stream_data(self.user, self.headers)
+        await self.apply(await util.get_stream_data(self.user, self.headers), log)
+
+    async def apply(self, data: dict, log=False):
+        """
+        updates the stream info from the stream data returned by the helix streams endpoint,
+        used by `update()` and by the stream poller, which requests the streams of many channels at once
+        """
         try:
             self.viewer_count = data['viewer_count']
             self.title = data['title']
@@ -0,0 +1,71 @@
+import traceback
+from asyncio import sleep
+from typing import Dict, List
+
+from .streaminfoapi import StreamInfoApi
+from .. import util
+from ..config import get_client_id
+from ..metrics import metrics
+
+__all__ = ['StreamPoller', 'stream_poller', 'STREAM_POLL_INTERVAL']
+
+# seconds between polls of every channel's stream status
+STREAM_POLL_INTERVAL = 60
+
+
+class StreamPoller:
+    """
+    keeps the `StreamInfoApi` of every joined channel up to date,
+    the channels are requested `batch_size` at a time, so 500 channels take 5 requests per poll instead of 500
+    """
+
+    def __init__(self, interval: float = STREAM_POLL_INTERVAL, batch_size: int = util.STREAMS_API_MAX_LOGINS):
+        self.interval: float = interval
+        self.batch_size: int = max(1, min(batch_size, util.STREAMS_API_MAX_LOGINS))
+        self.apis: Dict[str, StreamInfoApi] = {}
+
+    def register(self, api: StreamInfoApi):
+        self.apis[api.user.lower()] = api
+
+    def unregister(self, user: str):
+        self.apis.pop(user.lower(), None)
+
+    def batches(self) -> List[List[str]]:
+        logins = sorted(self.apis)
+        return [logins[i:i + self.batch_size] for i in range(0, len(logins), self.batch_size)]
+
+    async def poll(self) -> int:
+        """updates the stream info of every registered channel once, returns the amount of requests made"""
+        batches = self.batches()
+        for batch in batches:
+            try:
+                streams = await util.get_streams_data(batch)
+            except Exception as e:
+                print(f'\nfailed to get the stream status of {len(batch)} channels, details:\n'
+                      f'error: {type(e)}\n'
+                      f'reason: {e}\n'
+                      f'stack trace:')
+                traceback.print_exc()
+                metrics.increment('streams.poll_failures')
+                continue
+
+            for login in batch:
+                api = self.apis.get(login)
+                # channels without stream data are offline
+                if api is not None:
+                    await api.apply(streams.get(login, {}))
+
+        metrics.increment('streams.poll_requests', len(batches))
+        return len(batches)
+
+    async def poll_loop(self):
+        """polls every `interval` seconds, does nothing if the bot has no client id to call the api with"""
+        if get_client_id() == 'CLIENT_ID':
+            return
+
+        while True:
+            await self.poll()
+            await sleep(self.interval)
+
+
+stream_poller = StreamPoller()
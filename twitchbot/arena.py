@@ -2,7 +2,7 @@ import asyncio
 from asyncio import Future, ensure_future
 from twitchbot.channel import Channel
 from secrets import choice
-from twitchbot.database import add_balance, get_currency_name
+from twitchbot.database import settle_bet_async, get_currency_name
 from .config import cfg
 
 ARENA_WAIT_TIME = 30
@@ -40,15 +40,16 @@ class Arena:
             await self.channel.send_message(
                 f'not enough users joined the arena to start, everyone that entered was issued a refund')
 
+            # paid out through the ledger like the entry fees, a stake of 0 can not fail
             for user in self.users:
-                add_balance(self.channel.name, user, self.entry_fee)
+                await settle_bet_async(self.channel.name, user, 0, self.entry_fee)
 
         else:
             currency = get_currency_name(self.channel.name).name
             winner = choice(tuple(self.users))
             winnings = self.entry_fee * len(self.users)
 
-            add_balance(self.channel.name, winner, winnings)
+            await settle_bet_async(self.channel.name, winner, 0, winnings)
             await self.channel.send_message(
                 choice(VICTORY_MESSAGES).format(winner=winner, winnings=winnings, currency=currency))
 
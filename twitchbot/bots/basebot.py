@@ -4,29 +4,39 @@ import time
 from asyncio import get_event_loop
 from typing import Optional
 
-from .. import util, create_irc
+from ..api import stream_poller
 from ..channel import Channel, channels
+from ..chatter_scheduler import chatter_poller
 from ..command import Command, commands, CustomCommandAction, is_command_on_cooldown, get_time_since_execute, \
     update_command_last_execute
 from ..config import cfg, get_nick
 from ..config import generate_config
-from ..database import get_custom_command
+from ..database import get_custom_command_async, balance_ledger, wal_checkpoint_loop
 from ..disabled_commands import is_command_disabled
-from ..emote import update_global_emotes
+from ..emote import load_global_emotes, global_emote_refresh_loop
 from ..enums import Event
 from ..enums import MessageType, CommandContext
 from ..events import trigger_event
-from ..exceptions import InvalidArgumentsError
+from ..exceptions import InvalidArgumentsError, IrcAuthenticationError
 from ..irc import Irc
+from ..irc_pool import IrcPool
+from ..metrics import measure_loop_lag
 from ..message import Message
 from ..modloader import Mod
 from ..modloader import mods
 from ..modloader import trigger_mod_event
 from ..permission import perms
 from ..shared import set_bot
-from ..util import stop_all_tasks
+from ..util import stop_all_tasks, add_task, close_http_session
 from ..command_whitelist import is_command_whitelisted, send_message_on_command_whitelist_deny
 
+LOOP_LAG_TASK_NAME = '_loop_lag_monitor'
+BALANCE_FLUSH_TASK_NAME = '_balance_ledger_flush'
+WAL_CHECKPOINT_TASK_NAME = '_wal_checkpoint'
+STREAM_POLL_TASK_NAME = '_stream_poller'
+CHATTER_POLL_TASK_NAME = '_chatter_poller'
+EMOTE_REFRESH_TASK_NAME = '_global_emote_refresh'
+
 
 # noinspection PyMethodMayBeStatic
 class BaseBot:
@@ -148,47 +158,29 @@ class BaseBot:
 
     async def _create_irc(self):
         """
-        creates the async reader/writer (using asyncio.open_connection() if not already exist),
+        creates the irc connection pool, the connections themselves are opened by `_connect()`
         """
-        self.irc = await create_irc()
-
-    def _request_permissions(self):
-        """requests permissions from twitch to be able to gets message tags, receive whispers, ect"""
-        # enable receiving/sending whispers
-        self.irc.send('CAP REQ :twitch.tv/commands')
-
-        # enable seeing bit donations and such
-        self.irc.send('CAP REQ :twitch.tv/tags')
-
-        # enable seeing user joins
-        self.irc.send('CAP REQ :twitch.tv/membership')
+        self.irc = IrcPool()
 
     async def _connect(self):
         """connects to twitch, sends auth info, and joins the channels in the config"""
         print(f'logging in as {get_nick()}')
 
-        util.send_auth(self.irc)
-
-        resp = (await self.irc.get_next_message()).lower()
-        if 'authentication failed' in resp:
-            print(
-                '\n\n=========AUTHENTICATION FAILED=========\n\n'
-                'check that your oauth is correct and valid and that the nick in the config is correct'
-                '\nthere is a chance that oauth was good, but is not anymore\n'
-                'the oauth token can be regenerated using this website: \n\n\thttps://twitchapps.com/tmi/')
-            input('\n\npress enter to exit')
-            exit(1)
-        elif 'welcome' not in resp:
-            print(
-                f'\n\ntwitch gave a bad response to sending authentication to twitch server\nbelow is the message received from twitch:\n\n\t{resp}')
+        try:
+            await self.irc.connect(channels)
+        except IrcAuthenticationError as e:
+            if 'authentication failed' in e.response.lower():
+                print(
+                    '\n\n=========AUTHENTICATION FAILED=========\n\n'
+                    'check that your oauth is correct and valid and that the nick in the config is correct'
+                    '\nthere is a chance that oauth was good, but is not anymore\n'
+                    'the oauth token can be regenerated using this website: \n\n\thttps://twitchapps.com/tmi/')
+            else:
+                print(
+                    f'\n\ntwitch gave a bad response to sending authentication to twitch server\nbelow is the message received from twitch:\n\n\t{e.response}')
             input('\n\npress enter to exit')
             exit(1)
 
-        self._request_permissions()
-
-        for chan in channels.values():
-            self.irc.send(f'JOIN #{chan.name}')
-
     async def get_command_from_msg(self, msg: Message) -> Optional[Command]:
         """
         checks if the start of the msg matches any command names
@@ -201,7 +193,7 @@ class BaseBot:
         if cmd:
             return cmd
 
-        cmd = get_custom_command(msg.channel_name, msg.parts[0].lower())
+        cmd = await get_custom_command_async(msg.channel_name, msg.parts[0].lower())
         if cmd:
             return CustomCommandAction(cmd)
 
@@ -267,6 +259,15 @@ class BaseBot:
         self._running = False
         stop_all_tasks()
 
+        # flush() would block the event loop while a write on the database executor holds the ledger's write lock
+        loop = get_event_loop()
+        if loop.is_running():
+            loop.create_task(balance_ledger.flush_async())
+            loop.create_task(close_http_session())
+        else:
+            balance_ledger.flush()
+            loop.run_until_complete(close_http_session())
+
     def run(self):
         """runs/starts the bot, this is a blocking function that starts the mainloop"""
         self._running = True
@@ -279,10 +280,17 @@ class BaseBot:
             stop_all_tasks()
             return
 
-        await update_global_emotes()
+        # the emotes from the last run are used until the refresh loop gets the current ones
+        load_global_emotes()
+        add_task(EMOTE_REFRESH_TASK_NAME, global_emote_refresh_loop())
+        add_task(LOOP_LAG_TASK_NAME, measure_loop_lag())
+        add_task(BALANCE_FLUSH_TASK_NAME, balance_ledger.flush_loop())
+        add_task(WAL_CHECKPOINT_TASK_NAME, wal_checkpoint_loop())
 
         await self._create_irc()
         self._create_channels()
+        add_task(STREAM_POLL_TASK_NAME, stream_poller.poll_loop())
+        add_task(CHATTER_POLL_TASK_NAME, chatter_poller.run())
 
         await self._connect()
         await self.on_connected()
@@ -296,6 +304,8 @@ class BaseBot:
                 continue
 
             msg = Message(raw_msg, irc=self.irc, bot=self)
+            if msg.type is MessageType.PRIVMSG:
+                chatter_poller.record_message(msg.channel_name)
 
             await self.on_raw_message(msg)
             get_event_loop().create_task(trigger_mod_event(Event.on_raw_message, msg, channel=msg.channel_name))
@@ -324,6 +334,7 @@ class BaseBot:
                 event_coro = trigger_event(Event.on_privmsg_received, msg)
 
             elif msg.type is MessageType.USER_JOIN:
+                msg.channel.chatters.join(msg.author)
                 # the bot has joined a channel
                 if msg.author == get_nick():
                     coro = self.on_channel_joined(msg.channel)
@@ -337,6 +348,7 @@ class BaseBot:
                     event_coro = trigger_event(Event.on_user_join, msg.author, msg.channel)
 
             elif msg.type is MessageType.USER_PART:
+                msg.channel.chatters.part(msg.author)
                 coro = self.on_user_part(msg.author, msg.channel)
                 mod_coro = trigger_mod_event(Event.on_user_part, msg.author, msg.channel, channel=msg.channel_name)
                 event_coro = trigger_event(Event.on_user_part, msg.author, msg.channel)
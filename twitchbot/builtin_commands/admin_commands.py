@@ -1,6 +1,6 @@
 import asyncio
 
-from twitchbot import Command, CommandContext, Message, get_bot, stop_all_tasks
+from twitchbot import Command, CommandContext, Message, get_bot, stop_all_tasks, metrics
 
 ADMIN_COMMAND_PERMISSION = 'admin'
 
@@ -16,3 +16,16 @@ async def cmd_shutdown(msg: Message, *args):
         await asyncio.sleep(1)
 
     get_bot().shutdown()
+
+
+@Command('irchealth', context=CommandContext.BOTH, permission=ADMIN_COMMAND_PERMISSION,
+         help='shows how many irc connections are up, their PING latency and how often they reconnected')
+async def cmd_irc_health(msg: Message, *args):
+    latency = metrics.histogram('irc.ping_latency').summary()
+    await msg.reply(
+        f'irc connections: {metrics.gauges.get("irc.connections", 0):.0f} '
+        f'({metrics.gauges.get("irc.connections_down", 0):.0f} down) | '
+        f'ping latency: last {latency["last"] * 1000:.0f}ms, p50 {latency["p50"] * 1000:.0f}ms, '
+        f'p95 {latency["p95"] * 1000:.0f}ms | '
+        f'reconnects: {metrics.counters["irc.reconnects"]:.0f}, '
+        f'downtime: {metrics.counters["irc.downtime_seconds"]:.0f}s')
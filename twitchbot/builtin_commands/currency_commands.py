@@ -11,7 +11,6 @@ from twitchbot import (
     get_currency_name,
     set_balance,
     get_balance,
-    session,
     get_balance_from_msg,
     add_balance,
     cfg,
@@ -22,9 +21,11 @@ from twitchbot import (
     subtract_balance,
     get_duel,
     add_balance_to_all,
-    Balance,
     subtract_balance_from_all,
-    get_nick)
+    get_balance_async,
+    get_leaderboard_async,
+    transfer_balance_async,
+    settle_bet_async)
 
 PREFIX = cfg.prefix
 MANAGE_CURRENCY_PERMISSION = 'manage_currency'
@@ -160,9 +161,6 @@ async def cmd_give(msg: Message, *args):
     if not msg.mentions or msg.mentions[0] not in msg.channel.chatters:
         raise InvalidArgumentsError(reason=f'no viewer found by the name "{(msg.mentions or args)[0]}"')
 
-    caller = get_balance_from_msg(msg)
-    target = get_balance(msg.channel_name, msg.mentions[0])
-
     try:
         give = int(args[1])
     except ValueError:
@@ -173,16 +171,12 @@ async def cmd_give(msg: Message, *args):
 
     cur_name = get_currency_name(msg.channel_name).name
 
-    if caller.balance < give:
+    balances = await transfer_balance_async(msg.channel_name, msg.author, msg.mentions[0], give)
+    if balances is None:
         raise InvalidArgumentsError(reason=f"{msg.mention} you don't have enough {cur_name}", cmd=cmd_give)
 
-    caller.balance -= give
-    target.balance += give
-
-    session.commit()
-
     await msg.reply(
-        f"@{msg.author} you gave @{args[0]} {give} {cur_name}, @{args[0]}'s balance is now {target.balance}")
+        f"@{msg.author} you gave @{args[0]} {give} {cur_name}, @{args[0]}'s balance is now {balances[1]}")
 
 
 @Command('gamble', syntax='<dice_sides> <bet>',
@@ -205,26 +199,23 @@ async def cmd_gamble(msg: Message, *args):
     elif sides < 2:
         raise InvalidArgumentsError(reason='sides cannot be less than 2', cmd=cmd_gamble)
 
-    bal = get_balance_from_msg(msg)
     cur_name = get_currency_name(msg.channel_name).name
-
-    if bal.balance < bet:
-        raise InvalidArgumentsError(reason=f"{msg.mention} you don't have enough {cur_name}", cmd=cmd_gamble)
-
     n = randbelow(sides) + 1
 
     if n == 1:
-        if sides >= 6:
-            bet *= 2
-        gain = bet + int(bet * (sides / 6))
-        bal.balance += gain
-        await msg.reply(f'you rolled {n} and won {gain} {cur_name}')
-
+        boosted_bet = bet * 2 if sides >= 6 else bet
+        gain = boosted_bet + int(boosted_bet * (sides / 6))
+        # the bet is taken and paid back with the gain on top
+        settled = await settle_bet_async(msg.channel_name, msg.author, bet, bet + gain)
+        reply = f'you rolled {n} and won {gain} {cur_name}'
     else:
-        bal.balance -= bet
-        await msg.reply(f'you rolled {n} and lost your bet of {bet} {cur_name}')
+        settled = await settle_bet_async(msg.channel_name, msg.author, bet)
+        reply = f'you rolled {n} and lost your bet of {bet} {cur_name}'
+
+    if settled is None:
+        raise InvalidArgumentsError(reason=f"{msg.mention} you don't have enough {cur_name}", cmd=cmd_gamble)
 
-    session.commit()
+    await msg.reply(reply)
 
 
 last_mine_time = {}
@@ -239,7 +230,6 @@ async def cmd_mine(msg: Message, *args):
     if key not in last_mine_time or diff >= 0:
         bal = get_balance_from_msg(msg)
         bal.balance += mine_gain
-        session.commit()
         last_mine_time[key] = datetime.now() + timedelta(minutes=5)
 
         await msg.reply(
@@ -252,18 +242,30 @@ async def cmd_mine(msg: Message, *args):
 
 @Command('top', help="lists the top 10 balance holders")
 async def cmd_top(msg: Message, *args):
-    results = (session.query(Balance)
-               .filter(Balance.channel == msg.channel_name, Balance.user != msg.channel_name,
-                       Balance.user != get_nick().lower())
-               .order_by(Balance.balance.desc())
-               .limit(10))
-
-    b: Balance
-    message = ' | '.join(f'{i}: {b.user} => {b.balance}' for i, b in enumerate(results, 1))
+    leaderboard = await get_leaderboard_async(msg.channel_name)
+    message = ' | '.join(f'{i}: {user} => {balance}' for i, (user, balance) in enumerate(leaderboard.top(10), 1))
 
     await msg.reply(message or 'no users found')
 
 
+@Command('rank', syntax='(target)', help="gets the caller's (or target's if specified) rank on the balance leaderboard")
+async def cmd_rank(msg: Message, *args):
+    if args:
+        target = args[0].lstrip('@').lower()
+    else:
+        target = msg.author
+        # loads the caller's balance so they are ranked even if they never used currency before
+        await get_balance_async(msg.channel_name, target)
+
+    leaderboard = await get_leaderboard_async(msg.channel_name)
+    rank = leaderboard.rank(target)
+    if rank is None:
+        raise InvalidArgumentsError(reason=f'{target} is not ranked on the leaderboard', cmd=cmd_rank)
+
+    await msg.reply(f'@{target} is rank {rank} of {len(leaderboard)} with {leaderboard.balance(target)} '
+                    f'{get_currency_name(msg.channel_name).name}')
+
+
 running_arenas: Dict[str, Arena] = {}
 
 
@@ -272,9 +274,6 @@ running_arenas: Dict[str, Arena] = {}
               'if not enough ppl enter the arena is cancelled and everyone is refunded,'
               'the winner gets all of the entry_fee\'s paid')
 async def cmd_arena(msg: Message, *args):
-    def _can_pay_entry_fee(fee):
-        return get_balance(msg.channel_name, msg.author).balance >= fee
-
     def _remove_running_arena_entry(arena: Arena):
         try:
             del running_arenas[arena.channel.name]
@@ -291,15 +290,17 @@ async def cmd_arena(msg: Message, *args):
                 whisper=True,
                 msg='you are already entered the in the arena')
 
-        elif not _can_pay_entry_fee(arena.entry_fee):
+        elif await settle_bet_async(msg.channel_name, msg.author, arena.entry_fee) is None:
             await msg.reply(
                 whisper=True,
                 msg=f'{msg.mention} you do not have enough {curname} '
                     f'to join the arena, entry_fee is {arena.entry_fee} {curname}')
             return
 
-        arena.add_user(msg.author)
-        add_balance(msg.channel_name, msg.author, -arena.entry_fee)
+        # the arena may have started while the entry fee was being taken
+        if not arena.add_user(msg.author):
+            await settle_bet_async(msg.channel_name, msg.author, 0, arena.entry_fee)
+            return await msg.reply(whisper=True, msg=f'{msg.mention} the arena has already started')
 
         await msg.reply(
             whisper=True,
@@ -320,7 +321,7 @@ async def cmd_arena(msg: Message, *args):
             raise InvalidArgumentsError(reason=f'entry fee cannot be less than {ARENA_DEFAULT_ENTRY_FEE}',
                                         cmd=cmd_arena)
 
-        if not _can_pay_entry_fee(entry_fee):
+        if await settle_bet_async(msg.channel_name, msg.author, entry_fee) is None:
             await msg.reply(
                 whisper=True,
                 msg=f'{msg.mention} you do not have {entry_fee} {curname}')
@@ -330,8 +331,6 @@ async def cmd_arena(msg: Message, *args):
         arena.start()
         arena.add_user(msg.author)
 
-        subtract_balance(msg.channel_name, msg.author, arena.entry_fee)
-
         running_arenas[msg.channel_name] = arena
 
 
@@ -385,8 +384,9 @@ async def cmd_accept(msg: Message, *args):
 
     loser = msg.author if winner == msg.author else challenger
 
-    add_balance(msg.channel_name, winner, bet)
-    subtract_balance(msg.channel_name, loser, bet)
-
     currency_name = get_currency_name(msg.channel_name).name
+    if await transfer_balance_async(msg.channel_name, loser, winner, bet) is None:
+        return await msg.reply(f'@{winner} has won the duel, but @{loser} does not have the {bet} {currency_name} '
+                               f'that was bet, so the duel was called off')
+
     await msg.reply(f'@{winner} has won the duel, {bet} {currency_name} went to the winner')
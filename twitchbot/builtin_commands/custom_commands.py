@@ -1,11 +1,11 @@
 from twitchbot import (
     Message,
-    add_custom_command,
-    get_custom_command,
-    delete_custom_command,
-    custom_command_exist,
+    add_custom_command_async,
+    get_custom_command_async,
+    delete_custom_command_async,
+    custom_command_exist_async,
+    set_custom_command_response_async,
     CustomCommand,
-    session,
     cfg,
     Command,
     InvalidArgumentsError)
@@ -36,11 +36,11 @@ async def cmd_add_custom_command(msg: Message, *args):
         raise InvalidArgumentsError(reason='response cannot have . or / as the starting character',
                                     cmd=cmd_add_custom_command)
 
-    if custom_command_exist(msg.channel_name, name):
+    if await custom_command_exist_async(msg.channel_name, name):
         raise InvalidArgumentsError(reason='custom command already exist by that name',
                                     cmd=cmd_add_custom_command)
 
-    if add_custom_command(CustomCommand.create(msg.channel_name, name, resp)):
+    if await add_custom_command_async(CustomCommand.create(msg.channel_name, name, resp)):
         await msg.reply('successfully added command')
     else:
         await msg.reply('failed to add command')
@@ -59,14 +59,10 @@ async def cmd_update_custom_command(msg: Message, *args):
         raise InvalidArgumentsError(reason='response cannot have . or / as the starting character',
                                     cmd=cmd_update_custom_command)
 
-    cmd = get_custom_command(msg.channel_name, name)
-    if cmd is None:
+    if not await set_custom_command_response_async(msg.channel_name, name, resp):
         raise InvalidArgumentsError(reason=f'custom command "{name}" does not exist', cmd=cmd_update_custom_command)
 
-    cmd.response = resp
-    session.commit()
-
-    await msg.reply(f'successfully updated {cmd.name}')
+    await msg.reply(f'successfully updated {name}')
 
 
 @Command('delcmd', permission=PERMISSION, syntax='<name>', help='deletes a custom commands')
@@ -74,11 +70,11 @@ async def cmd_del_custom_command(msg: Message, *args):
     if not args:
         raise InvalidArgumentsError(reason='missing required arguments', cmd=cmd_del_custom_command)
 
-    cmd = get_custom_command(msg.channel_name, args[0].lower())
+    cmd = await get_custom_command_async(msg.channel_name, args[0].lower())
     if cmd is None:
         raise InvalidArgumentsError(reason=f'no command found for "{args[0]}"', cmd=cmd_del_custom_command)
 
-    if delete_custom_command(msg.channel_name, cmd.name):
+    if await delete_custom_command_async(msg.channel_name, cmd.name):
         await msg.reply(f'successfully deleted command {cmd.name}')
     else:
         await msg.reply(f'failed to delete command {cmd.name}')
@@ -89,7 +85,7 @@ async def cmd_get_custom_command(msg: Message, *args):
     if not args:
         raise InvalidArgumentsError(reason='missing required arguments', cmd=cmd_get_custom_command)
 
-    cmd = get_custom_command(msg.channel_name, args[0].lower())
+    cmd = await get_custom_command_async(msg.channel_name, args[0].lower())
     if cmd is None:
         raise InvalidArgumentsError(reason=f'no command found for "{args[0]}"', cmd=cmd_get_custom_command)
 
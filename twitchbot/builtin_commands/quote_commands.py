@@ -3,10 +3,10 @@ import re
 from twitchbot import (
     Command,
     Message,
-    delete_quote_by_id,
-    add_quote,
-    get_quote_by_alias,
-    get_quote,
+    delete_quote_by_id_async,
+    add_quote_async,
+    get_quote_by_alias_async,
+    get_quote_async,
     Quote,
     cfg,
     InvalidArgumentsError
@@ -40,10 +40,10 @@ async def cmd_add_quote(msg: Message, *args):
                 cmd=cmd_add_quote)
 
         alias = m.group(1)
-        if get_quote_by_alias(msg.channel_name, alias) is not None:
+        if await get_quote_by_alias_async(msg.channel_name, alias) is not None:
             raise InvalidArgumentsError(reason='there is already a quote with that alias', cmd=cmd_add_quote)
 
-    if add_quote(Quote.create(channel=msg.channel_name, value=args[0], user=user, alias=alias)):
+    if await add_quote_async(Quote.create(channel=msg.channel_name, value=args[0], user=user, alias=alias)):
         resp = 'successfully added quote'
     else:
         resp = 'failed to add quote, already exist'
@@ -56,7 +56,7 @@ async def cmd_get_quote(msg: Message, *args):
     if not args:
         raise InvalidArgumentsError(reason='missing required argument', cmd=cmd_get_quote)
 
-    quote = get_quote(msg.channel_name, args[0])
+    quote = await get_quote_async(msg.channel_name, args[0])
     if quote is None:
         raise InvalidArgumentsError(reason='no quote found', cmd=cmd_get_quote)
 
@@ -68,9 +68,9 @@ async def cmd_del_quote(msg: Message, *args):
     if not args:
         raise InvalidArgumentsError(reason='missing required argument', cmd=cmd_del_quote)
 
-    quote = get_quote(msg.channel_name, args[0])
+    quote = await get_quote_async(msg.channel_name, args[0])
     if quote is None:
         raise InvalidArgumentsError(reason='no quote found', cmd=cmd_del_quote)
 
-    delete_quote_by_id(msg.channel_name, quote.id)
+    await delete_quote_by_id_async(msg.channel_name, quote.id)
     await msg.reply(f'successfully deleted quote, id: {quote.id}, alias: {quote.alias}')
@@ -1,16 +1,17 @@
-import asyncio
 import typing
+import warnings
 from datetime import datetime
 from typing import Dict
 
-from .api import StreamInfoApi
+from .api import StreamInfoApi, stream_poller
 from .api.chatters import Chatters
+from .chatter_scheduler import chatter_poller
 from .config import get_nick, get_client_id
-from .data import UserFollowers
+from .data import FollowerList, UserFollowers
 from .irc import Irc
 from .permission import perms
 from .shared import get_bot
-from .util import get_user_followers, get_headers
+from .util import get_all_user_followers, get_user_followers, get_headers
 
 if typing.TYPE_CHECKING:
     from .bots import BaseBot
@@ -33,6 +34,10 @@ class Channel:
     async def followers(self) -> UserFollowers:
         return await get_user_followers(self.name, get_headers())
 
+    async def all_followers(self) -> FollowerList:
+        """returns every follower of the channel, see get_all_user_followers()"""
+        return await get_all_user_followers(self.name, get_headers())
+
     @property
     def live(self):
         return self.stats.started_at != datetime.min
@@ -46,17 +51,26 @@ class Channel:
     # async def ban(self, user):
     #     await self.send_command(f'ban {user}')
 
+    async def update_chatters(self):
+        """updates the channel's chatters, and if the bot is a mod / vip in the channel"""
+        if await self.chatters.update():
+            self.is_mod = get_nick().lower() in self.chatters.mods
+            self.is_vip = get_nick().lower() in self.chatters.vips
+
     async def update_loop(self):
-        if get_client_id() != 'CLIENT_ID':
-            while True:
-                await self.chatters.update()
-                await self.stats.update()
-                self.is_mod = get_nick().lower() in self.chatters.mods
-                self.is_vip = get_nick().lower() in self.chatters.vips
-                await asyncio.sleep(60)
+        """deprecated, registers the channel with the pollers like `start_update_loop()` instead of polling itself"""
+        warnings.warn('Channel.update_loop() is deprecated, the chatters and stream info of every channel are polled '
+                      'by chatter_poller and stream_poller, use Channel.start_update_loop() to register a channel '
+                      'with them', DeprecationWarning, stacklevel=2)
+        # registering again would reschedule the channel's chatter polls
+        if self.name.lower() not in chatter_poller.polls:
+            self.start_update_loop()
 
     def start_update_loop(self):
-        asyncio.get_event_loop().create_task(self.update_loop())
+        # the stream info of every channel is updated by the stream poller, a few channels per request,
+        # the chatters are polled by the chatter scheduler, which spreads the channels' polls over time
+        stream_poller.register(self.stats)
+        chatter_poller.register(self)
 
     async def ban(self, user: str, reason: str = ''):
         """purges a user's messages then permabans them from the channel"""
@@ -0,0 +1,145 @@
+import random
+import traceback
+from asyncio import Event, Semaphore, Task, ensure_future, get_event_loop
+from heapq import heappop, heappush
+from itertools import count
+from typing import Dict, Iterator, List, Optional, Set, Tuple, TYPE_CHECKING
+
+from .config import get_client_id
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from .channel import Channel
+
+__all__ = ('ChatterPollScheduler', 'chatter_poller', 'CHATTER_POLL_INTERVAL', 'CHATTER_IDLE_POLL_INTERVAL',
+           'CHATTER_BUSY_POLL_INTERVAL', 'CHATTER_BUSY_CHAT_RATE', 'CHATTER_POLL_JITTER', 'CHATTER_MAX_CONCURRENT_POLLS')
+
+# seconds between chatter polls of a channel with normal activity
+CHATTER_POLL_INTERVAL = 60
+# seconds between polls of a offline channel that nobody has chatted in since the last poll
+CHATTER_IDLE_POLL_INTERVAL = 300
+# seconds between polls of a channel whose chat is moving at least CHATTER_BUSY_CHAT_RATE messages per minute
+CHATTER_BUSY_POLL_INTERVAL = 30
+CHATTER_BUSY_CHAT_RATE = 30
+# intervals are randomly made up to this fraction shorter or longer, so polls do not line up again over time
+CHATTER_POLL_JITTER = .1
+CHATTER_MAX_CONCURRENT_POLLS = 5
+
+
+class ScheduledPoll:
+    __slots__ = 'channel', 'due', 'messages', 'last_poll'
+
+    def __init__(self, channel: 'Channel', due: float, now: float):
+        self.channel: 'Channel' = channel
+        self.due: float = due
+        # chat messages received since the last poll
+        self.messages: int = 0
+        self.last_poll: float = now
+
+
+class ChatterPollScheduler:
+    """
+    polls the chatters of every registered channel, spreading the polls over the poll interval
+    instead of polling every channel at the same moment
+
+    a channel's first poll happens at a random point in the first interval, after that each channel's interval
+    adapts to its activity (see the CHATTER_*_INTERVAL constants), at most `max_concurrent` polls run at once
+    """
+
+    def __init__(self, interval: float = CHATTER_POLL_INTERVAL, idle_interval: float = CHATTER_IDLE_POLL_INTERVAL,
+                 busy_interval: float = CHATTER_BUSY_POLL_INTERVAL, busy_chat_rate: float = CHATTER_BUSY_CHAT_RATE,
+                 jitter: float = CHATTER_POLL_JITTER, max_concurrent: int = CHATTER_MAX_CONCURRENT_POLLS):
+        self.interval: float = interval
+        self.idle_interval: float = idle_interval
+        self.busy_interval: float = busy_interval
+        self.busy_chat_rate: float = busy_chat_rate
+        self.jitter: float = jitter
+        self.max_concurrent: int = max(1, max_concurrent)
+        self.polls: Dict[str, ScheduledPoll] = {}
+        # (due, tiebreaker, channel), entries whose due time no longer matches the channel's poll are skipped
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter: Iterator[int] = count()
+        self._wakeup: Event = Event()
+        self._semaphore: Optional[Semaphore] = None
+        self._running: Set[Task] = set()
+
+    def register(self, channel: 'Channel'):
+        now = get_event_loop().time()
+        poll = self.polls[channel.name.lower()] = ScheduledPoll(channel, 0, now)
+        self._schedule(poll, now + random.uniform(0, self.interval))
+
+    def unregister(self, channel_name: str):
+        self.polls.pop(channel_name.lower(), None)
+
+    def record_message(self, channel_name: str):
+        """counts a chat message towards the channel's chat rate"""
+        poll = self.polls.get(channel_name)
+        if poll is not None:
+            poll.messages += 1
+
+    def next_interval(self, poll: ScheduledPoll, now: float) -> float:
+        """returns the seconds until the channel's next poll, based on its activity since the last poll"""
+        chat_rate = poll.messages / max(now - poll.last_poll, 1) * 60
+
+        if chat_rate >= self.busy_chat_rate:
+            interval = self.busy_interval
+        elif not poll.messages and not poll.channel.live:
+            interval = self.idle_interval
+        else:
+            interval = self.interval
+
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def run(self):
+        """polls channels as they become due, does nothing if the bot has no client id to call the api with"""
+        if get_client_id() == 'CLIENT_ID':
+            return
+
+        loop = get_event_loop()
+        self._semaphore = Semaphore(self.max_concurrent)
+
+        while True:
+            now = loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, _, name = heappop(self._heap)
+                poll = self.polls.get(name)
+                if poll is not None and poll.due == due:
+                    task = ensure_future(self._poll(poll))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+
+            # woken up when the next poll is due, or when a poll is scheduled
+            self._wakeup.clear()
+            timer = loop.call_at(self._heap[0][0], self._wakeup.set) if self._heap else None
+            try:
+                await self._wakeup.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+    def _schedule(self, poll: ScheduledPoll, due: float):
+        poll.due = due
+        heappush(self._heap, (due, next(self._counter), poll.channel.name.lower()))
+        self._wakeup.set()
+
+    async def _poll(self, poll: ScheduledPoll):
+        async with self._semaphore:
+            try:
+                await poll.channel.update_chatters()
+                metrics.increment('chatters.polls')
+            except Exception as e:
+                print(f'\nfailed to update the chatters of {poll.channel.name}, details:\n'
+                      f'error: {type(e)}\n'
+                      f'reason: {e}\n'
+                      f'stack trace:')
+                traceback.print_exc()
+
+        now = get_event_loop().time()
+        next_poll = now + self.next_interval(poll, now)
+        poll.messages, poll.last_poll = 0, now
+        # the channel may have been unregistered while it was being polled
+        if self.polls.get(poll.channel.name.lower()) is poll:
+            self._schedule(poll, next_poll)
+
+
+chatter_poller = ChatterPollScheduler()
@@ -108,6 +108,12 @@ cfg = Config(
     default_balance=200,
     loyalty_interval=60,
     loyalty_amount=2,
+    balance_flush_interval=10,
+    balance_flush_threshold=500,
+    balance_cache_size=100000,
+    database_profile='balanced',
+    database_checkpoint_interval=300,
+    database_per_channel=False,
     owner='BOT_OWNER_NAME',
     channels=['channel'],
     mods_folder='mods',
@@ -116,6 +122,15 @@ cfg = Config(
     command_server_port=1337,
     command_server_host='localhost',
     disable_whispers=False,
+    irc_channels_per_connection=50,
+    irc_read_connections=1,
+    irc_write_connections=0,
+    irc_join_rate_limit=20,
+    irc_join_rate_window=10,
+    sent_event_queue_size=1000,
+    twitch_api_url='https://api.twitch.tv',
+    tmi_api_url='https://tmi.twitch.tv',
+    emote_api_url='https://api.twitchemotes.com/api/v4',
     use_command_whitelist=False,
     send_message_on_command_whitelist_deny=True,
     command_whitelist=[
@@ -132,6 +147,9 @@ mysql_cfg = Config(
     username='root',
     password='password',
     database='twitchbot',
+    pool_size=5,
+    max_overflow=10,
+    pool_recycle=3600,
 )
 
 
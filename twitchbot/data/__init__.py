@@ -1,4 +1,5 @@
 from .user_followers import UserFollowers
 from .follower import Follower
+from .follower_list import FollowerList
 from .userinfo import UserInfo
 from .ratelimit import RateLimit
@@ -0,0 +1,140 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from sys import intern
+from typing import Iterable, Iterator, List, Optional, Union, overload
+
+from .follower import Follower
+
+__all__ = ['FollowerList']
+
+
+class FollowerList(Sequence):
+    """
+    the followers of one channel, stored as columns instead of a `Follower` per follower:
+    ids in a array('q') and interned names in a list, the channel being followed is stored once
+
+    membership tests binary search sorted copies of the ids / name hashes, which are built on the first lookup
+    after followers were added, `Follower` tuples are only created while iterating / indexing
+
+    it is a read only sequence of `Follower`: slicing returns a list of `Follower`,
+    and it is equal to lists / tuples holding the same followers in the same order
+    """
+    __slots__ = ['following', 'following_id', 'ids', 'names', '_sorted_ids', '_name_hashes', '_name_positions']
+
+    def __init__(self, following: str = '', following_id: int = -1):
+        self.following: str = following
+        self.following_id: int = int(following_id)
+        self.ids: array = array('q')
+        self.names: List[str] = []
+        self._sorted_ids: Optional[array] = None
+        # hashes of the lowercase names, sorted, and the position of the name each hash belongs to
+        self._name_hashes: Optional[array] = None
+        self._name_positions: Optional[array] = None
+
+    def add(self, id: int, name: str):
+        self.ids.append(id)
+        self.names.append(intern(name))
+        self._sorted_ids = self._name_hashes = self._name_positions = None
+
+    def extend(self, follows: Iterable[dict]) -> int:
+        """adds the followers of a page of the follows api, returns how many were added"""
+        added = 0
+        for json in follows:
+            if 'from_id' in json and 'from_name' in json:
+                self.add(int(json['from_id']), json['from_name'])
+                added += 1
+        return added
+
+    def has_id(self, id: int) -> bool:
+        sorted_ids = self._index_ids()
+        index = bisect_left(sorted_ids, id)
+        return index < len(sorted_ids) and sorted_ids[index] == id
+
+    def has_name(self, name: str) -> bool:
+        return self._find_name(name) is not None
+
+    def get(self, name: str) -> Optional[Follower]:
+        position = self._find_name(name)
+        return self[position] if position is not None else None
+
+    def _index_ids(self) -> array:
+        if self._sorted_ids is None:
+            order = self._id_order()
+            # pages can overlap while people follow / unfollow, only the first entry of a follower is kept
+            duplicates = {order[i] for i in range(1, len(order)) if self.ids[order[i]] == self.ids[order[i - 1]]}
+            if duplicates:
+                keep = [i for i in range(len(self.ids)) if i not in duplicates]
+                self.ids = array('q', (self.ids[i] for i in keep))
+                self.names = [self.names[i] for i in keep]
+                self._name_hashes = self._name_positions = None
+                order = self._id_order()
+            self._sorted_ids = array('q', (self.ids[i] for i in order))
+        return self._sorted_ids
+
+    def _id_order(self) -> List[int]:
+        # sorted() is stable, so duplicate ids stay in the order they were added in
+        return sorted(range(len(self.ids)), key=self.ids.__getitem__)
+
+    def _find_name(self, name: str) -> Optional[int]:
+        self._index_ids()
+        if self._name_hashes is None:
+            hashes = [hash(name.lower()) for name in self.names]
+            order = sorted(range(len(hashes)), key=hashes.__getitem__)
+            self._name_hashes = array('q', (hashes[i] for i in order))
+            self._name_positions = array('i', order)
+
+        name = name.lower()
+        name_hash = hash(name)
+        index = bisect_left(self._name_hashes, name_hash)
+        while index < len(self._name_hashes) and self._name_hashes[index] == name_hash:
+            position = self._name_positions[index]
+            if self.names[position].lower() == name:
+                return position
+            index += 1
+        return None
+
+    def __contains__(self, item: Union[int, str, Follower]) -> bool:
+        if isinstance(item, Follower):
+            return self.has_id(item.id)
+        if isinstance(item, int):
+            return self.has_id(item)
+        return self.has_name(item)
+
+    @overload
+    def __getitem__(self, index: int) -> Follower:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Follower]:
+        ...
+
+    def __getitem__(self, index):
+        self._index_ids()
+        if isinstance(index, slice):
+            return [self._follower(id, name) for id, name in zip(self.ids[index], self.names[index])]
+        return self._follower(self.ids[index], self.names[index])
+
+    def __iter__(self) -> Iterator[Follower]:
+        self._index_ids()
+        for id, name in zip(self.ids, self.names):
+            yield self._follower(id, name)
+
+    def _follower(self, id: int, name: str) -> Follower:
+        return Follower(following_id=self.following_id, following=self.following, id=id, name=name)
+
+    def __eq__(self, other):
+        if isinstance(other, FollowerList):
+            return (len(self) == len(other) and self.following_id == other.following_id
+                    and self.following == other.following and self.ids == other.ids and self.names == other.names)
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __len__(self):
+        return len(self._index_ids())
+
+    def __repr__(self):
+        return f'<FollowerList following={self.following!r} followers={len(self)}>'
@@ -1,5 +1,5 @@
 from typing import List
-from .follower import Follower
+from .follower_list import FollowerList
 
 __all__ = ['UserFollowers']
 
@@ -9,14 +9,9 @@ class UserFollowers:
 
     def __init__(self, follower_count: int, following: str, following_id: int, name: str, id: int,
                  followers: List[dict]):
-        self.followers: List[Follower] = [
-            Follower(following=following,
-                     following_id=int(following_id),
-                     id=int(json['from_id']),
-                     name=json['from_name'])
-            for json in followers
-            if 'from_id' in json and 'from_name' in json
-        ]
+        # used to be a List[Follower], FollowerList is a read only sequence of Follower, it can not be appended to
+        self.followers: FollowerList = FollowerList(following, following_id)
+        self.followers.extend(followers)
         self.id: int = id
         self.name: str = name
         self.follower_count = follower_count
@@ -1,6 +1,13 @@
 from .quotes import *
 from .commands import *
+from .storage import *
 from .session import *
 from .models import *
+from .migrations import *
+from .statements import *
+from .partitions import *
+from .leaderboard import *
+from .balance_ledger import *
 from .currency import *
-from .message_timer import *
\ No newline at end of file
+from .message_timer import *
+from .bulk import *
@@ -0,0 +1,392 @@
+import atexit
+import time
+import traceback
+from asyncio import Future, Task, ensure_future, gather, get_event_loop, shield, sleep
+from functools import partial
+from itertools import islice
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, bindparam, orm, select
+
+from ..config import cfg
+from ..metrics import metrics
+from .leaderboard import update_leaderboard, add_to_leaderboard
+from .models import Balance
+from .partitions import channel_session_scope, database_router, run_in_channel_session
+from .statements import CachedStatement
+
+__all__ = ('BalanceLedger', 'LedgerEntry', 'balance_ledger')
+
+BalanceKey = Tuple[str, str]
+# (key, balance, is new row)
+BalanceChange = Tuple[BalanceKey, int, bool]
+
+
+class LedgerEntry:
+    """
+    a user's balance in the ledger, it is used like a `Balance` row,
+    setting `balance` changes the ledger, the database is updated on the ledger's next flush
+    """
+    __slots__ = 'ledger', 'channel', 'user'
+
+    def __init__(self, ledger: 'BalanceLedger', channel: str, user: str):
+        self.ledger: 'BalanceLedger' = ledger
+        self.channel: str = channel
+        self.user: str = user
+
+    @property
+    def balance(self) -> int:
+        balance = self.ledger.balances.get((self.channel, self.user))
+        if balance is None:
+            # forget() removed the balance from the ledger after this entry was returned, get() loads it again
+            return self.ledger.get(self.channel, self.user).balance
+        return balance
+
+    @balance.setter
+    def balance(self, value: int):
+        self.ledger.set(self.channel, self.user, value)
+
+    def __repr__(self):
+        return f'<LedgerEntry channel={self.channel!r} user={self.user!r} balance={self.balance}>'
+
+
+class BalanceLedger:
+    """
+    in memory cache of `(channel, user) -> balance` that writes changes to the database in batches
+
+    balances are loaded from the database the first time they are used, after that reading and changing them
+    does not touch the database, changed balances are written in a single transaction every `flush_interval` seconds,
+    or as soon as `flush_threshold` balances have changed, whichever comes first
+
+    a flush that fails leaves the balances marked as changed, so they are written again by the next flush,
+    a balance that is being written is left out of other flushes until that write is done, so writes of the
+    same balance never overlap and a older value can not be written after a newer one
+
+    once more than `max_size` balances are loaded, the least recently used unchanged ones are removed
+    after each flush of `flush_loop()` (see `evict()`)
+    """
+
+    def __init__(self, flush_interval: float = None, flush_threshold: int = None, max_size: int = None):
+        self.flush_interval: float = flush_interval if flush_interval is not None else cfg.balance_flush_interval
+        self.flush_threshold: int = max(1, flush_threshold if flush_threshold is not None
+                                        else cfg.balance_flush_threshold)
+        self.max_size: int = max(1, max_size if max_size is not None else cfg.balance_cache_size)
+        # ordered from least to most recently used
+        self.balances: Dict[BalanceKey, int] = {}
+        # balances that have a row in the database, the others are INSERTed by the next flush
+        self.persisted: Set[BalanceKey] = set()
+        self.dirty: Set[BalanceKey] = set()
+        # balances in a flush that has not committed yet
+        self.writing: Set[BalanceKey] = set()
+        self._flush_task: Optional[Task] = None
+        # flushes run on the database executor and on the caller's thread, these keep them from interleaving,
+        # there is one lock per database (see DatabaseRouter) so channels with their own database are written in parallel
+        self._write_locks: Dict[Optional[str], Lock] = {}
+
+    def get(self, channel: str, user: str) -> LedgerEntry:
+        """returns the user's balance, loading it from the database if it is not in the ledger yet"""
+        key = _key(channel, user)
+        if key in self.balances:
+            self._used(key)
+        else:
+            with channel_session_scope(channel) as s:
+                self._loaded(key, _load_balance(s, *key))
+        return LedgerEntry(self, *key)
+
+    async def get_async(self, channel: str, user: str) -> LedgerEntry:
+        """same as `get()`, but loads the balance on the database executor"""
+        key = _key(channel, user)
+        if key in self.balances:
+            self._used(key)
+        else:
+            self._loaded(key, await run_in_channel_session(channel, _load_balance, *key))
+        return LedgerEntry(self, *key)
+
+    def set(self, channel: str, user: str, value: int) -> int:
+        self._set_many({self._key_of(channel, user): value})
+        return value
+
+    def add(self, channel: str, user: str, value: int) -> int:
+        """adds `value` to the user's balance (subtracts it if negative), returns the new balance"""
+        entry = self.get(channel, user)
+        return self.set(entry.channel, entry.user, entry.balance + value)
+
+    def transfer(self, channel: str, sender: str, receiver: str, amount: int) -> Optional[Tuple[int, int]]:
+        """
+        moves `amount` from the sender's balance to the receiver's if the sender has at least `amount`
+
+        nothing else can change the balances between the check and the change
+
+        :return: the new (sender, receiver) balances, or None if the sender does not have enough
+        """
+        sender_key, receiver_key = self._key_of(channel, sender), self._key_of(channel, receiver)
+        if self.balances[sender_key] < amount:
+            return None
+
+        if sender_key != receiver_key:
+            self._set_many({sender_key: self.balances[sender_key] - amount,
+                            receiver_key: self.balances[receiver_key] + amount})
+        return self.balances[sender_key], self.balances[receiver_key]
+
+    def settle(self, channel: str, user: str, stake: int, payout: int = 0) -> Optional[int]:
+        """
+        takes `stake` from the user's balance and gives them `payout`, if the user has at least `stake`
+
+        :return: the new balance, or None if the user does not have enough
+        """
+        key = self._key_of(channel, user)
+        if self.balances[key] < stake:
+            return None
+
+        self._set_many({key: self.balances[key] - stake + payout})
+        return self.balances[key]
+
+    def add_to_loaded(self, channel: str, value: int, users: Iterable[str] = None):
+        """
+        adds `value` to the balances of the channel (or only of `users`) that are in the ledger without marking
+        them as changed, used after the same change was made directly in the database
+
+        if `users` is passed, the change is expected to have created the database rows of any missing users
+        """
+        add_to_leaderboard(channel, value, cfg.default_balance, users)
+
+        if users is None:
+            for key in self.balances:
+                if key[0] == channel:
+                    self.balances[key] += value
+            return
+
+        for user in users:
+            key = _key(channel, user)
+            if key in self.balances:
+                self.balances[key] += value
+                self.persisted.add(key)
+
+    def forget(self, channel: str = None):
+        """removes the unchanged balances (of `channel`, or all if None) from the ledger to free memory"""
+        for key in [key for key in self.balances if key not in self.dirty and (channel is None or key[0] == channel)]:
+            del self.balances[key]
+            self.persisted.discard(key)
+
+    def evict(self) -> int:
+        """
+        removes the least recently used unchanged balances until at most `max_size` balances are loaded,
+        changed balances are kept until they are written
+
+        :return: the amount of balances removed
+        """
+        excess = len(self.balances) - self.max_size
+        if excess <= 0:
+            return 0
+
+        unchanged = (key for key in self.balances if key not in self.dirty and key not in self.writing)
+        evicted = list(islice(unchanged, excess))
+        for key in evicted:
+            del self.balances[key]
+            self.persisted.discard(key)
+
+        metrics.increment('balances.evicted', len(evicted))
+        return len(evicted)
+
+    def write_lock(self, channel: str) -> Lock:
+        """the lock held while balances of the channel's database are written, hold it to write balances directly"""
+        return self._write_lock(database_router.partition_key(channel))
+
+    def flush(self, channel: str = None) -> int:
+        """
+        writes the changed balances (of `channel`, or all if None) to the database, one transaction per database,
+        this blocks until the writes are done, use `flush_async()` on the event loop
+
+        :return: the amount of balances written
+        """
+        groups = self._take_changes(channel)
+        written = 0
+
+        for i, (partition_key, changes) in enumerate(groups):
+            start = time.perf_counter()
+            try:
+                with channel_session_scope(partition_key) as s:
+                    _write_balances(s, changes, self._write_lock(partition_key))
+            except BaseException:
+                for _, failed in groups[i:]:
+                    self._flush_failed(failed)
+                raise
+
+            self._flushed(changes, time.perf_counter() - start)
+            written += len(changes)
+
+        return written
+
+    async def flush_async(self, channel: str = None) -> int:
+        """same as `flush()`, but writes the balances on the database executor, each database in parallel"""
+        groups = self._take_changes(channel)
+        if not groups:
+            return 0
+
+        start = time.perf_counter()
+        writes = []
+        for partition_key, changes in groups:
+            write = ensure_future(run_in_channel_session(partition_key, _write_balances, changes,
+                                                         self._write_lock(partition_key)))
+            # the balances are marked as written when the write is done, even if this flush was cancelled by then
+            write.add_done_callback(partial(self._write_done, changes, start))
+            writes.append(write)
+
+        results = await shield(gather(*writes, return_exceptions=True))
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return sum(len(changes) for _, changes in groups)
+
+    async def flush_loop(self):
+        """flushes the ledger every `flush_interval` seconds, then removes balances over `max_size`"""
+        while True:
+            await sleep(self.flush_interval)
+            await self._try_flush_async()
+            self.evict()
+
+    def schedule_flush(self):
+        """starts a flush in the background, or flushes right away if the event loop is not running"""
+        if not get_event_loop().is_running():
+            self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = ensure_future(self._try_flush_async())
+
+    def _key_of(self, channel: str, user: str) -> BalanceKey:
+        """returns the ledger key of the user's balance, loading the balance if needed"""
+        entry = self.get(channel, user)
+        return entry.channel, entry.user
+
+    def _set_many(self, balances: Dict[BalanceKey, int]):
+        self.balances.update(balances)
+        for (channel, user), balance in balances.items():
+            update_leaderboard(channel, user, balance)
+        self._changed(*balances)
+
+    def _used(self, key: BalanceKey):
+        # moved to the end, so the least recently used balances are first
+        self.balances[key] = self.balances.pop(key)
+
+    def _loaded(self, key: BalanceKey, balance: Optional[int]):
+        # another caller may have loaded (and changed) the balance while this one was loading it
+        if key in self.balances:
+            return
+
+        if balance is None:
+            self.balances[key] = cfg.default_balance
+            self.dirty.add(key)
+            update_leaderboard(*key, cfg.default_balance)
+        else:
+            self.balances[key] = balance
+            self.persisted.add(key)
+
+    def _changed(self, *keys: BalanceKey):
+        self.dirty.update(keys)
+        if len(self.dirty) >= self.flush_threshold:
+            self.schedule_flush()
+
+    def _take_changes(self, channel: Optional[str]) -> List[Tuple[Optional[str], List[BalanceChange]]]:
+        """returns the changed balances grouped by the database they are written to"""
+        groups: Dict[Optional[str], List[BalanceChange]] = {}
+        for key in self.dirty:
+            # balances that are being written stay dirty, the flush after that write is done writes them
+            if (channel is None or key[0] == channel) and key not in self.writing:
+                groups.setdefault(database_router.partition_key(key[0]), []).append(
+                    (key, self.balances[key], key not in self.persisted))
+
+        for changes in groups.values():
+            self.writing.update(key for key, _, _ in changes)
+        return list(groups.items())
+
+    def _write_lock(self, partition_key: Optional[str]) -> Lock:
+        return self._write_locks.setdefault(partition_key, Lock())
+
+    def _write_done(self, changes: List[BalanceChange], start: float, write: Future):
+        if write.cancelled() or write.exception() is not None:
+            self._flush_failed(changes)
+        else:
+            self._flushed(changes, time.perf_counter() - start)
+
+    def _flushed(self, changes: List[BalanceChange], seconds: float):
+        for key, balance, _ in changes:
+            self.writing.discard(key)
+            self.persisted.add(key)
+            # balances changed again during the flush stay dirty
+            if self.balances.get(key) == balance:
+                self.dirty.discard(key)
+
+        metrics.increment('balances.flushed', len(changes))
+        metrics.observe('balances.flush_seconds', seconds)
+
+    def _flush_failed(self, changes: List[BalanceChange]):
+        self.writing.difference_update(key for key, _, _ in changes)
+        metrics.increment('balances.flush_failures')
+
+    async def _try_flush_async(self):
+        try:
+            await self.flush_async()
+        except Exception as e:
+            print(f'\nfailed to write {len(self.dirty)} balances to the database, they will be retried, details:\n'
+                  f'error: {type(e)}\n'
+                  f'reason: {e}\n'
+                  f'stack trace:')
+            traceback.print_exc()
+
+
+def _key(channel: str, user: str) -> BalanceKey:
+    return channel, user.lower()
+
+
+_load_balance_statement = CachedStatement(select([Balance.balance]).where(
+    and_(Balance.channel == bindparam('channel'), Balance.user == bindparam('user'))))
+
+
+def _load_balance(s: orm.Session, channel: str, user: str) -> Optional[int]:
+    return _load_balance_statement.scalar(s, channel=channel, user=user)
+
+
+def _write_balances(s: orm.Session, changes: List[BalanceChange], lock: Lock):
+    with lock:
+        # add_balance_to_users() may have created the rows of new balances since they were loaded
+        existing = _existing_balances(s, [key for key, _, new in changes if new])
+        updates = [{'b_channel': channel, 'b_user': user, 'b_balance': balance}
+                   for (channel, user), balance, new in changes if not new or (channel, user) in existing]
+        inserts = [{'channel': channel, 'user': user, 'balance': balance}
+                   for (channel, user), balance, new in changes if new and (channel, user) not in existing]
+
+        if updates:
+            s.execute(Balance.__table__.update()
+                      .where(and_(Balance.channel == bindparam('b_channel'), Balance.user == bindparam('b_user')))
+                      .values(balance=bindparam('b_balance')),
+                      updates)
+        if inserts:
+            s.execute(Balance.__table__.insert(), inserts)
+        s.commit()
+
+
+def _existing_balances(s: orm.Session, keys: List[BalanceKey]) -> Set[BalanceKey]:
+    users_by_channel: Dict[str, List[str]] = {}
+    for channel, user in keys:
+        users_by_channel.setdefault(channel, []).append(user)
+
+    balance = Balance.__table__
+    return {(channel, user)
+            for channel, users in users_by_channel.items()
+            for user, in s.execute(select([balance.c.user])
+                                   .where(and_(balance.c.channel == channel, balance.c.user.in_(users))))}
+
+
+balance_ledger = BalanceLedger()
+
+
+@atexit.register
+def _flush_on_exit():
+    if not balance_ledger.dirty:
+        return
+
+    try:
+        print(f'writing {balance_ledger.flush()} changed balances to the database before exiting')
+    except Exception:
+        print(f'failed to write {len(balance_ledger.dirty)} changed balances to the database before exiting:')
+        traceback.print_exc()
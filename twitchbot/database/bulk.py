@@ -0,0 +1,270 @@
+import csv
+import json
+from asyncio import get_event_loop
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import Column, Table
+from sqlalchemy.engine import Connection, Transaction
+
+from .balance_ledger import balance_ledger
+from .leaderboard import leaderboards
+from .models import Balance, CustomCommand, Quote
+from .partitions import channel_session_scope, database_router
+from .session import db_executor
+
+__all__ = ('EXPORT_TABLES', 'EXPORT_FORMATS', 'export_columns', 'iter_export_rows', 'write_rows', 'read_rows',
+           'import_rows', 'export_to_file', 'import_from_file', 'export_to_file_async', 'import_from_file_async')
+
+EXPORT_TABLES: Dict[str, Table] = {
+    'balances': Balance.__table__,
+    'quotes': Quote.__table__,
+    'commands': CustomCommand.__table__,
+}
+EXPORT_FORMATS = ('jsonl', 'csv')
+# rows are read from the database and written to it this many at a time, so memory use does not grow with the table
+DEFAULT_CHUNK_SIZE = 1000
+
+Row = Dict[str, object]
+
+
+def export_columns(table_name: str) -> List[Column]:
+    """returns the columns of the table that are exported"""
+    table = _get_table(table_name)
+    # balance and command ids are only used internally, quote ids are what users look quotes up by so they are kept
+    return [column for column in table.columns if column.name != 'id' or table_name == 'quotes']
+
+
+def iter_export_rows(table_name: str, channel: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Row]:
+    """
+    yields the rows of the table (of `channel`, or all channels if None) as dicts of column name -> value,
+    rows are fetched from the database `chunk_size` at a time instead of all at once
+    """
+    table = _get_table(table_name)
+    columns = export_columns(table_name)
+    names = [column.name for column in columns]
+
+    for key in ([channel] if channel is not None else database_router.partition_keys()):
+        with channel_session_scope(key) as s:
+            # selecting columns instead of models keeps the rows out of the session's identity map
+            query = s.query(*columns).order_by(table.c.id)
+            if channel is not None:
+                query = query.filter(table.c.channel == channel)
+
+            for row in query.yield_per(chunk_size):
+                yield dict(zip(names, row))
+
+
+def write_rows(table_name: str, rows: Iterable[Row], file: TextIO, format: str = 'jsonl') -> int:
+    """writes the rows to the file as json lines or csv (with a header), returns the amount of rows written"""
+    _check_format(format)
+    count = 0
+
+    if format == 'csv':
+        writer = csv.DictWriter(file, fieldnames=[column.name for column in export_columns(table_name)])
+        writer.writeheader()
+        for count, row in enumerate(rows, start=1):
+            writer.writerow(row)
+    else:
+        for count, row in enumerate(rows, start=1):
+            file.write(json.dumps(row))
+            file.write('\n')
+
+    return count
+
+
+def read_rows(table_name: str, file: TextIO, format: str = 'jsonl') -> Iterator[Row]:
+    """yields the rows in a file written by `write_rows()`, one at a time"""
+    _check_format(format)
+    columns = {column.name: column for column in export_columns(table_name)}
+
+    if format == 'csv':
+        for record in csv.DictReader(file):
+            yield {name: _from_csv(columns[name], value) for name, value in record.items() if name in columns}
+    else:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield {name: record[name] for name in columns if name in record}
+
+
+def import_rows(table_name: str, rows: Iterable[Row], channel: str = None, batch_size: int = DEFAULT_CHUNK_SIZE,
+                replace: bool = False, keep_ids: bool = True) -> int:
+    """
+    inserts the rows `batch_size` at a time, all rows are inserted in one transaction per database,
+    so if any row fails to insert (ex: a duplicate balance) nothing is imported
+
+    :param channel: imports every row into this channel instead of the channel of the row
+    :param replace: deletes the rows a channel already has before importing its first row
+    :param keep_ids: keeps the ids of quotes, turn it off when the ids are taken by other quotes
+    :return: the amount of rows imported
+    """
+    table = _get_table(table_name)
+    batches = _ImportBatches(table, batch_size, replace)
+    count = 0
+
+    try:
+        for count, row in enumerate(rows, start=1):
+            row = dict(row)
+            if channel is not None:
+                row['channel'] = channel
+            if not keep_ids:
+                row.pop('id', None)
+            batches.add(row)
+        batches.commit()
+    except BaseException:
+        batches.rollback()
+        raise
+
+    return count
+
+
+def export_to_file(table_name: str, path: str, channel: str = None, format: str = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    exports the table (of `channel`, or all channels if None) to the file,
+    `format` defaults to the file's extension (.jsonl or .csv), returns the amount of rows exported
+    """
+    if table_name == 'balances':
+        balance_ledger.flush(channel)
+    return _export_to_file(table_name, path, channel, format, chunk_size)
+
+
+def import_from_file(table_name: str, path: str, channel: str = None, format: str = None,
+                     batch_size: int = DEFAULT_CHUNK_SIZE, replace: bool = False, keep_ids: bool = True) -> int:
+    """
+    imports the rows of a file written by `export_to_file()`, see `import_rows()` for the arguments,
+    `format` defaults to the file's extension (.jsonl or .csv), returns the amount of rows imported
+    """
+    if table_name == 'balances':
+        balance_ledger.flush(channel)
+    try:
+        return _import_from_file(table_name, path, channel, format, batch_size, replace, keep_ids)
+    finally:
+        if table_name == 'balances':
+            _forget_balances(channel)
+
+
+# region async
+# these do the same as the functions above, but read and write the file and database on the database executor
+
+async def export_to_file_async(table_name: str, path: str, channel: str = None, format: str = None,
+                               chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    if table_name == 'balances':
+        await balance_ledger.flush_async(channel)
+    return await get_event_loop().run_in_executor(
+        db_executor, partial(_export_to_file, table_name, path, channel, format, chunk_size))
+
+
+async def import_from_file_async(table_name: str, path: str, channel: str = None, format: str = None,
+                                 batch_size: int = DEFAULT_CHUNK_SIZE, replace: bool = False,
+                                 keep_ids: bool = True) -> int:
+    if table_name == 'balances':
+        await balance_ledger.flush_async(channel)
+    try:
+        return await get_event_loop().run_in_executor(
+            db_executor, partial(_import_from_file, table_name, path, channel, format, batch_size, replace, keep_ids))
+    finally:
+        if table_name == 'balances':
+            _forget_balances(channel)
+
+
+# endregion
+
+class _ImportBatches:
+    """buffers rows per database, inserts them once `batch_size` rows are buffered for a database"""
+
+    def __init__(self, table: Table, batch_size: int, replace: bool):
+        self.table: Table = table
+        self.batch_size: int = max(1, batch_size)
+        self.replace: bool = replace
+        self.pending: Dict[Optional[str], List[Row]] = {}
+        self.transactions: Dict[Optional[str], Tuple[Connection, Transaction]] = {}
+        self.seen_channels = set()
+
+    def add(self, row: Row):
+        key = database_router.partition_key(row['channel'])
+        connection = self._connection(key)
+
+        if self.replace and row['channel'] not in self.seen_channels:
+            self.seen_channels.add(row['channel'])
+            # rows of the channel that are still buffered came from the file, so only the database rows are deleted
+            self._insert(key)
+            connection.execute(self.table.delete().where(self.table.c.channel == row['channel']))
+
+        batch = self.pending.setdefault(key, [])
+        batch.append(row)
+        if len(batch) >= self.batch_size:
+            self._insert(key)
+
+    def commit(self):
+        for key in list(self.pending):
+            self._insert(key)
+        for connection, transaction in self.transactions.values():
+            transaction.commit()
+            connection.close()
+        self.transactions.clear()
+
+    def rollback(self):
+        for connection, transaction in self.transactions.values():
+            transaction.rollback()
+            connection.close()
+        self.transactions.clear()
+
+    def _connection(self, key: Optional[str]) -> Connection:
+        if key not in self.transactions:
+            connection = database_router.engine_for(key).connect()
+            self.transactions[key] = connection, connection.begin()
+        return self.transactions[key][0]
+
+    def _insert(self, key: Optional[str]):
+        batch = self.pending.pop(key, None)
+        if batch:
+            self._connection(key).execute(self.table.insert(), batch)
+
+
+def _export_to_file(table_name: str, path: str, channel: Optional[str], format: Optional[str],
+                    chunk_size: int) -> int:
+    format = format or _format_of(path)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        return write_rows(table_name, iter_export_rows(table_name, channel, chunk_size), file, format)
+
+
+def _import_from_file(table_name: str, path: str, channel: Optional[str], format: Optional[str], batch_size: int,
+                      replace: bool, keep_ids: bool) -> int:
+    format = format or _format_of(path)
+    with open(path, encoding='utf-8', newline='') as file:
+        return import_rows(table_name, read_rows(table_name, file, format), channel, batch_size, replace, keep_ids)
+
+
+def _forget_balances(channel: Optional[str]):
+    # the imported balances replace the ones the ledger and leaderboards have loaded
+    balance_ledger.forget(channel)
+    if channel is None:
+        leaderboards.clear()
+    else:
+        leaderboards.pop(channel, None)
+
+
+def _get_table(table_name: str) -> Table:
+    table = EXPORT_TABLES.get(table_name)
+    if table is None:
+        raise ValueError(f'cannot export "{table_name}", valid tables are: {", ".join(EXPORT_TABLES)}')
+    return table
+
+
+def _check_format(format: str):
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f'unknown format "{format}", valid formats are: {", ".join(EXPORT_FORMATS)}')
+
+
+def _format_of(path: str) -> str:
+    return Path(path).suffix.lstrip('.').lower()
+
+
+def _from_csv(column: Column, value: str):
+    # csv has no null, empty values of nullable columns (ex: a quote without an alias) are read as None
+    if value == '' and column.nullable:
+        return None
+    return column.type.python_type(value)
@@ -1,7 +1,10 @@
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List
 
-from .session import session
+from sqlalchemy import bindparam, orm
+
+from .partitions import BatchedLookup, channel_session, run_in_channel_session, write_in_channel_session
 from .models import CustomCommand
+from .statements import bakery, exists_statement
 
 __all__ = (
     'custom_command_exist',
@@ -9,43 +12,131 @@ __all__ = (
     'add_custom_command',
     'delete_custom_command',
     'get_all_custom_commands',
+    'set_custom_command_response',
+    'custom_command_exist_async',
+    'get_custom_command_async',
+    'add_custom_command_async',
+    'delete_custom_command_async',
+    'get_all_custom_commands_async',
+    'set_custom_command_response_async',
 )
 
 
 def custom_command_exist(channel: str, name: str) -> bool:
-    return bool(
-        session.query(CustomCommand).filter(CustomCommand.channel == channel, CustomCommand.name == name).count())
+    return _custom_command_exist(channel_session(channel), channel, name)
 
 
 def get_custom_command(channel: str, name: str) -> Optional[CustomCommand]:
     """gets a custom command from the DB, returns the command if found, else None"""
     assert isinstance(name, str), 'name must be of type str'
-    return session.query(CustomCommand).filter(CustomCommand.channel == channel,
-                                               CustomCommand.name == name).one_or_none()
+    return _get_custom_command(channel_session(channel), channel, name)
 
 
 def add_custom_command(cmd: CustomCommand) -> bool:
     """adds a custom command, returns a bool if it was successful"""
-
-    if get_custom_command(cmd.channel, cmd.name) is not None:
-        return False
-
-    session.add(cmd)
-    session.commit()
-    return True
+    return _add_custom_command(channel_session(cmd.channel), cmd)
 
 
 def delete_custom_command(channel: str, name: str) -> bool:
     """deletes the custom command from the DB if it exist, return if it was successful"""
     assert isinstance(name, str), 'name must be of type str'
+    return _delete_custom_command(channel_session(channel), channel, name)
+
+
+def get_all_custom_commands(channel: str) -> List[CustomCommand]:
+    return _get_all_custom_commands(channel_session(channel), channel)
+
+
+def set_custom_command_response(channel: str, name: str, response: str) -> bool:
+    """updates the response of a custom command, returns if the command exists"""
+    return _set_custom_command_response(channel_session(channel), channel, name, response)
+
+
+# region async
+# these do the same as the functions above, but run the query on the database executor instead of the event loop,
+# returned commands are detached from any session, use the async functions to change them
+
+async def custom_command_exist_async(channel: str, name: str) -> bool:
+    return await run_in_channel_session(channel, _custom_command_exist, channel, name)
+
+
+async def get_custom_command_async(channel: str, name: str) -> Optional[CustomCommand]:
+    assert isinstance(name, str), 'name must be of type str'
+    # this runs for most chat messages, the lookups of many messages are batched into one query
+    return await _custom_command_lookups.get(channel, name)
+
+
+async def add_custom_command_async(cmd: CustomCommand) -> bool:
+    return await write_in_channel_session(cmd.channel, _add_custom_command, cmd)
+
+
+async def delete_custom_command_async(channel: str, name: str) -> bool:
+    assert isinstance(name, str), 'name must be of type str'
+    return await write_in_channel_session(channel, _delete_custom_command, channel, name)
+
+
+async def get_all_custom_commands_async(channel: str) -> List[CustomCommand]:
+    return await run_in_channel_session(channel, _get_all_custom_commands, channel)
+
 
-    if get_custom_command(channel, name) is None:
+async def set_custom_command_response_async(channel: str, name: str, response: str) -> bool:
+    return await write_in_channel_session(channel, _set_custom_command_response, channel, name, response)
+
+
+# endregion
+
+# a custom command is looked up for most chat messages, so these are only compiled once
+_custom_command_exist_statement = exists_statement(CustomCommand.__table__,
+                                                   CustomCommand.channel == bindparam('channel'),
+                                                   CustomCommand.name == bindparam('name'))
+_get_custom_command_query = bakery(lambda s: s.query(CustomCommand).filter(
+    CustomCommand.channel == bindparam('channel'), CustomCommand.name == bindparam('name')))
+_get_custom_commands_query = bakery(lambda s: s.query(CustomCommand).filter(
+    CustomCommand.channel == bindparam('channel'), CustomCommand.name.in_(bindparam('names', expanding=True))))
+
+
+def _custom_command_exist(s: orm.Session, channel: str, name: str) -> bool:
+    return _custom_command_exist_statement.exists(s, channel=channel, name=name)
+
+
+def _get_custom_command(s: orm.Session, channel: str, name: str) -> Optional[CustomCommand]:
+    return _get_custom_command_query(s).params(channel=channel, name=name).one_or_none()
+
+
+def _get_custom_commands(s: orm.Session, channel: str, names: Iterable[str]) -> Dict[str, CustomCommand]:
+    return {cmd.name: cmd for cmd in _get_custom_commands_query(s).params(channel=channel, names=list(names))}
+
+
+_custom_command_lookups = BatchedLookup(_get_custom_commands)
+
+
+def _add_custom_command(s: orm.Session, cmd: CustomCommand) -> bool:
+    if _get_custom_command(s, cmd.channel, cmd.name) is not None:
         return False
 
-    session.query(CustomCommand).filter(CustomCommand.channel == channel, CustomCommand.name == name).delete()
-    session.commit()
+    s.add(cmd)
+    s.commit()
     return True
 
 
-def get_all_custom_commands(channel: str) -> List[CustomCommand]:
-    return session.query(CustomCommand).filter(CustomCommand.channel == channel).all()
+def _delete_custom_command(s: orm.Session, channel: str, name: str) -> bool:
+    if _get_custom_command(s, channel, name) is None:
+        return False
+
+    s.query(CustomCommand).filter(CustomCommand.channel == channel, CustomCommand.name == name).delete()
+    s.commit()
+    return True
+
+
+def _get_all_custom_commands(s: orm.Session, channel: str) -> List[CustomCommand]:
+    return s.query(CustomCommand).filter(CustomCommand.channel == channel).all()
+
+
+def _set_custom_command_response(s: orm.Session, channel: str, name: str, response: str) -> bool:
+    cmd = _get_custom_command(s, channel, name)
+    if cmd is None:
+        return False
+
+    cmd.response = response
+    s.commit()
+    return True
@@ -1,6 +1,13 @@
-from typing import Dict, Tuple
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import orm, and_, literal, select, Table, MetaData, Column, String
+
+from ..config import cfg, get_nick
+from .balance_ledger import balance_ledger, LedgerEntry
+from .leaderboard import Leaderboard, leaderboards
 from .models import Balance, CurrencyName
-from .session import session
+from .partitions import channel_session, run_in_channel_session, write_in_channel_session
 
 __all__ = [
     'get_balance',
@@ -8,65 +15,98 @@ __all__ = [
     'get_currency_name',
     'add_balance',
     'add_balance_to_all',
+    'add_balance_to_users',
     'get_balance_from_msg',
     'set_currency_name',
     'subtract_balance',
     'subtract_balance_from_all',
+    'transfer_balance',
+    'settle_bet',
+    'get_balance_async',
+    'set_balance_async',
+    'add_balance_async',
+    'subtract_balance_async',
+    'add_balance_to_all_async',
+    'add_balance_to_users_async',
+    'subtract_balance_from_all_async',
+    'get_leaderboard_async',
+    'transfer_balance_async',
+    'settle_bet_async',
+    'get_currency_name_async',
+    'set_currency_name_async',
 ]
 
 currency_name_cache: Dict[str, CurrencyName] = {}
 
+# holds the users passed to add_balance_to_users() so their balances can be upserted with a few set based statements
+_balance_upsert_users = Table('balance_upsert_users', MetaData(),
+                              Column('user', String(255), primary_key=True),
+                              prefixes=['TEMPORARY'])
+
 
 def add_balance_to_all(channel: str, value: int):
-    session.query(Balance) \
-        .filter(Balance.channel == channel) \
-        .update({Balance.balance: Balance.balance + value})
-    session.commit()
+    # changed balances are written first so the UPDATE applies to their latest value
+    balance_ledger.flush(channel)
+    _add_balance_to_all(channel_session(channel), channel, value, balance_ledger.write_lock(channel))
+    balance_ledger.add_to_loaded(channel, value)
 
 
 def subtract_balance_from_all(channel: str, value: int):
-    session.query(Balance) \
-        .filter(Balance.channel == channel) \
-        .update({Balance.balance: Balance.balance - value})
-    session.commit()
+    add_balance_to_all(channel, -value)
+
+
+def add_balance_to_users(channel: str, users: Iterable[str], value: int):
+    """
+    adds balance to all of the users in the specified channel using a single transaction,
+    users without a balance are given the default balance + `value`
+    """
+    users = {user.lower() for user in users}
+    balance_ledger.flush(channel)
+    _add_balance_to_users(channel_session(channel), channel, users, value, balance_ledger.write_lock(channel))
+    balance_ledger.add_to_loaded(channel, value, users)
 
 
 def set_balance(channel: str, user: str, value: int):
     """sets a users balance"""
-    get_balance(channel, user.lower()).balance = max(0, value)
-    session.commit()
+    balance_ledger.set(channel, user, max(0, value))
 
 
 def add_balance(channel: str, user: str, value: int, commit=True):
-    """adds balance to a user in the specified channel"""
+    """
+    adds balance to a user in the specified channel
 
-    get_balance(channel, user.lower()).balance += value
-    if commit:
-        session.commit()
+    `commit` is no longer used, the balance ledger writes changed balances to the database in batches
+    """
+    balance_ledger.add(channel, user, value)
 
 
 def subtract_balance(channel: str, user: str, value: int):
     """subtracts balance to a user in the specified channel"""
+    balance_ledger.add(channel, user, -value)
 
-    get_balance(channel, user.lower()).balance -= value
-    session.commit()
 
+def transfer_balance(channel: str, sender: str, receiver: str, amount: int) -> Optional[Tuple[int, int]]:
+    """
+    moves `amount` from the sender to the receiver if the sender has at least `amount`,
+    returns the new (sender, receiver) balances, or None if the sender does not have enough
+    """
+    return balance_ledger.transfer(channel, sender, receiver, amount)
 
-def get_balance(channel: str, user: str) -> Balance:
-    """gets the balance of the user for the specified channel"""
 
-    user = user.lower()
-    bal = session.query(Balance).filter(Balance.channel == channel, Balance.user == user).one_or_none()
+def settle_bet(channel: str, user: str, bet: int, payout: int = 0) -> Optional[int]:
+    """
+    takes the bet from the user and gives them the payout (0 if they lost) if they can afford the bet,
+    returns the new balance, or None if the user does not have enough to cover the bet
+    """
+    return balance_ledger.settle(channel, user, bet, payout)
 
-    if bal is None:
-        bal = Balance.create(channel, user)
-        session.add(bal)
-        session.commit()
 
-    return bal
+def get_balance(channel: str, user: str) -> LedgerEntry:
+    """gets the balance of the user for the specified channel, changing the returned balance updates the ledger"""
+    return balance_ledger.get(channel, user)
 
 
-def get_balance_from_msg(msg) -> Balance:
+def get_balance_from_msg(msg) -> LedgerEntry:
     """gets the balance for the user from the channel the msg came from"""
 
     return get_balance(msg.channel_name, msg.author.lower())
@@ -78,13 +118,7 @@ def get_currency_name(channel: str) -> CurrencyName:
     if channel in currency_name_cache:
         return currency_name_cache[channel]
 
-    currency = session.query(CurrencyName).filter(CurrencyName.channel == channel).one_or_none()
-    if currency is None:
-        currency = CurrencyName.create(channel, 'points')
-        session.add(currency)
-        session.commit()
-
-    currency_name_cache[channel] = currency
+    currency = currency_name_cache[channel] = _get_currency_name(channel_session(channel), channel)
     return currency
 
 
@@ -94,13 +128,168 @@ def set_currency_name(channel: str, new_name: str) -> bool:
     if not new_name:
         return False
 
-    currency = get_currency_name(channel)
-
-    if currency is None:
-        session.add(CurrencyName.create(channel, new_name))
-    else:
-        currency.name = new_name
+    # the cached currency name may have been loaded by the async functions, merging attaches it to the session
+    currency_session = channel_session(channel)
+    currency = currency_session.merge(get_currency_name(channel))
+    currency.name = new_name
 
     currency_name_cache[channel] = currency
-    session.commit()
+    currency_session.commit()
     return True
+
+
+# region async
+# these do the same as the functions above, but run the query on the database executor instead of the event loop,
+# returned currency names are detached from any session, so changing them does not change the database
+
+async def get_balance_async(channel: str, user: str) -> LedgerEntry:
+    return await balance_ledger.get_async(channel, user)
+
+
+async def set_balance_async(channel: str, user: str, value: int) -> int:
+    """sets a users balance, returns the new balance"""
+    await balance_ledger.get_async(channel, user)
+    return balance_ledger.set(channel, user, max(0, value))
+
+
+async def add_balance_async(channel: str, user: str, value: int) -> int:
+    """adds balance to a user in the specified channel, returns the new balance"""
+    await balance_ledger.get_async(channel, user)
+    return balance_ledger.add(channel, user, value)
+
+
+async def subtract_balance_async(channel: str, user: str, value: int) -> int:
+    """subtracts balance from a user in the specified channel, returns the new balance"""
+    return await add_balance_async(channel, user, -value)
+
+
+async def add_balance_to_all_async(channel: str, value: int):
+    await balance_ledger.flush_async(channel)
+    await write_in_channel_session(channel, _add_balance_to_all, channel, value, balance_ledger.write_lock(channel))
+    balance_ledger.add_to_loaded(channel, value)
+
+
+async def subtract_balance_from_all_async(channel: str, value: int):
+    await add_balance_to_all_async(channel, -value)
+
+
+async def add_balance_to_users_async(channel: str, users: Iterable[str], value: int):
+    users = {user.lower() for user in users}
+    await balance_ledger.flush_async(channel)
+    await write_in_channel_session(channel, _add_balance_to_users, channel, users, value,
+                                   balance_ledger.write_lock(channel))
+    balance_ledger.add_to_loaded(channel, value, users)
+
+
+async def transfer_balance_async(channel: str, sender: str, receiver: str,
+                                 amount: int) -> Optional[Tuple[int, int]]:
+    await balance_ledger.get_async(channel, sender)
+    await balance_ledger.get_async(channel, receiver)
+    return balance_ledger.transfer(channel, sender, receiver, amount)
+
+
+async def settle_bet_async(channel: str, user: str, bet: int, payout: int = 0) -> Optional[int]:
+    await balance_ledger.get_async(channel, user)
+    return balance_ledger.settle(channel, user, bet, payout)
+
+
+async def get_leaderboard_async(channel: str) -> Leaderboard:
+    """
+    returns the channel's balance leaderboard, the first call for a channel loads it from the database,
+    after that the leaderboard is kept up to date as balances change
+    """
+    leaderboard = leaderboards.get(channel)
+    if leaderboard is not None:
+        return leaderboard
+
+    await balance_ledger.flush_async(channel)
+    rows = await run_in_channel_session(channel, _get_channel_balances, channel)
+
+    # another caller may have loaded it while this one was waiting
+    if channel not in leaderboards:
+        leaderboard = leaderboards[channel] = Leaderboard(channel, rows, excluded=(channel, get_nick()))
+        # balances changed since the flush are only in the ledger
+        for (balance_channel, user), balance in balance_ledger.balances.items():
+            if balance_channel == channel:
+                leaderboard.set(user, balance)
+
+    return leaderboards[channel]
+
+
+async def get_currency_name_async(channel: str) -> CurrencyName:
+    if channel in currency_name_cache:
+        return currency_name_cache[channel]
+
+    currency = currency_name_cache[channel] = await run_in_channel_session(channel, _get_currency_name, channel)
+    return currency
+
+
+async def set_currency_name_async(channel: str, new_name: str) -> bool:
+    if not new_name:
+        return False
+
+    currency_name_cache[channel] = await write_in_channel_session(channel, _set_currency_name, channel, new_name)
+    return True
+
+
+# endregion
+
+# these take the ledger's write lock, so they do not interleave with the ledger writing balances of the same database
+
+def _add_balance_to_all(s: orm.Session, channel: str, value: int, lock: Lock):
+    with lock:
+        s.query(Balance) \
+            .filter(Balance.channel == channel) \
+            .update({Balance.balance: Balance.balance + value})
+        s.commit()
+
+
+def _add_balance_to_users(s: orm.Session, channel: str, users: Set[str], value: int, lock: Lock):
+    if not users:
+        return
+
+    balance = Balance.__table__
+    upsert_users = _balance_upsert_users
+
+    with lock:
+        connection = s.connection()
+        upsert_users.create(connection, checkfirst=True)
+        try:
+            connection.execute(upsert_users.insert(), [{'user': user} for user in users])
+            connection.execute(balance.update()
+                               .where(and_(balance.c.channel == channel,
+                                           balance.c.user.in_(select([upsert_users.c.user]))))
+                               .values(balance=balance.c.balance + value))
+            # the users left after removing the ones that already have a balance get new balances,
+            # IN (subquery) is used since it does not need a index on the balance table to be fast
+            connection.execute(upsert_users.delete()
+                               .where(upsert_users.c.user.in_(select([balance.c.user])
+                                                              .where(balance.c.channel == channel))))
+            connection.execute(balance.insert().from_select(
+                ['channel', 'user', 'balance'],
+                select([literal(channel), upsert_users.c.user, literal(cfg.default_balance + value)])))
+        finally:
+            upsert_users.drop(connection)
+
+        s.commit()
+
+
+def _get_channel_balances(s: orm.Session, channel: str) -> List[Tuple[str, int]]:
+    return s.query(Balance.user, Balance.balance).filter(Balance.channel == channel).all()
+
+
+def _get_currency_name(s: orm.Session, channel: str) -> CurrencyName:
+    currency = s.query(CurrencyName).filter(CurrencyName.channel == channel).one_or_none()
+    if currency is None:
+        currency = CurrencyName.create(channel, 'points')
+        s.add(currency)
+        s.commit()
+
+    return currency
+
+
+def _set_currency_name(s: orm.Session, channel: str, new_name: str) -> CurrencyName:
+    currency = _get_currency_name(s, channel)
+    currency.name = new_name
+    s.commit()
+    return currency
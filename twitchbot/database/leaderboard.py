@@ -0,0 +1,195 @@
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+__all__ = ('RankedList', 'Leaderboard', 'leaderboards', 'update_leaderboard', 'add_to_leaderboard')
+
+# chunks are split once they hold twice this many items
+RANKED_LIST_CHUNK_SIZE = 500
+
+
+class RankedList:
+    """
+    sorted list that finds the position of a item in O(log n)
+
+    items are kept in sorted chunks, a fenwick tree over the chunk sizes gives the amount of items
+    before a chunk without adding up the sizes of all chunks before it
+    """
+
+    def __init__(self, items: Iterable = (), chunk_size: int = RANKED_LIST_CHUNK_SIZE):
+        self.chunk_size: int = chunk_size
+        ordered = sorted(items)
+        self._chunks: List[list] = [ordered[i:i + chunk_size] for i in range(0, len(ordered), chunk_size)]
+        self._maxes: List[Any] = [chunk[-1] for chunk in self._chunks]
+        self._tree: List[int] = []
+        self._len: int = len(ordered)
+        self._rebuild_tree()
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self) -> Iterator:
+        for chunk in self._chunks:
+            yield from chunk
+
+    def __contains__(self, item):
+        i = bisect_left(self._maxes, item)
+        if i == len(self._chunks):
+            return False
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, item)
+        return j < len(chunk) and chunk[j] == item
+
+    def add(self, item):
+        if not self._chunks:
+            self._chunks.append([item])
+            self._maxes.append(item)
+            self._len = 1
+            self._rebuild_tree()
+            return
+
+        i = min(bisect_left(self._maxes, item), len(self._chunks) - 1)
+        chunk = self._chunks[i]
+        insort(chunk, item)
+        self._maxes[i] = chunk[-1]
+        self._len += 1
+
+        if len(chunk) > self.chunk_size * 2:
+            self._chunks[i:i + 1] = chunk[:self.chunk_size], chunk[self.chunk_size:]
+            self._maxes[i:i + 1] = chunk[self.chunk_size - 1], chunk[-1]
+            self._rebuild_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def remove(self, item):
+        """removes the item, raises ValueError if it is not in the list"""
+        i = bisect_left(self._maxes, item)
+        chunk = self._chunks[i] if i < len(self._chunks) else []
+        j = bisect_left(chunk, item)
+        if j == len(chunk) or chunk[j] != item:
+            raise ValueError(f'{item!r} is not in the list')
+
+        del chunk[j]
+        self._len -= 1
+        if chunk:
+            self._maxes[i] = chunk[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._chunks[i], self._maxes[i]
+            self._rebuild_tree()
+
+    def index(self, item) -> int:
+        """returns the position of the item, raises ValueError if it is not in the list"""
+        i = bisect_left(self._maxes, item)
+        chunk = self._chunks[i] if i < len(self._chunks) else []
+        j = bisect_left(chunk, item)
+        if j == len(chunk) or chunk[j] != item:
+            raise ValueError(f'{item!r} is not in the list')
+        return self._items_before_chunk(i) + j
+
+    def first(self, count: int) -> List:
+        items = []
+        for chunk in self._chunks:
+            if len(items) >= count:
+                break
+            items.extend(chunk[:count - len(items)])
+        return items
+
+    def _rebuild_tree(self):
+        self._tree = [0] * (len(self._chunks) + 1)
+        for i, chunk in enumerate(self._chunks):
+            self._tree_add(i, len(chunk))
+
+    def _tree_add(self, chunk_index: int, value: int):
+        i = chunk_index + 1
+        while i < len(self._tree):
+            self._tree[i] += value
+            i += i & -i
+
+    def _items_before_chunk(self, chunk_index: int) -> int:
+        total = 0
+        i = chunk_index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+
+class Leaderboard:
+    """
+    the balances of a channel ordered from highest to lowest, kept up to date by the balance ledger
+
+    `excluded` users (ex: the broadcaster and the bot) are never added to the leaderboard
+    """
+
+    def __init__(self, channel: str, balances: Iterable[Tuple[str, int]] = (), excluded: Iterable[str] = ()):
+        self.channel: str = channel
+        self.excluded: Set[str] = {user.lower() for user in excluded}
+        # balances are stored minus `offset`, so adding to everyone's balance does not have to touch every entry
+        self.offset: int = 0
+        self._balances: Dict[str, int] = {user: balance for user, balance in balances if user not in self.excluded}
+        self._ranked: RankedList = RankedList((-balance, user) for user, balance in self._balances.items())
+
+    def __len__(self):
+        return len(self._balances)
+
+    def __contains__(self, user: str):
+        return user.lower() in self._balances
+
+    def balance(self, user: str) -> Optional[int]:
+        stored = self._balances.get(user.lower())
+        return stored + self.offset if stored is not None else None
+
+    def set(self, user: str, balance: int):
+        user = user.lower()
+        if user in self.excluded:
+            return
+
+        stored = self._balances.get(user)
+        if stored is not None:
+            self._ranked.remove((-stored, user))
+
+        stored = self._balances[user] = balance - self.offset
+        self._ranked.add((-stored, user))
+
+    def add(self, user: str, value: int, default: int = 0):
+        """adds `value` to the user's balance, users that are not on the leaderboard yet start with `default`"""
+        current = self.balance(user)
+        self.set(user, (current if current is not None else default) + value)
+
+    def add_to_all(self, value: int):
+        self.offset += value
+
+    def rank(self, user: str) -> Optional[int]:
+        """returns the user's rank starting at 1 for the highest balance, or None if the user is not ranked"""
+        user = user.lower()
+        stored = self._balances.get(user)
+        if stored is None:
+            return None
+        return self._ranked.index((-stored, user)) + 1
+
+    def top(self, count: int = 10) -> List[Tuple[str, int]]:
+        """returns the (user, balance) of the `count` highest balances"""
+        return [(user, -stored + self.offset) for stored, user in self._ranked.first(count)]
+
+
+# leaderboards of the channels that have been used, see currency.get_leaderboard_async()
+leaderboards: Dict[str, Leaderboard] = {}
+
+
+def update_leaderboard(channel: str, user: str, balance: int):
+    leaderboard = leaderboards.get(channel)
+    if leaderboard is not None:
+        leaderboard.set(user, balance)
+
+
+def add_to_leaderboard(channel: str, value: int, default: int, users: Iterable[str] = None):
+    """adds `value` to the balance of `users` (or everyone if None), missing users start with `default`"""
+    leaderboard = leaderboards.get(channel)
+    if leaderboard is None:
+        return
+
+    if users is None:
+        leaderboard.add_to_all(value)
+    else:
+        for user in users:
+            leaderboard.add(user, value, default)
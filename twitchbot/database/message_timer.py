@@ -1,66 +1,48 @@
 from asyncio import sleep, ensure_future
 from typing import Optional, Dict, List
 
+from sqlalchemy import bindparam, orm
+
 from .models import MessageTimer
-from .session import session
+from .statements import bakery, exists_statement
+from .partitions import channel_session, run_in_channel_session, write_in_channel_session
 from ..channel import channels
 
 __all__ = ('get_message_timer', 'set_message_timer', 'message_timer_exist', 'set_message_timer_interval',
            'set_message_timer_message', 'delete_all_message_timers', 'delete_message_timer', 'set_message_timer_active',
-           'active_message_timers', 'get_all_channel_timers', 'restart_message_timer')
+           'active_message_timers', 'get_all_channel_timers', 'restart_message_timer', 'get_message_timer_async',
+           'get_all_channel_timers_async', 'set_message_timer_async', 'set_message_timer_interval_async',
+           'set_message_timer_message_async', 'message_timer_exist_async', 'delete_all_message_timers_async')
 
 active_message_timers: Dict[str, MessageTimer] = {}
 
 
 def timer_one_or_none(channel, *criteria) -> Optional[MessageTimer]:
-    return session.query(MessageTimer).filter(MessageTimer.channel == channel, *criteria).one_or_none()
+    return _timer_one_or_none(channel_session(channel), channel, *criteria)
 
 
 def get_message_timer(channel: str, name: str) -> Optional[MessageTimer]:
     """gets a MessageTimer instance from the database, return the MessageTimer if one is found, else None"""
-    return timer_one_or_none(channel, MessageTimer.name == name)
+    return _get_message_timer(channel_session(channel), channel, name)
 
 
 def get_all_channel_timers(channel: str) -> List[MessageTimer]:
-    return session.query(MessageTimer).filter(MessageTimer.channel == channel).all()
+    return _get_all_channel_timers(channel_session(channel), channel)
 
 
 def set_message_timer(channel: str, name: str, message: str, interval: float, active=False) -> None:
     """updates or adds a MessageTimer to the database"""
-    timer = get_message_timer(channel, name)
-
-    if timer:
-        timer.message = message
-        timer.interval = interval
-    else:
-        timer = MessageTimer.create(channel, name, message, interval)
-        session.add(timer)
-
-    session.commit()
+    _set_message_timer(channel_session(channel), channel, name, message, interval)
 
 
 def set_message_timer_interval(channel: str, name: str, interval: float) -> bool:
     """updates a MessageTimers interval, returns a bool if it was successful"""
-    timer = get_message_timer(channel, name)
-
-    if not timer:
-        return False
-
-    timer.interval = interval
-    session.commit()
-    return True
+    return _set_message_timer_interval(channel_session(channel), channel, name, interval)
 
 
 def set_message_timer_message(channel: str, name: str, message: str) -> bool:
     """updates a MessageTimers message, returns a bool if it was successful"""
-    timer = get_message_timer(channel, name)
-
-    if not timer:
-        return False
-
-    timer.message = message
-    session.commit()
-    return True
+    return _set_message_timer_message(channel_session(channel), channel, name, message)
 
 
 def set_message_timer_active(channel: str, name: str, value: bool) -> bool:
@@ -80,19 +62,18 @@ def set_message_timer_active(channel: str, name: str, value: bool) -> bool:
         _stop_message_timer(channel, name)
 
     timer.active = value
-    session.commit()
+    channel_session(channel).commit()
 
     return True
 
 
 def message_timer_exist(channel: str, name: str) -> bool:
     """checks if a timer exists, returns a bool"""
-    return bool(session.query(MessageTimer).filter(MessageTimer.channel == channel, MessageTimer.name == name).count())
+    return _message_timer_exist(channel_session(channel), channel, name)
 
 
 def delete_all_message_timers(channel: str):
-    session.query(MessageTimer).filter(MessageTimer.channel == channel).delete()
-    session.commit()
+    _delete_all_message_timers(channel_session(channel), channel)
 
 
 def delete_message_timer(channel: str, name: str) -> bool:
@@ -105,11 +86,46 @@ def delete_message_timer(channel: str, name: str) -> bool:
     if _key(channel, name) in active_message_timers:
         _stop_message_timer(channel, name)
 
-    session.delete(timer)
-    session.commit()
+    timer_session = channel_session(channel)
+    timer_session.delete(timer)
+    timer_session.commit()
     return True
 
 
+# region async
+# these do the same as the functions above, but run the query on the database executor instead of the event loop,
+# returned timers are detached from any session, starting and stopping timers still goes through the sync functions
+
+async def get_message_timer_async(channel: str, name: str) -> Optional[MessageTimer]:
+    return await run_in_channel_session(channel, _get_message_timer, channel, name)
+
+
+async def get_all_channel_timers_async(channel: str) -> List[MessageTimer]:
+    return await run_in_channel_session(channel, _get_all_channel_timers, channel)
+
+
+async def set_message_timer_async(channel: str, name: str, message: str, interval: float) -> None:
+    await write_in_channel_session(channel, _set_message_timer, channel, name, message, interval)
+
+
+async def set_message_timer_interval_async(channel: str, name: str, interval: float) -> bool:
+    return await write_in_channel_session(channel, _set_message_timer_interval, channel, name, interval)
+
+
+async def set_message_timer_message_async(channel: str, name: str, message: str) -> bool:
+    return await write_in_channel_session(channel, _set_message_timer_message, channel, name, message)
+
+
+async def message_timer_exist_async(channel: str, name: str) -> bool:
+    return await run_in_channel_session(channel, _message_timer_exist, channel, name)
+
+
+async def delete_all_message_timers_async(channel: str):
+    await write_in_channel_session(channel, _delete_all_message_timers, channel)
+
+
+# endregion
+
 # fixme: bug with restarting a active message timer?
 def restart_message_timer(channel: str, name: str):
     if _key(channel, name) in active_message_timers:
@@ -164,5 +180,69 @@ async def _message_timer_say_loop(channel, timer):
         await channel.send_message(timer.message)
 
 
+_message_timer_exist_statement = exists_statement(MessageTimer.__table__,
+                                                  MessageTimer.channel == bindparam('channel'),
+                                                  MessageTimer.name == bindparam('name'))
+_get_message_timer_query = bakery(lambda s: s.query(MessageTimer).filter(
+    MessageTimer.channel == bindparam('channel'), MessageTimer.name == bindparam('name')))
+
+
+def _timer_one_or_none(s: orm.Session, channel, *criteria) -> Optional[MessageTimer]:
+    # the criteria can be anything, so unlike the lookup by name this query can not be cached
+    return s.query(MessageTimer).filter(MessageTimer.channel == channel, *criteria).one_or_none()
+
+
+def _get_message_timer(s: orm.Session, channel: str, name: str) -> Optional[MessageTimer]:
+    return _get_message_timer_query(s).params(channel=channel, name=name).one_or_none()
+
+
+def _get_all_channel_timers(s: orm.Session, channel: str) -> List[MessageTimer]:
+    return s.query(MessageTimer).filter(MessageTimer.channel == channel).all()
+
+
+def _set_message_timer(s: orm.Session, channel: str, name: str, message: str, interval: float) -> None:
+    timer = _get_message_timer(s, channel, name)
+
+    if timer:
+        timer.message = message
+        timer.interval = interval
+    else:
+        timer = MessageTimer.create(channel, name, message, interval)
+        s.add(timer)
+
+    s.commit()
+
+
+def _set_message_timer_interval(s: orm.Session, channel: str, name: str, interval: float) -> bool:
+    timer = _get_message_timer(s, channel, name)
+
+    if not timer:
+        return False
+
+    timer.interval = interval
+    s.commit()
+    return True
+
+
+def _set_message_timer_message(s: orm.Session, channel: str, name: str, message: str) -> bool:
+    timer = _get_message_timer(s, channel, name)
+
+    if not timer:
+        return False
+
+    timer.message = message
+    s.commit()
+    return True
+
+
+def _message_timer_exist(s: orm.Session, channel: str, name: str) -> bool:
+    return _message_timer_exist_statement.exists(s, channel=channel, name=name)
+
+
+def _delete_all_message_timers(s: orm.Session, channel: str):
+    s.query(MessageTimer).filter(MessageTimer.channel == channel).delete()
+    s.commit()
+
+
 def _key(channel, name):
     return f'{channel}_{name}'
@@ -0,0 +1,156 @@
+from typing import Callable, List, Sequence
+
+from sqlalchemy import Column, Integer, MetaData, Table, and_, func, inspect, select
+from sqlalchemy.engine import Connectable, Connection
+
+from .session import Base
+
+__all__ = ('Migration', 'migrations', 'migration', 'latest_schema_version', 'get_schema_version', 'set_schema_version',
+           'upgrade_database', 'create_or_upgrade_database')
+
+# kept out of Base.metadata so create_all() never creates it before the version is known
+schema_version_table = Table('schema_version', MetaData(), Column('version', Integer, nullable=False))
+
+
+class Migration:
+    def __init__(self, version: int, description: str, upgrade: Callable[[Connection], None]):
+        self.version: int = version
+        self.description: str = description
+        self.upgrade: Callable[[Connection], None] = upgrade
+
+    def __repr__(self):
+        return f'<Migration version={self.version} description={self.description!r}>'
+
+
+migrations: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """
+    registers the decorated function as the migration to `version` of the schema,
+    it is called with a connection that has a transaction open, and must be safe to run on a database
+    that was created by a newer create_all() (ex: only create indexes that do not exist yet)
+    """
+
+    def _register(func: Callable[[Connection], None]):
+        assert not migrations or version == migrations[-1].version + 1, 'migrations must be registered in order'
+        migrations.append(Migration(version, description, func))
+        return func
+
+    return _register
+
+
+def latest_schema_version() -> int:
+    return migrations[-1].version if migrations else 0
+
+
+def get_schema_version(connection: Connection) -> int:
+    """returns the schema version of the database, 0 if the database has never been migrated"""
+    if schema_version_table.name not in inspect(connection).get_table_names():
+        return 0
+    return connection.execute(select([func.max(schema_version_table.c.version)])).scalar() or 0
+
+
+def set_schema_version(connection: Connection, version: int):
+    schema_version_table.create(connection, checkfirst=True)
+    connection.execute(schema_version_table.delete())
+    connection.execute(schema_version_table.insert(), {'version': version})
+
+
+def upgrade_database(bind: Connectable, target: int = None) -> List[Migration]:
+    """
+    runs the migrations the database has not had yet (up to `target`, or all if None),
+    each migration runs in its own transaction, returns the migrations that were applied
+    """
+    target = target if target is not None else latest_schema_version()
+    applied = []
+
+    with bind.connect() as connection:
+        for pending in migrations:
+            if pending.version > target:
+                break
+
+            with connection.begin():
+                if pending.version <= get_schema_version(connection):
+                    continue
+
+                pending.upgrade(connection)
+                set_schema_version(connection, pending.version)
+
+            applied.append(pending)
+            print(f'[DATABASE] migrated schema to version {pending.version}: {pending.description}')
+
+    return applied
+
+
+def create_or_upgrade_database(bind: Connectable) -> List[Migration]:
+    """
+    creates the tables that do not exist yet, a new database is marked as being on the latest version,
+    an existing one is migrated to it, returns the migrations that were applied
+    """
+    with bind.connect() as connection:
+        with connection.begin():
+            existing_tables = set(inspect(connection).get_table_names())
+            is_new = (schema_version_table.name not in existing_tables
+                      and not existing_tables.intersection(Base.metadata.tables))
+
+            Base.metadata.create_all(connection)
+            if is_new:
+                set_schema_version(connection, latest_schema_version())
+
+    return upgrade_database(bind)
+
+
+# region migrations
+
+def _create_missing_indexes(connection: Connection, table: Table):
+    existing = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(connection)
+
+
+def _duplicate_groups(connection: Connection, table: Table, columns: Sequence[str]):
+    key = [table.c[name] for name in columns]
+    return connection.execute(select(key + [func.min(table.c.id)])
+                              .where(and_(*(column.isnot(None) for column in key)))
+                              .group_by(*key)
+                              .having(func.count() > 1)).fetchall()
+
+
+def _matches(table: Table, columns: Sequence[str], values) -> list:
+    return [table.c[name] == value for name, value in zip(columns, values)]
+
+
+def _delete_duplicates(connection: Connection, table: Table, columns: Sequence[str]):
+    """keeps the oldest row of rows that have the same values for `columns`"""
+    for *values, keep_id in _duplicate_groups(connection, table, columns):
+        connection.execute(table.delete().where(and_(table.c.id != keep_id, *_matches(table, columns, values))))
+
+
+@migration(1, 'unique (channel, user/name/alias) indexes, and a (channel, balance) index for leaderboards')
+def _add_lookup_indexes(connection: Connection):
+    tables = Base.metadata.tables
+    balance, commands, quotes = tables['balance'], tables['commands'], tables['quotes']
+
+    # duplicate balances were created by racing "create if missing" lookups, the highest one is kept
+    for channel, user, keep_id in _duplicate_groups(connection, balance, ('channel', 'user')):
+        duplicates = and_(balance.c.channel == channel, balance.c.user == user)
+        highest = connection.execute(select([func.max(balance.c.balance)]).where(duplicates)).scalar()
+        connection.execute(balance.update().where(balance.c.id == keep_id).values(balance=highest))
+        connection.execute(balance.delete().where(and_(duplicates, balance.c.id != keep_id)))
+
+    # quotes are not deleted, newer quotes with a duplicate alias lose the alias instead
+    for channel, alias, keep_id in _duplicate_groups(connection, quotes, ('channel', 'alias')):
+        connection.execute(quotes.update()
+                           .where(and_(quotes.c.channel == channel, quotes.c.alias == alias, quotes.c.id != keep_id))
+                           .values(alias=None))
+
+    _delete_duplicates(connection, commands, ('channel', 'name'))
+    _delete_duplicates(connection, tables['currency_names'], ('channel',))
+    _delete_duplicates(connection, tables['message_timers'], ('channel', 'name'))
+
+    for table in (balance, commands, quotes, tables['currency_names'], tables['message_timers']):
+        _create_missing_indexes(connection, table)
+
+# endregion
@@ -1,6 +1,6 @@
 from asyncio import Task
 
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import Column, Integer, String, Float, Boolean, Index
 
 from .session import Base, init_tables
 from ..config import cfg
@@ -11,6 +11,7 @@ __all__ = ('Quote', 'CustomCommand', 'Balance', 'CurrencyName', 'MessageTimer')
 
 class Quote(Base):
     __tablename__ = 'quotes'
+    __table_args__ = (Index('ux_quotes_channel_alias', 'channel', 'alias', unique=True),)
 
     id = Column(Integer, primary_key=True, nullable=False)
     user = Column(String(255))
@@ -25,6 +26,7 @@ class Quote(Base):
 
 class CustomCommand(Base):
     __tablename__ = 'commands'
+    __table_args__ = (Index('ux_commands_channel_name', 'channel', 'name', unique=True),)
 
     id = Column(Integer, primary_key=True, nullable=False)
     name = Column(String(255), nullable=False)
@@ -47,6 +49,10 @@ class CustomCommand(Base):
 
 class Balance(Base):
     __tablename__ = 'balance'
+    __table_args__ = (
+        Index('ux_balance_channel_user', 'channel', 'user', unique=True),
+        Index('ix_balance_channel_balance', 'channel', 'balance'),
+    )
 
     id = Column(Integer, nullable=False, primary_key=True)
     channel = Column(String(255), nullable=False)
@@ -60,6 +66,7 @@ class Balance(Base):
 
 class CurrencyName(Base):
     __tablename__ = 'currency_names'
+    __table_args__ = (Index('ux_currency_names_channel', 'channel', unique=True),)
 
     id = Column(Integer, nullable=False, primary_key=True)
     channel = Column(String(255), nullable=False)
@@ -72,6 +79,7 @@ class CurrencyName(Base):
 
 class MessageTimer(Base):
     __tablename__ = 'message_timers'
+    __table_args__ = (Index('ux_message_timers_channel_name', 'channel', 'name', unique=True),)
 
     id = Column(Integer, nullable=False, primary_key=True)
     name = Column(String(255), nullable=False)
@@ -0,0 +1,268 @@
+import re
+from asyncio import Future, Task, ensure_future, get_event_loop, sleep
+from functools import partial
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Collection, ContextManager, Dict, Hashable, Iterable, List, Optional, TypeVar
+
+from sqlalchemy import orm, select
+from sqlalchemy.engine import Engine
+
+from ..config import cfg, mysql_cfg
+from .migrations import create_or_upgrade_database
+from .session import Base, engine, Session, session, session_scope, db_executor, storage_profile
+from .storage import StorageProfile, create_sqlite_engine
+
+__all__ = ('Partition', 'DatabaseRouter', 'database_router', 'CHANNEL_DATABASES_FOLDER', 'channel_session',
+           'channel_session_scope', 'run_in_channel_session', 'write_in_channel_session', 'BatchedLookup',
+           'split_database')
+
+T = TypeVar('T')
+K = TypeVar('K', bound=Hashable)
+
+CHANNEL_DATABASES_FOLDER = 'channel_databases'
+# twitch logins only use these characters, anything else could point the database file outside of the folder
+_CHANNEL_NAME_RE = re.compile(r'^[a-z0-9_]+$')
+
+
+class Partition:
+    """a database that holds the data of one channel (or of all channels for the shared database)"""
+
+    def __init__(self, engine: Engine, session_factory: orm.sessionmaker = None, session: orm.Session = None):
+        self.engine: Engine = engine
+        self.Session: orm.sessionmaker = session_factory or orm.sessionmaker(bind=engine)
+        # used by the sync database functions, the same way they use the shared `session`
+        self.session: orm.Session = session or self.Session()
+
+    def close(self):
+        self.session.close()
+        self.engine.dispose()
+
+
+class DatabaseRouter:
+    """
+    picks the database that a channel's currency, quotes, commands and timers are stored in
+
+    by default every channel uses the shared database, when `partitioned` each channel gets its own sqlite file in
+    `folder` so writes to different channels do not wait on each other, a channel's file is created
+    (and migrated to the latest schema version) the first time the channel is used
+    """
+
+    def __init__(self, partitioned: bool = False, folder: str = CHANNEL_DATABASES_FOLDER,
+                 profile: StorageProfile = storage_profile):
+        self.partitioned: bool = partitioned
+        self.folder: Path = Path(folder)
+        self.profile: StorageProfile = profile
+        self.shared: Partition = Partition(engine, Session, session)
+        self._partitions: Dict[str, Partition] = {}
+        # partitions are opened by the database executor's threads as well as by the event loop's thread
+        self._lock: Lock = Lock()
+
+    def partition_key(self, channel: Optional[str]) -> Optional[str]:
+        """returns the name of the channel's database, None is the shared database"""
+        if not self.partitioned or channel is None:
+            return None
+        return _validate_channel(channel)
+
+    def partition_for(self, channel: Optional[str]) -> Partition:
+        key = self.partition_key(channel)
+        if key is None:
+            return self.shared
+
+        partition = self._partitions.get(key)
+        if partition is None:
+            with self._lock:
+                partition = self._partitions.get(key) or self._open(key)
+        return partition
+
+    def engine_for(self, channel: Optional[str]) -> Engine:
+        return self.partition_for(channel).engine
+
+    def sessionmaker_for(self, channel: Optional[str]) -> orm.sessionmaker:
+        return self.partition_for(channel).Session
+
+    def session_for(self, channel: Optional[str]) -> orm.Session:
+        return self.partition_for(channel).session
+
+    def database_file(self, channel: str) -> Path:
+        return self.folder / f'{_validate_channel(channel)}.sqlite'
+
+    def channels(self) -> List[str]:
+        """returns the channels that have their own database in `folder`"""
+        if not self.partitioned or not self.folder.is_dir():
+            return []
+        return sorted(file.stem for file in self.folder.glob('*.sqlite') if _CHANNEL_NAME_RE.match(file.stem))
+
+    def partition_keys(self) -> List[Optional[str]]:
+        """returns the keys of every database that holds channel data, used for changes that apply to all channels"""
+        return self.channels() if self.partitioned else [None]
+
+    def engines(self) -> List[Engine]:
+        """returns the engines of the shared database and of the channel databases that are open"""
+        return [self.shared.engine, *(partition.engine for partition in list(self._partitions.values()))]
+
+    def close(self, channel: str) -> bool:
+        """
+        closes the channel's database so its file can be archived or moved,
+        it is opened again the next time the channel is used, returns if the database was open
+        """
+        with self._lock:
+            partition = self._partitions.pop(self.partition_key(channel), None)
+        if partition is None:
+            return False
+
+        partition.close()
+        return True
+
+    def _open(self, key: str) -> Partition:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        partition_engine = create_sqlite_engine(str(self.database_file(key)), self.profile)
+        create_or_upgrade_database(partition_engine)
+        partition = self._partitions[key] = Partition(partition_engine)
+        return partition
+
+
+def _validate_channel(channel: str) -> str:
+    channel = channel.lower()
+    if not _CHANNEL_NAME_RE.match(channel):
+        raise ValueError(f'"{channel}" is not a valid channel name for a channel database')
+    return channel
+
+
+if cfg.database_per_channel and mysql_cfg.enabled:
+    print('[DATABASE] database_per_channel only applies to sqlite, all channels will use the mysql database')
+
+database_router = DatabaseRouter(partitioned=cfg.database_per_channel and not mysql_cfg.enabled)
+
+
+def channel_session(channel: Optional[str]) -> orm.Session:
+    """returns the long lived session of the channel's database, the sync database functions use it"""
+    return database_router.session_for(channel)
+
+
+def channel_session_scope(channel: Optional[str]) -> ContextManager[orm.Session]:
+    """same as `session_scope()`, but the session uses the channel's database"""
+    return session_scope(database_router.sessionmaker_for(channel))
+
+
+async def run_in_channel_session(channel: Optional[str], func: Callable[..., T], *args) -> T:
+    """
+    same as `run_in_session()`, but the session uses the channel's database,
+    a channel database that is not open yet is opened on the executor as well
+    """
+    return await get_event_loop().run_in_executor(db_executor,
+                                                  partial(_run_in_channel_session_scope, channel, func, *args))
+
+
+async def write_in_channel_session(channel: Optional[str], func: Callable[..., T], *args) -> T:
+    """
+    same as `run_in_channel_session()`, for functions that change the database,
+    the objects the sync functions loaded into the channel's long lived session are expired afterwards,
+    so they are loaded again instead of keeping the values from before the change
+    """
+    try:
+        return await run_in_channel_session(channel, func, *args)
+    finally:
+        channel_session(channel).expire_all()
+
+
+def _run_in_channel_session_scope(channel: Optional[str], func: Callable[..., T], *args) -> T:
+    with channel_session_scope(channel) as scoped_session:
+        return func(scoped_session, *args)
+
+
+class BatchedLookup:
+    """
+    runs lookups made around the same time in a single database executor job instead of one job each,
+    `lookup(session, channel, keys)` looks up many keys of a channel at once and returns `{key: result}`,
+    keys it leaves out of the result are returned as None
+
+    lookups of every channel that uses the same database share a session, while a batch is running new lookups
+    wait for the next one, so under load the batches grow instead of queueing up more executor jobs
+    """
+
+    def __init__(self, lookup: Callable[[orm.Session, str, Collection[K]], Dict[K, T]]):
+        self.lookup: Callable[[orm.Session, str, Collection[K]], Dict[K, T]] = lookup
+        # channel -> key -> future of the lookup, lookups of the same key share the future
+        self.pending: Dict[str, Dict[K, Future]] = {}
+        self._task: Optional[Task] = None
+
+    def get(self, channel: str, key: K) -> Future:
+        """returns a future of the result of looking up `key` in the channel"""
+        futures = self.pending.setdefault(channel, {})
+        future = futures.get(key)
+        if future is None:
+            future = futures[key] = get_event_loop().create_future()
+
+        if self._task is None:
+            self._task = ensure_future(self._run())
+        return future
+
+    async def _run(self):
+        try:
+            while self.pending:
+                # lets the lookups made in the current iteration of the loop join the batch
+                await sleep(0)
+                batch, self.pending = self.pending, {}
+                try:
+                    results = await get_event_loop().run_in_executor(db_executor, self._lookup_batch, batch)
+                except Exception as e:
+                    for futures in batch.values():
+                        for future in futures.values():
+                            if not future.done():
+                                future.set_exception(e)
+                    continue
+
+                for channel, futures in batch.items():
+                    for key, future in futures.items():
+                        if not future.done():
+                            future.set_result(results[channel].get(key))
+        finally:
+            self._task = None
+
+    def _lookup_batch(self, batch: Dict[str, Dict[K, Future]]) -> Dict[str, Dict[K, T]]:
+        channels_by_database: Dict[Optional[str], List[str]] = {}
+        for channel in batch:
+            channels_by_database.setdefault(database_router.partition_key(channel), []).append(channel)
+
+        results = {}
+        for partition_key, channels in channels_by_database.items():
+            with channel_session_scope(partition_key) as s:
+                for channel in channels:
+                    results[channel] = self.lookup(s, channel, list(batch[channel]))
+        return results
+
+
+def split_database(source: Engine, router: DatabaseRouter, channels: Iterable[str] = None,
+                   batch_size: int = 1000) -> Dict[str, int]:
+    """
+    copies the rows of every channel (or only of `channels`) from a single file database into the channel databases
+    of the router, rows keep their ids so quote ids do not change
+
+    rows that a channel's database already has for the channel are replaced, so the copy can safely be run again,
+    `source` must be on the latest schema version, returns the amount of rows copied per channel
+    """
+    assert router.partitioned, 'the router must store each channel in its own database'
+
+    tables = [table for table in Base.metadata.sorted_tables if 'channel' in table.c]
+    if channels is None:
+        channels = {channel
+                    for table in tables
+                    for channel, in source.execute(select([table.c.channel]).distinct())
+                    if channel is not None}
+
+    copied = {}
+    for channel in sorted(channels):
+        copied[channel] = 0
+        with router.engine_for(channel).begin() as connection:
+            for table in tables:
+                connection.execute(table.delete().where(table.c.channel == channel))
+                rows = source.execute(table.select().where(table.c.channel == channel))
+                while True:
+                    batch = rows.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    connection.execute(table.insert(), [dict(row) for row in batch])
+                    copied[channel] += len(batch)
+
+    return copied
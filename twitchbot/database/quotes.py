@@ -1,47 +1,37 @@
+from asyncio import gather
 from typing import Union, Optional
+
+from sqlalchemy import bindparam, orm
+
 from .models import Quote
-from .session import session
+from .statements import bakery, exists_statement
+from .partitions import channel_session, run_in_channel_session, write_in_channel_session, database_router
 
 __all__ = ('quote_exist', 'add_quote', 'get_quote', 'get_quote_by_alias', 'get_quote_by_id', 'delete_all_quotes',
-           'delete_quote_by_alias', 'delete_quote_by_id')
+           'delete_quote_by_alias', 'delete_quote_by_id', 'quote_exist_async', 'add_quote_async', 'get_quote_async',
+           'get_quote_by_alias_async', 'get_quote_by_id_async', 'delete_all_quotes_async',
+           'delete_quote_by_alias_async', 'delete_quote_by_id_async')
 
 
 def quote_exist(channel: str, id: int = None, alias: str = None) -> bool:
     """return if quote exist that has the same ID or ALIAS or both"""
-
-    if id is None and alias is None:
-        return False
-
-    filters = [Quote.channel == channel]
-
-    if id is not None:
-        filters.append(Quote.id == id)
-    if alias is not None:
-        filters.append(Quote.alias == alias)
-
-    return bool(session.query(Quote).filter(*filters).count())
+    return _quote_exist(channel_session(channel), channel, id, alias)
 
 
 def add_quote(quote: Quote) -> bool:
     """adds a quote to the quote DB, return a bool indicating if it was successful"""
     assert isinstance(quote, Quote), 'quote must of type Quote'
-
-    if quote_exist(quote.channel, quote.id, quote.alias):
-        return False
-
-    session.add(quote)
-    session.commit()
-    return True
+    return _add_quote(channel_session(quote.channel), quote)
 
 
 def get_quote_by_id(channel: str, id: int) -> Optional[Quote]:
     assert isinstance(id, int), 'quote_id must be of type int'
-    return session.query(Quote).filter(Quote.id == id, Quote.channel == channel).one_or_none()
+    return _get_quote_by_id(channel_session(channel), channel, id)
 
 
 def get_quote_by_alias(channel: str, alias: str) -> Optional[Quote]:
     assert isinstance(alias, str), 'quote_alias must be of type str'
-    return session.query(Quote).filter(Quote.alias == alias, Quote.channel == channel).one_or_none()
+    return _get_quote_by_alias(channel_session(channel), channel, alias)
 
 
 def get_quote(channel: str, id_or_alias: Union[str, int]) -> Optional[Quote]:
@@ -50,24 +40,125 @@ def get_quote(channel: str, id_or_alias: Union[str, int]) -> Optional[Quote]:
     then tries to find quote using x as a alias
     returns the quote if one exist, else None
     """
-    try:
-        return get_quote_by_id(channel, int(id_or_alias))
-    except ValueError:
-        return get_quote_by_alias(channel, str(id_or_alias))
+    return _get_quote(channel_session(channel), channel, id_or_alias)
 
 
 def delete_quote_by_id(channel: str, id: int) -> None:
     assert isinstance(id, int), 'quote_id must be of type int'
-    session.query(Quote).filter(Quote.channel == channel, Quote.id == id).delete()
-    session.commit()
+    _delete_quote_by_id(channel_session(channel), channel, id)
 
 
 def delete_quote_by_alias(channel: str, alias: str) -> None:
     assert isinstance(alias, str), 'quote_alias must be of type str'
-    session.query(Quote).filter(Quote.channel == channel, Quote.alias == alias).delete()
-    session.commit()
+    _delete_quote_by_alias(channel_session(channel), channel, alias)
 
 
 def delete_all_quotes():
-    session.query(Quote).delete()
-    session.commit()
+    """deletes the quotes of every channel"""
+    for key in database_router.partition_keys():
+        _delete_all_quotes(channel_session(key))
+
+
+# region async
+# these do the same as the functions above, but run the query on the database executor instead of the event loop,
+# returned quotes are detached from any session
+
+async def quote_exist_async(channel: str, id: int = None, alias: str = None) -> bool:
+    return await run_in_channel_session(channel, _quote_exist, channel, id, alias)
+
+
+async def add_quote_async(quote: Quote) -> bool:
+    assert isinstance(quote, Quote), 'quote must of type Quote'
+    return await write_in_channel_session(quote.channel, _add_quote, quote)
+
+
+async def get_quote_by_id_async(channel: str, id: int) -> Optional[Quote]:
+    assert isinstance(id, int), 'quote_id must be of type int'
+    return await run_in_channel_session(channel, _get_quote_by_id, channel, id)
+
+
+async def get_quote_by_alias_async(channel: str, alias: str) -> Optional[Quote]:
+    assert isinstance(alias, str), 'quote_alias must be of type str'
+    return await run_in_channel_session(channel, _get_quote_by_alias, channel, alias)
+
+
+async def get_quote_async(channel: str, id_or_alias: Union[str, int]) -> Optional[Quote]:
+    return await run_in_channel_session(channel, _get_quote, channel, id_or_alias)
+
+
+async def delete_quote_by_id_async(channel: str, id: int) -> None:
+    assert isinstance(id, int), 'quote_id must be of type int'
+    await write_in_channel_session(channel, _delete_quote_by_id, channel, id)
+
+
+async def delete_quote_by_alias_async(channel: str, alias: str) -> None:
+    assert isinstance(alias, str), 'quote_alias must be of type str'
+    await write_in_channel_session(channel, _delete_quote_by_alias, channel, alias)
+
+
+async def delete_all_quotes_async():
+    await gather(*(write_in_channel_session(key, _delete_all_quotes) for key in database_router.partition_keys()))
+
+
+# endregion
+
+# (by id, by alias) -> statement, each combination of filters is compiled once
+_quote_exist_statements = {
+    (True, False): exists_statement(Quote.__table__, Quote.channel == bindparam('channel'),
+                                    Quote.id == bindparam('id')),
+    (False, True): exists_statement(Quote.__table__, Quote.channel == bindparam('channel'),
+                                    Quote.alias == bindparam('alias')),
+    (True, True): exists_statement(Quote.__table__, Quote.channel == bindparam('channel'),
+                                   Quote.id == bindparam('id'), Quote.alias == bindparam('alias')),
+}
+_get_quote_by_id_query = bakery(lambda s: s.query(Quote).filter(Quote.id == bindparam('id'),
+                                                                Quote.channel == bindparam('channel')))
+_get_quote_by_alias_query = bakery(lambda s: s.query(Quote).filter(Quote.alias == bindparam('alias'),
+                                                                   Quote.channel == bindparam('channel')))
+
+
+def _quote_exist(s: orm.Session, channel: str, id: int = None, alias: str = None) -> bool:
+    if id is None and alias is None:
+        return False
+
+    statement = _quote_exist_statements[(id is not None, alias is not None)]
+    return statement.exists(s, channel=channel, id=id, alias=alias)
+
+
+def _add_quote(s: orm.Session, quote: Quote) -> bool:
+    if _quote_exist(s, quote.channel, quote.id, quote.alias):
+        return False
+
+    s.add(quote)
+    s.commit()
+    return True
+
+
+def _get_quote_by_id(s: orm.Session, channel: str, id: int) -> Optional[Quote]:
+    return _get_quote_by_id_query(s).params(id=id, channel=channel).one_or_none()
+
+
+def _get_quote_by_alias(s: orm.Session, channel: str, alias: str) -> Optional[Quote]:
+    return _get_quote_by_alias_query(s).params(alias=alias, channel=channel).one_or_none()
+
+
+def _get_quote(s: orm.Session, channel: str, id_or_alias: Union[str, int]) -> Optional[Quote]:
+    try:
+        return _get_quote_by_id(s, channel, int(id_or_alias))
+    except ValueError:
+        return _get_quote_by_alias(s, channel, str(id_or_alias))
+
+
+def _delete_quote_by_id(s: orm.Session, channel: str, id: int) -> None:
+    s.query(Quote).filter(Quote.channel == channel, Quote.id == id).delete()
+    s.commit()
+
+
+def _delete_quote_by_alias(s: orm.Session, channel: str, alias: str) -> None:
+    s.query(Quote).filter(Quote.channel == channel, Quote.alias == alias).delete()
+    s.commit()
+
+
+def _delete_all_quotes(s: orm.Session):
+    s.query(Quote).delete()
+    s.commit()
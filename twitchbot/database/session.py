@@ -1,8 +1,21 @@
-from sqlalchemy import create_engine, orm
+import time
+from asyncio import get_event_loop, sleep
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Iterator, TypeVar
+
+from sqlalchemy import orm
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from ..config import mysql_cfg
+from ..config import cfg, mysql_cfg
+from ..metrics import metrics
+from .storage import get_storage_profile, create_sqlite_engine, create_mysql_engine
+
+__all__ = ('Base', 'engine', 'session', 'Session', 'DB_FILENAME', 'init_tables', 'session_scope', 'db_executor',
+           'run_in_session', 'storage_profile', 'wal_checkpoint', 'wal_checkpoint_loop', 'WAL_TRUNCATE_FRAMES')
 
-__all__ = ('Base', 'engine', 'session', 'DB_FILENAME', 'init_tables')
+T = TypeVar('T')
 
 if mysql_cfg.enabled:
     try:
@@ -15,12 +28,95 @@ if mysql_cfg.enabled:
 
 Base = declarative_base()
 DB_FILENAME = 'database.sqlite'
-engine = create_engine(f'sqlite:///{DB_FILENAME}'
-                       if not mysql_cfg.enabled else
-                       f'mysql+mysqlconnector://{mysql_cfg.username}:{mysql_cfg.password}@{mysql_cfg.address}:{mysql_cfg.port}/{mysql_cfg.database}')
+storage_profile = get_storage_profile(cfg.database_profile)
+engine = (create_sqlite_engine(DB_FILENAME, storage_profile)
+          if not mysql_cfg.enabled else
+          create_mysql_engine(f'mysql+mysqlconnector://{mysql_cfg.username}:{mysql_cfg.password}@{mysql_cfg.address}:{mysql_cfg.port}/{mysql_cfg.database}',
+                              mysql_cfg.pool_size, mysql_cfg.max_overflow, mysql_cfg.pool_recycle))
 Session = orm.sessionmaker(bind=engine)
 session: orm.Session = Session()
 
+# the *_async database functions run their queries on this executor so they do not block the event loop,
+# without WAL sqlite readers wait on writers, so more threads would only wait on each other's locks
+db_executor = ThreadPoolExecutor(
+    max_workers=mysql_cfg.pool_size if mysql_cfg.enabled else storage_profile.executor_workers,
+    thread_name_prefix='twitchbot-db')
+
+# once the WAL file has this many frames (4 KiB each) a checkpoint waits for readers so it can truncate it
+WAL_TRUNCATE_FRAMES = 10000
+
 
 def init_tables():
-    Base.metadata.create_all(engine)
+    """creates missing tables and migrates the database to the latest schema version"""
+    from .migrations import create_or_upgrade_database
+    create_or_upgrade_database(engine)
+
+
+@contextmanager
+def session_scope(session_factory: orm.sessionmaker = None) -> Iterator[orm.Session]:
+    """
+    creates a session for a single unit of work, commits it if the block exits normally, else rolls it back
+
+    objects loaded by the session can still be read after the block exits, but they are detached from it,
+    `session_factory` defaults to `Session`, the partitions module passes the factory of a channel's database
+    """
+    scoped_session = (session_factory or Session)(expire_on_commit=False)
+    try:
+        yield scoped_session
+        scoped_session.commit()
+    except BaseException:
+        scoped_session.rollback()
+        raise
+    finally:
+        scoped_session.close()
+
+
+async def run_in_session(func: Callable[..., T], *args) -> T:
+    """runs `func(session, *args)` on `db_executor` in its own `session_scope()` and returns the result"""
+    return await get_event_loop().run_in_executor(db_executor, partial(_run_in_session_scope, func, *args))
+
+
+def _run_in_session_scope(func: Callable[..., T], *args) -> T:
+    with session_scope() as scoped_session:
+        return func(scoped_session, *args)
+
+
+def wal_checkpoint(mode: str = 'PASSIVE', bind: Engine = None) -> int:
+    """
+    copies the changes in sqlite's WAL file back into the database file, returns the amount of frames in the WAL
+
+    PASSIVE does not wait for readers or writers, TRUNCATE waits for them, then empties the WAL file,
+    `bind` is the database to checkpoint, defaults to `engine`
+    """
+    start = time.perf_counter()
+    with (bind or engine).connect() as connection:
+        busy, wal_frames, checkpointed = connection.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+
+    metrics.increment('database.checkpoints')
+    metrics.observe('database.checkpoint_seconds', time.perf_counter() - start)
+    metrics.set_gauge('database.wal_frames', max(0, wal_frames))
+    return wal_frames
+
+
+async def wal_checkpoint_loop(interval: float = None):
+    """
+    checkpoints the WAL every `interval` (default: cfg.database_checkpoint_interval) seconds,
+    sqlite checkpoints on its own as well, but readers that are active at that moment keep the WAL from being
+    reset, so under steady load it can keep growing
+    """
+    interval = interval if interval is not None else cfg.database_checkpoint_interval
+    if mysql_cfg.enabled or not storage_profile.uses_wal or interval == -1:
+        return
+
+    from .partitions import database_router
+
+    loop = get_event_loop()
+    while True:
+        await sleep(interval)
+        # with per channel databases each database has its own WAL
+        for bind in database_router.engines():
+            try:
+                if await loop.run_in_executor(db_executor, wal_checkpoint, 'PASSIVE', bind) >= WAL_TRUNCATE_FRAMES:
+                    await loop.run_in_executor(db_executor, wal_checkpoint, 'TRUNCATE', bind)
+            except Exception as e:
+                print(f'[DATABASE] WAL checkpoint of {bind.url} failed: {e}')
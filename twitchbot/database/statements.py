@@ -0,0 +1,41 @@
+from typing import Dict
+
+from sqlalchemy import and_, literal_column, orm, select
+from sqlalchemy.engine import Compiled, ResultProxy
+from sqlalchemy.ext import baked
+from sqlalchemy.sql import ClauseElement, Select
+
+__all__ = ('bakery', 'CachedStatement', 'exists_statement')
+
+# caches the SQL of ORM queries that are built the same way on every call, see sqlalchemy.ext.baked
+bakery = baked.bakery()
+
+
+class CachedStatement:
+    """
+    a core statement that is compiled once per database dialect instead of every time it is executed,
+    values are passed as bindparam()s, the session is not flushed before it runs and rows are not loaded into it
+    """
+
+    def __init__(self, statement: ClauseElement):
+        self.statement: ClauseElement = statement
+        self._compiled: Dict[str, Compiled] = {}
+
+    def execute(self, s: orm.Session, **params) -> ResultProxy:
+        connection = s.connection()
+        compiled = self._compiled.get(connection.dialect.name)
+        if compiled is None:
+            compiled = self._compiled[connection.dialect.name] = self.statement.compile(dialect=connection.dialect)
+        return connection.execute(compiled, params)
+
+    def scalar(self, s: orm.Session, **params):
+        return self.execute(s, **params).scalar()
+
+    def exists(self, s: orm.Session, **params) -> bool:
+        return self.execute(s, **params).first() is not None
+
+
+def exists_statement(table, *criteria) -> CachedStatement:
+    """returns a `SELECT 1 ... LIMIT 1` statement, it stops at the first matching row instead of counting all of them"""
+    statement: Select = select([literal_column('1')]).select_from(table).where(and_(*criteria)).limit(1)
+    return CachedStatement(statement)
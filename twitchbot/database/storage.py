@@ -0,0 +1,87 @@
+from typing import Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+__all__ = ('StorageProfile', 'STORAGE_PROFILES', 'DEFAULT_STORAGE_PROFILE', 'get_storage_profile',
+           'create_sqlite_engine', 'create_mysql_engine')
+
+
+class StorageProfile:
+    """
+    how a sqlite database is opened, `pragmas` are set on every new connection,
+    `pool_size` connections are kept open (and `executor_workers` threads run database work for the *_async functions)
+    """
+
+    def __init__(self, name: str, pragmas: Dict[str, object], pool_size: int = 5, executor_workers: int = 4,
+                 busy_timeout: float = 10):
+        self.name: str = name
+        self.pragmas: Dict[str, object] = pragmas
+        self.pool_size: int = pool_size
+        self.executor_workers: int = executor_workers
+        self.busy_timeout: float = busy_timeout
+
+    @property
+    def uses_wal(self) -> bool:
+        return str(self.pragmas.get('journal_mode', '')).lower() == 'wal'
+
+    def __repr__(self):
+        return f'<StorageProfile name={self.name!r} pragmas={self.pragmas}>'
+
+
+STORAGE_PROFILES: Dict[str, StorageProfile] = {
+    profile.name: profile for profile in (
+        # the rollback journal the bot used before profiles existed, readers and writers block each other
+        StorageProfile('legacy', {'journal_mode': 'delete', 'synchronous': 'full'},
+                       pool_size=1, executor_workers=1),
+        # WAL lets readers run while a write is in progress, synchronous=full makes every commit durable
+        StorageProfile('safe', {'journal_mode': 'wal', 'synchronous': 'full', 'cache_size': -16000}),
+        # a commit can be lost on power loss (never on a crash of the bot), but the database is never corrupted
+        StorageProfile('balanced', {'journal_mode': 'wal', 'synchronous': 'normal', 'cache_size': -64000,
+                                    'mmap_size': 256 * 1024 * 1024, 'temp_store': 'memory'}),
+        # commits are not synced to disk at all, for throwaway databases (ex: tests and benchmarks)
+        StorageProfile('fast', {'journal_mode': 'wal', 'synchronous': 'off', 'cache_size': -128000,
+                                'mmap_size': 1024 * 1024 * 1024, 'temp_store': 'memory'}),
+    )
+}
+DEFAULT_STORAGE_PROFILE = 'balanced'
+
+
+def get_storage_profile(name: str) -> StorageProfile:
+    profile = STORAGE_PROFILES.get(name.lower())
+    if profile is None:
+        print(f'[DATABASE] unknown storage profile "{name}", using "{DEFAULT_STORAGE_PROFILE}", '
+              f'valid profiles are: {", ".join(STORAGE_PROFILES)}')
+        profile = STORAGE_PROFILES[DEFAULT_STORAGE_PROFILE]
+    return profile
+
+
+def create_sqlite_engine(filename: str, profile: StorageProfile) -> Engine:
+    engine = create_engine(f'sqlite:///{filename}',
+                           poolclass=QueuePool,
+                           pool_size=profile.pool_size,
+                           max_overflow=profile.pool_size,
+                           # pooled connections are used by the database executor's threads
+                           connect_args={'check_same_thread': False, 'timeout': profile.busy_timeout})
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in profile.pragmas.items():
+                cursor.execute(f'PRAGMA {pragma}={value}')
+        finally:
+            cursor.close()
+
+    return engine
+
+
+def create_mysql_engine(url: str, pool_size: int, max_overflow: int, pool_recycle: int) -> Engine:
+    # mysql closes connections that have been idle for `wait_timeout` seconds (8 hours by default),
+    # recycling them sooner and pinging them before use keeps the pool from handing out dead connections
+    return create_engine(url,
+                         pool_size=pool_size,
+                         max_overflow=max_overflow,
+                         pool_recycle=pool_recycle,
+                         pool_pre_ping=True)
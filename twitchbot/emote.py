@@ -1,6 +1,13 @@
-from typing import Dict
+import json
+import os
+import time
+import traceback
+from asyncio import sleep, wait_for
 from dataclasses import dataclass, field
-from .util import get_url
+from typing import Dict
+
+from .metrics import metrics
+from .util import get_url, twitch_api_util
 
 
 @dataclass(frozen=True)
@@ -10,13 +17,89 @@ class Emote:
     set: int = field(default=0, repr=False)
 
 
-GLOBAL_EMOTE_API = 'https://api.twitchemotes.com/api/v4/channels/0'
+# the last emotes received from the global emote api (see GLOBAL_EMOTE_API_URL),
+# loaded at startup so the bot does not wait on the api to start
+GLOBAL_EMOTE_SNAPSHOT_FILE = 'global_emotes.json'
+# seconds between refreshes of the global emotes
+GLOBAL_EMOTE_REFRESH_INTERVAL = 6 * 60 * 60
+# seconds between retries after a refresh failed
+GLOBAL_EMOTE_RETRY_INTERVAL = 5 * 60
+# seconds a request to the global emote api can take before it is given up on
+GLOBAL_EMOTE_REQUEST_TIMEOUT = 10
+
+# updated in place, so references imported before a update see the new emotes, the update does not await
+# while changing it, so a message is never parsed with a half updated mapping
 emotes: Dict[str, Emote] = {}
 
 
-async def update_global_emotes():
-    _, data = await get_url(GLOBAL_EMOTE_API)
+def get_global_emotes() -> Dict[str, Emote]:
+    return emotes
+
+
+def _parse_emotes(data: dict) -> Dict[str, Emote]:
+    return {emote['code']: Emote(int(emote['id']), emote['code'], emote['emoticon_set']) for emote in data['emotes']}
+
+
+def _replace_emotes(new_emotes: Dict[str, Emote]):
     emotes.clear()
+    emotes.update(new_emotes)
+
+
+def load_global_emotes(path: str = GLOBAL_EMOTE_SNAPSHOT_FILE) -> bool:
+    """loads the global emotes from the snapshot file, returns False if there is no usable snapshot"""
+    try:
+        with open(path, encoding='utf-8') as file:
+            _replace_emotes(_parse_emotes(json.load(file)))
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f'failed to load the global emote snapshot from {path}, it will be replaced on the next refresh: {e}')
+        return False
+
+    return True
+
+
+def _save_snapshot(data: dict, path: str):
+    # written to a temporary file then swapped in, so a crash while writing does not leave a broken snapshot
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(temp_path, path)
+
+
+async def update_global_emotes(path: str = GLOBAL_EMOTE_SNAPSHOT_FILE, timeout: float = GLOBAL_EMOTE_REQUEST_TIMEOUT):
+    """requests the global emotes, swaps them in, and saves them as the snapshot loaded at the next startup"""
+    # read at call time, set_api_base_urls() can change it
+    _, data = await wait_for(get_url(twitch_api_util.GLOBAL_EMOTE_API_URL), timeout)
+    _replace_emotes(_parse_emotes(data))
+    _save_snapshot({'emotes': data['emotes']}, path)
+
+
+def _seconds_until_refresh(path: str, interval: float) -> float:
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except OSError:
+        return 0
+
+    return max(0, interval - age) if emotes else 0
+
+
+async def global_emote_refresh_loop(interval: float = GLOBAL_EMOTE_REFRESH_INTERVAL,
+                                    path: str = GLOBAL_EMOTE_SNAPSHOT_FILE):
+    """refreshes the global emotes every `interval` seconds, right away if the snapshot is missing or too old"""
+    await sleep(_seconds_until_refresh(path, interval))
 
-    for emote in data['emotes']:
-        emotes[emote['code']] = Emote(int(emote['id']), emote['code'], emote['emoticon_set'])
+    while True:
+        try:
+            await update_global_emotes(path)
+        except Exception as e:
+            print(f'\nfailed to refresh the global emotes, retrying in {GLOBAL_EMOTE_RETRY_INTERVAL} seconds:\n'
+                  f'error: {type(e)}\n'
+                  f'reason: {e}\n'
+                  f'stack trace:')
+            traceback.print_exc()
+            metrics.increment('emotes.refresh_failures')
+            await sleep(GLOBAL_EMOTE_RETRY_INTERVAL)
+        else:
+            metrics.increment('emotes.refreshes')
+            await sleep(interval)
@@ -1,6 +1,6 @@
-from enum import Enum, IntFlag, auto
+from enum import Enum, IntEnum, IntFlag, auto
 
-__all__ = ('Event', 'CommandContext', 'MessageType', 'UserType')
+__all__ = ('Event', 'CommandContext', 'MessageType', 'UserType', 'RequestPriority')
 
 
 class NamedEnum(Enum):
@@ -31,6 +31,15 @@ class MessageType(NamedEnum):
     NONE = auto()
 
 
+class RequestPriority(IntEnum):
+    """priority of a helix request, lower values are sent first when the ratelimit budget runs low"""
+    # requests the bot needs to work, ex: stream status
+    HIGH = 0
+    NORMAL = 1
+    # cosmetic lookups, ex: follower counts shown by commands
+    LOW = 2
+
+
 class CommandContext(IntFlag):
     CHANNEL = auto()
     WHISPER = auto()
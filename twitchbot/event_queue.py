@@ -0,0 +1,80 @@
+import traceback
+from asyncio import Task, ensure_future, gather
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Tuple
+
+from .config import cfg
+from .metrics import metrics
+
+__all__ = ('EventQueue', 'sent_event_queue')
+
+QueuedHandler = Tuple[Callable[..., Awaitable], tuple]
+
+
+class EventQueue:
+    """
+    runs event handlers in the background instead of on the caller's path
+
+    handlers published with the same key run one after another in the order they were published,
+    handlers with different keys run concurrently,
+    once `max_size` handlers are waiting new ones are dropped (counted in the `<name>.dropped` metric,
+    ex: `events.sent.dropped` for the sent message events)
+    """
+
+    def __init__(self, max_size: int = None, name: str = 'events'):
+        self.max_size: int = max_size if max_size is not None else cfg.sent_event_queue_size
+        self.name: str = name
+        self.size: int = 0
+        self.queues: Dict[str, Deque[QueuedHandler]] = {}
+        self.workers: Dict[str, Task] = {}
+
+    def publish(self, key: str, handler: Callable[..., Awaitable], *args) -> bool:
+        """
+        queues `handler(*args)` to be awaited after the handlers previously published with the same key
+
+        :return: False if the queue was full and the handler was dropped, else True
+        """
+        if self.size >= self.max_size:
+            metrics.increment(f'{self.name}.dropped')
+            return False
+
+        self.queues.setdefault(key, deque()).append((handler, args))
+        self.size += 1
+        metrics.increment(f'{self.name}.published')
+
+        if key not in self.workers:
+            self.workers[key] = ensure_future(self._work(key))
+        return True
+
+    async def drain(self):
+        """waits until every handler queued so far has run"""
+        while self.workers:
+            await gather(*self.workers.values(), return_exceptions=True)
+
+    async def _work(self, key: str):
+        queue = self.queues[key]
+        try:
+            while queue:
+                handler, args = queue.popleft()
+                self.size -= 1
+                try:
+                    await handler(*args)
+                except Exception as e:
+                    print(f'\nerror has occurred while running a queued event handler, details:\n'
+                          f'handler: {handler}\n'
+                          f'error: {type(e)}\n'
+                          f'reason: {e}\n'
+                          f'stack trace:')
+                    traceback.print_exc()
+        finally:
+            del self.workers[key]
+            if queue:
+                # the worker was cancelled, the handlers it did not run yet are dropped
+                self.size -= len(queue)
+                metrics.increment(f'{self.name}.dropped', len(queue))
+                queue.clear()
+            del self.queues[key]
+
+
+# on_privmsg_sent / on_whisper_sent are dispatched through this queue so that handlers do not delay sending replies
+sent_event_queue = EventQueue(name='events.sent')
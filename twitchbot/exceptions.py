@@ -22,3 +22,13 @@ class InvalidArgumentsError(Exception):
 class BadTwitchAPIResponse(Exception):
     def __init__(self, endpoint, message):
         super().__init__(f'bad response received from endpoint: {endpoint}\nextra details: {message}')
+
+
+class IrcAuthenticationError(Exception):
+    """
+    raised when twitch does not respond to the PASS / NICK sent when opening a irc connection with a welcome message
+    """
+
+    def __init__(self, response: str):
+        super().__init__(f'twitch gave a bad response to sending authentication: {response}')
+        self.response: str = response
@@ -7,6 +7,7 @@ from textwrap import wrap
 from .shared import get_bot
 from .config import get_nick
 from .enums import Event
+from .event_queue import sent_event_queue
 from .events import trigger_event
 from .ratelimit import privmsg_ratelimit, whisper_ratelimit
 
@@ -62,7 +63,6 @@ class Irc:
         """sends a message to a channel"""
         # import it locally to avoid circular import
         from .channel import channels, DummyChannel
-        from .modloader import trigger_mod_event
 
         channel = channel.lower()
         for line in _wrap_message(msg):
@@ -71,15 +71,11 @@ class Irc:
 
         # exclude calls from send_whisper being sent to the bots on_privmsg_received event
         if not msg.startswith('/w'):
-            if self.bot:
-                await self.bot.on_privmsg_sent(msg, channel, get_nick())
-            await trigger_mod_event(Event.on_privmsg_sent, msg, channel, get_nick(), channel=channel)
-            await trigger_event(Event.on_privmsg_sent, msg, channel, get_nick())
+            # the event handlers run in the background, in order for each channel, so they do not delay sending
+            sent_event_queue.publish(channel, _trigger_privmsg_sent, self.bot, msg, channel, get_nick())
 
     async def send_whisper(self, user: str, msg: str):
         """sends a whisper to a user"""
-        from .modloader import trigger_mod_event
-
         user = user.lower()
         for line in _wrap_message(f'/w {user} {msg}'):
             await whisper_ratelimit()
@@ -89,10 +85,7 @@ class Irc:
             # if i find a better fix, will do it instead, but until then, this works
             await asyncio.sleep(.6)
 
-        if self.bot:
-            await self.bot.on_whisper_sent(msg, user, get_nick())
-        await trigger_mod_event(Event.on_whisper_sent, msg, user, get_nick())
-        await trigger_event(Event.on_whisper_sent, msg, user, get_nick())
+        sent_event_queue.publish(f'/w {user}', _trigger_whisper_sent, self.bot, msg, user, get_nick())
 
     async def get_next_message(self):
         return (await self.reader.readline()).decode().strip()
@@ -101,6 +94,24 @@ class Irc:
         self.send('PONG :tmi.twitch.tv')
 
 
+async def _trigger_privmsg_sent(bot: 'BaseBot', msg: str, channel: str, sender: str):
+    from .modloader import trigger_mod_event
+
+    if bot:
+        await bot.on_privmsg_sent(msg, channel, sender)
+    await trigger_mod_event(Event.on_privmsg_sent, msg, channel, sender, channel=channel)
+    await trigger_event(Event.on_privmsg_sent, msg, channel, sender)
+
+
+async def _trigger_whisper_sent(bot: 'BaseBot', msg: str, receiver: str, sender: str):
+    from .modloader import trigger_mod_event
+
+    if bot:
+        await bot.on_whisper_sent(msg, receiver, sender)
+    await trigger_mod_event(Event.on_whisper_sent, msg, receiver, sender)
+    await trigger_event(Event.on_whisper_sent, msg, receiver, sender)
+
+
 def _wrap_message(msg):
     m = re.match(r'/w (?P<user>[\w\d_]+)', msg)
     if m:
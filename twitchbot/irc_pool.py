@@ -0,0 +1,493 @@
+import traceback
+from asyncio import StreamReader, StreamWriter, Queue, Task, Future, TimeoutError, ensure_future, get_event_loop, \
+    sleep, wait_for, shield
+from collections import deque
+from functools import partial
+from itertools import count
+from random import uniform
+from typing import List, Dict, Set, Optional, Iterable, Callable, Awaitable, Tuple, Deque
+
+from .config import cfg, get_nick
+from .exceptions import IrcAuthenticationError
+from .irc import Irc
+from .join_scheduler import JoinScheduler
+from .metrics import metrics, Histogram
+from .regex import RE_USER_JOIN
+from .util.connection_util import create_connection, send_auth, request_capabilities
+
+__all__ = ('IrcPool', 'PoolConnection', 'ConnectionFactory', 'READ_TIMEOUT', 'CONNECT_TIMEOUT',
+           'RECONNECT_BASE_DELAY', 'RECONNECT_MAX_DELAY', 'OUTBOX_SIZE', 'PING_INTERVAL', 'PONG_TIMEOUT',
+           'MAX_PING_LATENCY', 'MAX_SLOW_PONGS')
+
+ConnectionFactory = Callable[[], Awaitable[Tuple[StreamReader, StreamWriter]]]
+
+# twitch sends a PING about every 5 minutes, if nothing is received for longer than this the connection is dead
+READ_TIMEOUT = 360
+CONNECT_TIMEOUT = 10
+RECONNECT_BASE_DELAY = 1
+RECONNECT_MAX_DELAY = 120
+# max amount of messages kept while a connection is down, the oldest are dropped first
+OUTBOX_SIZE = 500
+# seconds between the PINGs the bot sends itself to measure the latency of each connection
+PING_INTERVAL = 60
+# a connection that does not answer a PING within this many seconds is reconnected
+PONG_TIMEOUT = 10
+# a connection is reconnected after MAX_SLOW_PONGS PONGs in a row took longer than this many seconds
+MAX_PING_LATENCY = 3
+MAX_SLOW_PONGS = 3
+
+
+class PoolConnection:
+    """
+    a single socket owned by a `IrcPool`
+
+    read connections are joined to a shard of the pool's channels and forward what they receive to the pool,
+    write connections do not join any channels, they only send messages and answer PINGs
+
+    when twitch closes the socket or it goes silent the connection is reopened with exponential backoff,
+    messages sent while it is down are kept in `outbox` and sent once it is back
+
+    every `PING_INTERVAL` seconds the connection sends its own PING and times the PONG,
+    a missing PONG or too many slow ones in a row also get the connection reopened
+    """
+
+    def __init__(self, pool: 'IrcPool', is_reader: bool):
+        self.pool: 'IrcPool' = pool
+        self.is_reader: bool = is_reader
+        self.irc: Optional[Irc] = None
+        self.connected: bool = False
+        self.channels: Set[str] = set()
+        self.outbox: Deque[str] = deque(maxlen=OUTBOX_SIZE)
+        self.latency: Histogram = Histogram(window=100)
+        self.slow_pongs: int = 0
+        self.task: Optional[Task] = None
+        self.ping_task: Optional[Task] = None
+        self._ping_tokens = count(1)
+        self._ping_token: str = ''
+        self._pong_waiter: Optional[Future] = None
+        self._drop_reason: str = ''
+
+    @property
+    def is_primary(self) -> bool:
+        """the primary read connection is the only one that forwards whispers, this prevents receiving duplicates"""
+        return bool(self.pool.readers) and self.pool.readers[0] is self
+
+    @property
+    def kind(self) -> str:
+        return 'read' if self.is_reader else 'write'
+
+    @property
+    def load(self) -> int:
+        return len(self.channels)
+
+    async def open(self):
+        """opens the socket, authenticates, and requests capabilities if this is a read connection"""
+        await self._open()
+        self.task = ensure_future(self._run())
+
+    def close(self):
+        self.connected = False
+        if self.task is not None:
+            self.task.cancel()
+        if self.ping_task is not None:
+            self.ping_task.cancel()
+        if self.irc is not None:
+            self.irc.writer.close()
+
+    def send(self, msg: str):
+        if self.connected:
+            self.irc.send(msg)
+        else:
+            self.outbox.append(msg)
+
+    def join(self, channel: str):
+        self.channels.add(channel)
+        self.pool.join_scheduler.schedule(channel, self)
+
+    def part(self, channel: str):
+        self.channels.discard(channel)
+        self.pool.join_scheduler.cancel(channel)
+        self.send(f'PART #{channel}')
+
+    async def _open(self):
+        reader, writer = await wait_for(self.pool.connection_factory(), CONNECT_TIMEOUT)
+        irc = Irc(reader, writer)
+
+        send_auth(irc)
+        resp = await wait_for(irc.get_next_message(), CONNECT_TIMEOUT)
+        if 'welcome' not in resp.lower():
+            writer.close()
+            raise IrcAuthenticationError(resp)
+
+        if self.is_reader:
+            request_capabilities(irc)
+
+        self.irc = irc
+        self.connected = True
+        self.pool.publish_connection_gauges()
+        self.slow_pongs = 0
+        self._drop_reason = ''
+        while self.outbox:
+            irc.send(self.outbox.popleft())
+
+        if self.ping_task is not None:
+            self.ping_task.cancel()
+        self.ping_task = ensure_future(self._ping_loop(irc))
+
+    async def _run(self):
+        while True:
+            await self._read_loop()
+
+            if self.pool.closing:
+                # wake up whoever is waiting on the pool so they can notice it is closed
+                self.pool.queue.put_nowait('')
+                return
+
+            await self._reconnect()
+
+    async def _read_loop(self):
+        """forwards received messages to the pool, returns when the connection is closed or goes silent"""
+        while True:
+            try:
+                line = await wait_for(self.irc.get_next_message(), self.pool.read_timeout)
+            except TimeoutError:
+                print(f'[IRC POOL] nothing was received on a {self.kind} connection '
+                      f'for {self.pool.read_timeout} seconds, assuming it is dead')
+                return
+            except (OSError, ValueError) as e:
+                # OSError covers lost connections and ssl errors, ValueError is raised for lines over the read limit
+                print(f'[IRC POOL] a {self.kind} connection was lost: {e}')
+                return
+            except Exception as e:
+                print(f'\n[IRC POOL] unexpected error while reading from a {self.kind} connection, reconnecting:\n'
+                      f'error: {type(e)}\n'
+                      f'reason: {e}\n'
+                      f'stack trace:')
+                traceback.print_exc()
+                return
+
+            if not line:
+                if self.irc.reader.at_eof():
+                    if self._drop_reason:
+                        print(f'[IRC POOL] reconnecting a {self.kind} connection: {self._drop_reason}')
+                    elif not self.pool.closing:
+                        print(f'[IRC POOL] a {self.kind} connection was closed by twitch')
+                    return
+                continue
+
+            # every connection gets its own PINGs, so they have to be answered on the connection that received them
+            if line.startswith('PING'):
+                self.irc.send_pong()
+
+            command = _irc_command(line)
+
+            # PONGs are answers to the PINGs sent by `_ping_loop`, no one else is interested in them
+            if command == 'PONG':
+                self._handle_pong(line)
+                continue
+
+            if self.is_reader and command == 'JOIN':
+                self._check_join_confirmation(line)
+
+            if self.is_reader and (self.is_primary or command != 'WHISPER'):
+                self.pool.queue.put_nowait(line)
+
+    async def _reconnect(self):
+        """reopens the connection with exponential backoff and jitter, then rejoins its channels"""
+        loop = get_event_loop()
+        went_down = loop.time()
+        self.connected = False
+        self.irc.writer.close()
+        self.ping_task.cancel()
+        self.pool.publish_connection_gauges()
+        metrics.increment('irc.disconnects')
+
+        for channel in self.channels:
+            self.pool.join_scheduler.cancel(channel)
+
+        attempt = 0
+        while True:
+            delay = min(self.pool.reconnect_max_delay, self.pool.reconnect_base_delay * 2 ** attempt)
+            await sleep(delay / 2 + uniform(0, delay / 2))
+            try:
+                await self._open()
+                break
+            except (OSError, TimeoutError, IrcAuthenticationError) as e:
+                attempt += 1
+                metrics.increment('irc.reconnect_failures')
+                print(f'[IRC POOL] reconnect attempt #{attempt} for a {self.kind} connection failed: {e}')
+
+        downtime = loop.time() - went_down
+        metrics.increment('irc.reconnects')
+        metrics.increment('irc.downtime_seconds', downtime)
+        metrics.observe('irc.reconnect_downtime', downtime)
+        print(f'[IRC POOL] reconnected a {self.kind} connection after {downtime:.1f} seconds')
+
+        for channel in self.channels:
+            self.pool.join_scheduler.schedule(channel, self)
+
+    async def _ping_loop(self, irc: Irc):
+        loop = get_event_loop()
+        while True:
+            await sleep(self.pool.ping_interval)
+
+            self._ping_token = str(next(self._ping_tokens))
+            self._pong_waiter = loop.create_future()
+            sent_at = loop.time()
+            irc.send(f'PING :{self._ping_token}')
+
+            try:
+                await wait_for(shield(self._pong_waiter), self.pool.pong_timeout)
+            except TimeoutError:
+                metrics.increment('irc.pong_timeouts')
+                return self._drop(f'no PONG was received within {self.pool.pong_timeout} seconds')
+
+            latency = loop.time() - sent_at
+            self.latency.observe(latency)
+            metrics.observe('irc.ping_latency', latency)
+
+            self.slow_pongs = self.slow_pongs + 1 if latency > self.pool.max_ping_latency else 0
+            if self.slow_pongs >= MAX_SLOW_PONGS:
+                metrics.increment('irc.slow_connections')
+                return self._drop(f'the last {self.slow_pongs} PONGs took longer than '
+                                  f'{self.pool.max_ping_latency} seconds')
+
+    def _handle_pong(self, line: str):
+        token = line.rsplit(':', 1)[-1]
+        if token == self._ping_token and self._pong_waiter is not None and not self._pong_waiter.done():
+            self._pong_waiter.set_result(token)
+
+    def _drop(self, reason: str):
+        """closes the socket so the read loop ends and the connection is reopened"""
+        self._drop_reason = reason
+        self.irc.writer.close()
+
+    def _check_join_confirmation(self, line: str):
+        # anchored to the start of the line, chat text like `x JOIN #chan` must not confirm a join
+        m = RE_USER_JOIN.match(line)
+        if m and m['user'] == get_nick().lower():
+            self.pool.join_scheduler.confirm(m['channel'])
+
+
+class IrcPool(Irc):
+    """
+    a drop-in replacement for `Irc` that spreads the channels across multiple read connections
+
+    every read connection joins at most `channels_per_connection` channels,
+    messages received by any of the read connections are merged and returned from `get_next_message()`,
+    messages sent using `send()` go to the write connections,
+    or the first read connection if the pool has no dedicated write connections
+    """
+
+    def __init__(self, connection_factory: ConnectionFactory = create_connection,
+                 channels_per_connection: int = None, read_connections: int = None, write_connections: int = None):
+        """
+        :param connection_factory: coroutine function that opens a new (reader, writer) pair to the irc server
+        :param channels_per_connection: max channels joined on one read connection, 0 or less means no limit
+        :param read_connections: minimum amount of read connections to open
+        :param write_connections: amount of dedicated write connections, 0 sends messages on the first read connection
+        """
+        super().__init__(None, None)
+        self.connection_factory: ConnectionFactory = connection_factory
+        self.channels_per_connection: int = _default(channels_per_connection, cfg.irc_channels_per_connection)
+        self.min_read_connections: int = max(1, _default(read_connections, cfg.irc_read_connections))
+        self.write_connection_count: int = max(0, _default(write_connections, cfg.irc_write_connections))
+        self.readers: List[PoolConnection] = []
+        self.writers: List[PoolConnection] = []
+        self.channel_connections: Dict[str, PoolConnection] = {}
+        self.join_scheduler: JoinScheduler = JoinScheduler()
+        self.queue: Queue = Queue()
+        self.read_timeout: float = READ_TIMEOUT
+        self.reconnect_base_delay: float = RECONNECT_BASE_DELAY
+        self.reconnect_max_delay: float = RECONNECT_MAX_DELAY
+        self.ping_interval: float = PING_INTERVAL
+        self.pong_timeout: float = PONG_TIMEOUT
+        self.max_ping_latency: float = MAX_PING_LATENCY
+        self.closing: bool = False
+        # joins started by raw JOIN messages, send() can not await them
+        self.join_tasks: Set[Task] = set()
+
+    @property
+    def connections(self) -> List[PoolConnection]:
+        return self.readers + self.writers
+
+    @property
+    def channels(self) -> Set[str]:
+        return set(self.channel_connections)
+
+    async def connect(self, channels: Iterable[str] = ()):
+        """
+        opens all the connections needed for `channels`, then spreads the channels evenly across the read connections
+
+        raises IrcAuthenticationError if twitch rejects the login
+        """
+        channels = [_normalize_channel(channel) for channel in channels]
+
+        for _ in range(max(self.min_read_connections, self._read_connections_needed(len(channels)))):
+            await self._add_connection(is_reader=True)
+
+        for _ in range(self.write_connection_count):
+            await self._add_connection(is_reader=False)
+
+        for channel in channels:
+            if channel not in self.channel_connections:
+                self._join_on(self._least_loaded_reader(), channel)
+
+        eta = self.join_scheduler.estimated_time()
+        if eta:
+            print(f'[IRC POOL] joining {len(channels)} channels, this will take about {eta:.0f} seconds '
+                  f'(the pace is set by irc_join_rate_limit and irc_join_rate_window in the config)')
+
+    async def join(self, channel: str):
+        """
+        joins the channel on the least loaded read connection,
+        if all read connections are full a new one is opened and the channels are rebalanced
+        """
+        channel = _normalize_channel(channel)
+        if channel in self.channel_connections:
+            return
+
+        conn = self._least_loaded_reader()
+        if conn is None:
+            await self._add_connection(is_reader=True)
+            self.rebalance()
+            conn = self._least_loaded_reader()
+
+        self._join_on(conn, channel)
+
+    def part(self, channel: str):
+        channel = _normalize_channel(channel)
+        conn = self.channel_connections.pop(channel, None)
+        if conn is not None:
+            conn.part(channel)
+
+    def rebalance(self):
+        """moves channels from the busiest read connections to the least busy ones until all loads differ by 1 at most"""
+        if not self.readers:
+            return
+
+        while True:
+            busiest = max(self.readers, key=_load)
+            idlest = min(self.readers, key=_load)
+            if busiest.load - idlest.load <= 1:
+                return
+
+            # part first, joining first would have both connections forward the channel's messages for a moment
+            channel = next(iter(busiest.channels))
+            busiest.part(channel)
+            self._join_on(idlest, channel)
+
+    def send(self, msg):
+        """
+        sends a raw message with no modifications, this function is not ratelimited!
+
+        JOIN and PART are handled by the pool so the channels stay sharded,
+        QUIT is sent on every connection, everything else is sent on a write connection
+        """
+        command, _, params = msg.partition(' ')
+        command = command.upper()
+
+        if command == 'JOIN':
+            for channel in _split_channels(params):
+                task = ensure_future(self.join(channel))
+                self.join_tasks.add(task)
+                task.add_done_callback(partial(self._join_done, channel))
+        elif command == 'PART':
+            for channel in _split_channels(params):
+                self.part(channel)
+        elif command == 'QUIT':
+            self.closing = True
+            for conn in self.connections:
+                conn.send(msg)
+        else:
+            self._writer_for(params.split(' ', 1)[0]).send(msg)
+
+    def _join_done(self, channel: str, task: Task):
+        self.join_tasks.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+
+        metrics.increment('irc.join_failures')
+        e = task.exception()
+        print(f'\n[IRC POOL] failed to join #{channel}, details:\n'
+              f'error: {type(e)}\n'
+              f'reason: {e}\n'
+              f'stack trace:')
+        traceback.print_exception(type(e), e, e.__traceback__)
+
+    def send_pong(self):
+        """PINGs are answered by the connection that received them, see `PoolConnection`"""
+
+    async def get_next_message(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.closing = True
+        self.join_scheduler.stop()
+        for task in tuple(self.join_tasks):
+            task.cancel()
+        for conn in self.connections:
+            conn.close()
+
+        self.queue.put_nowait('')
+
+        self.readers.clear()
+        self.writers.clear()
+        self.channel_connections.clear()
+
+    def publish_connection_gauges(self):
+        metrics.set_gauge('irc.connections', len(self.connections))
+        metrics.set_gauge('irc.connections_down', sum(not conn.connected for conn in self.connections))
+
+    async def _add_connection(self, is_reader: bool) -> PoolConnection:
+        conn = PoolConnection(self, is_reader=is_reader)
+        await conn.open()
+        (self.readers if is_reader else self.writers).append(conn)
+        self.publish_connection_gauges()
+        return conn
+
+    def _join_on(self, conn: PoolConnection, channel: str):
+        self.channel_connections[channel] = conn
+        conn.join(channel)
+
+    def _least_loaded_reader(self) -> Optional[PoolConnection]:
+        available = [conn for conn in self.readers
+                     if self.channels_per_connection <= 0 or conn.load < self.channels_per_connection]
+        return min(available, key=_load) if available else None
+
+    def _read_connections_needed(self, channel_count: int) -> int:
+        if self.channels_per_connection <= 0:
+            return 1
+        return -(-channel_count // self.channels_per_connection)
+
+    def _writer_for(self, target: str) -> PoolConnection:
+        # messages for the same target always use the same connection, this keeps them in order
+        if self.writers:
+            return self.writers[hash(target) % len(self.writers)]
+        return self.readers[0]
+
+
+def _default(value, default):
+    return default if value is None else value
+
+
+def _load(conn: PoolConnection) -> int:
+    return conn.load
+
+
+def _normalize_channel(channel: str) -> str:
+    return channel.strip().lstrip('#').lower()
+
+
+def _split_channels(params: str) -> List[str]:
+    return [_normalize_channel(channel) for channel in params.split(',') if channel.strip()]
+
+
+def _irc_command(line: str) -> str:
+    """returns the command of a raw irc line, ex: PRIVMSG for `@tags :nick!nick@nick.tmi.twitch.tv PRIVMSG #chan :hi`"""
+    parts = line.split(' ', 3)
+    if parts[0].startswith('@'):
+        parts.pop(0)
+    if parts and parts[0].startswith(':'):
+        parts.pop(0)
+    return parts[0] if parts else ''
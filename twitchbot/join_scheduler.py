@@ -0,0 +1,164 @@
+from asyncio import Event, Task, TimeoutError, ensure_future, get_event_loop, wait_for
+from collections import OrderedDict, defaultdict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, TYPE_CHECKING
+
+from .config import cfg
+
+if TYPE_CHECKING:
+    from .irc_pool import PoolConnection
+
+__all__ = ('JoinScheduler', 'JOIN_CONFIRM_TIMEOUT', 'JOIN_MAX_RETRIES', 'MAX_JOIN_LINE_LENGTH')
+
+# seconds to wait for twitch to echo the bot's JOIN before sending it again
+JOIN_CONFIRM_TIMEOUT = 15
+JOIN_MAX_RETRIES = 3
+# irc lines are limited to 512 bytes including the trailing \r\n
+MAX_JOIN_LINE_LENGTH = 500
+
+
+class ScheduledJoin:
+    __slots__ = 'channel', 'connection', 'attempts', 'sent_at'
+
+    def __init__(self, channel: str, connection: 'PoolConnection'):
+        self.channel: str = channel
+        self.connection: 'PoolConnection' = connection
+        self.attempts: int = 0
+        self.sent_at: float = 0
+
+
+class JoinScheduler:
+    """
+    sends JOINs for the pool's connections without going over twitch's join ratelimit
+
+    queued channels are sent as comma separated JOINs using as much of the ratelimit budget as is free,
+    a channel counts as joined once twitch echos the bot's own JOIN for it,
+    JOINs that are not confirmed within `confirm_timeout` seconds are queued again up to `max_retries` times
+    """
+
+    def __init__(self, rate_limit: int = None, rate_window: float = None,
+                 confirm_timeout: float = JOIN_CONFIRM_TIMEOUT, max_retries: int = JOIN_MAX_RETRIES):
+        """
+        :param rate_limit: max amount of channels joined every `rate_window` seconds
+        :param rate_window: the length of the ratelimit window in seconds
+        :param confirm_timeout: seconds to wait for a JOIN to be confirmed before sending it again
+        :param max_retries: how many times a JOIN is resent before giving up on the channel
+        """
+        self.rate_limit: int = max(1, rate_limit if rate_limit is not None else cfg.irc_join_rate_limit)
+        self.rate_window: float = rate_window if rate_window is not None else cfg.irc_join_rate_window
+        self.confirm_timeout: float = confirm_timeout
+        self.max_retries: int = max_retries
+        self.queued: Dict[str, ScheduledJoin] = OrderedDict()
+        self.pending: Dict[str, ScheduledJoin] = {}
+        self.joined: Set[str] = set()
+        self.failed: Set[str] = set()
+        self._sent_times: Deque[float] = deque()
+        self._wakeup: Event = Event()
+        self._task: Optional[Task] = None
+
+    def schedule(self, channel: str, connection: 'PoolConnection'):
+        """queues a JOIN for the channel to be sent on `connection`"""
+        self.cancel(channel)
+        self.queued[channel] = ScheduledJoin(channel, connection)
+        self._wakeup.set()
+
+        if self._task is None or self._task.done():
+            self._task = ensure_future(self._run())
+
+    def confirm(self, channel: str):
+        """marks the channel as joined, called when twitch echos the bot's JOIN"""
+        self.queued.pop(channel, None)
+        self.pending.pop(channel, None)
+        self.failed.discard(channel)
+        self.joined.add(channel)
+
+    def cancel(self, channel: str):
+        """forgets about the channel, any JOIN for it that has not been sent yet will not be sent"""
+        self.queued.pop(channel, None)
+        self.pending.pop(channel, None)
+        self.joined.discard(channel)
+        self.failed.discard(channel)
+
+    def is_joined(self, channel: str) -> bool:
+        return channel in self.joined
+
+    def estimated_time(self) -> float:
+        """seconds until all currently queued channels have been sent a JOIN, not counting retries"""
+        remaining = len(self.queued) - self._free_slots(get_event_loop().time())
+        if remaining <= 0:
+            return 0
+        return -(-remaining // self.rate_limit) * self.rate_window
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = get_event_loop()
+        while self.queued or self.pending:
+            now = loop.time()
+            self._requeue_unconfirmed(now)
+
+            free = self._free_slots(now)
+            if self.queued and free:
+                self._send([self.queued.popitem(last=False)[1] for _ in range(min(free, len(self.queued)))], now)
+
+            self._wakeup.clear()
+            try:
+                await wait_for(self._wakeup.wait(), self._seconds_until_next_action(loop.time()))
+            except TimeoutError:
+                pass
+
+    def _send(self, joins: List[ScheduledJoin], now: float):
+        channels_by_connection: Dict['PoolConnection', List[str]] = defaultdict(list)
+        for join in joins:
+            # the connection schedules all of its channels again once it has reconnected
+            if not join.connection.connected:
+                continue
+
+            join.attempts += 1
+            join.sent_at = now
+            self.pending[join.channel] = join
+            self._sent_times.append(now)
+            channels_by_connection[join.connection].append(join.channel)
+
+        for connection, channels in channels_by_connection.items():
+            for line in _join_lines(channels):
+                connection.send(line)
+
+    def _requeue_unconfirmed(self, now: float):
+        for join in [join for join in self.pending.values() if now - join.sent_at >= self.confirm_timeout]:
+            del self.pending[join.channel]
+            if join.attempts > self.max_retries:
+                print(f'[JOIN SCHEDULER] twitch did not confirm joining #{join.channel} '
+                      f'after {join.attempts} attempts, giving up on joining it')
+                self.failed.add(join.channel)
+            else:
+                self.queued[join.channel] = join
+
+    def _free_slots(self, now: float) -> int:
+        while self._sent_times and now - self._sent_times[0] >= self.rate_window:
+            self._sent_times.popleft()
+        return self.rate_limit - len(self._sent_times)
+
+    def _seconds_until_next_action(self, now: float) -> float:
+        waits = []
+        if self.queued and self._sent_times:
+            waits.append(self._sent_times[0] + self.rate_window - now)
+        if self.pending:
+            waits.append(min(join.sent_at for join in self.pending.values()) + self.confirm_timeout - now)
+        return max(0.0, min(waits)) if waits else self.confirm_timeout
+
+
+def _join_lines(channels: Iterable[str]) -> List[str]:
+    lines = []
+    line = ''
+    for channel in channels:
+        if line and len(line) + len(channel) + 2 > MAX_JOIN_LINE_LENGTH:
+            lines.append(line)
+            line = ''
+        line = f'{line},#{channel}' if line else f'JOIN #{channel}'
+
+    if line:
+        lines.append(line)
+    return lines
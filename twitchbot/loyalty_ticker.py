@@ -1,20 +1,32 @@
+import traceback
 from .util import add_task, task_running, stop_task
 from asyncio import sleep
-from .database import add_balance, session
+from .database import add_balance_to_users_async
 from .config import cfg
 from .channel import channels
-from .config import cfg
+from .metrics import metrics
 
 LOYALTY_TICKER_TASK_NAME = '_loyalty_ticker'
 
 
 async def _ticker_loop():
     while True:
-        for channel in channels.values():
-            for viewer in channel.chatters.all_viewers:
-                add_balance(channel.name, viewer, cfg.loyalty_amount, commit=False)
-                await sleep(.2)
-            session.commit()
+        for channel in tuple(channels.values()):
+            # a snapshot, JOIN / PART messages received while the balances are being given do not change it
+            viewers = channel.chatters.all_viewers
+            if not viewers:
+                continue
+
+            try:
+                await add_balance_to_users_async(channel.name, viewers, cfg.loyalty_amount)
+            except Exception as e:
+                print(f'\nloyalty ticker failed to give viewers of #{channel.name} their {cfg.loyalty_amount} points:\n'
+                      f'error: {type(e)}\n'
+                      f'reason: {e}\n'
+                      f'stack trace:')
+                traceback.print_exc()
+            else:
+                metrics.increment('loyalty.viewers_paid', len(viewers))
 
         await sleep(cfg.loyalty_interval)
 
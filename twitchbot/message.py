@@ -9,7 +9,7 @@ from .regex import RE_PRIVMSG, RE_WHISPER, RE_USER_JOIN, RE_USERNOTICE, RE_USER_
 from .enums import MessageType
 from .util import split_message
 from .tags import Tags
-from .emote import emotes, Emote
+from .emote import get_global_emotes, Emote
 from .config import cfg
 
 if TYPE_CHECKING:
@@ -83,6 +83,7 @@ class Message:
          or self._parse_user_part()
          or self._check_ping())
 
+        emotes = get_global_emotes()
         if self.parts and any(p in emotes for p in self.parts):
             self.emotes = tuple(emotes[p] for p in self.parts if p in emotes)
 
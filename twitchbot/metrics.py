@@ -0,0 +1,120 @@
+from asyncio import get_event_loop, sleep
+from bisect import bisect_left
+from collections import defaultdict, deque
+from typing import Deque, DefaultDict, Dict, Sequence
+
+__all__ = ('metrics', 'Metrics', 'Histogram', 'DEFAULT_HISTOGRAM_BUCKETS', 'measure_loop_lag', 'LOOP_LAG_INTERVAL')
+
+# upper bounds of the histogram buckets, values above the last bound go into a extra overflow bucket
+DEFAULT_HISTOGRAM_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300)
+# seconds between loop lag samples
+LOOP_LAG_INTERVAL = .1
+
+
+class Histogram:
+    """
+    rolling histogram, counts how many of the last `window` observed values fall into each bucket
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_HISTOGRAM_BUCKETS, window: int = 1000):
+        self.buckets: Sequence[float] = tuple(sorted(buckets))
+        self.values: Deque[float] = deque(maxlen=window)
+        self.total_count: int = 0
+
+    def observe(self, value: float):
+        self.values.append(value)
+        self.total_count += 1
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    @property
+    def last(self) -> float:
+        return self.values[-1] if self.values else 0
+
+    @property
+    def mean(self) -> float:
+        return sum(self.values) / len(self.values) if self.values else 0
+
+    def percentile(self, percent: float) -> float:
+        """returns the value below which `percent` (0-100) of the values in the window are"""
+        if not self.values:
+            return 0
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def bucket_counts(self) -> Dict[str, int]:
+        counts = [0] * (len(self.buckets) + 1)
+        for value in self.values:
+            counts[bisect_left(self.buckets, value)] += 1
+        labels = [f'<={bound}' for bound in self.buckets] + [f'>{self.buckets[-1]}']
+        return dict(zip(labels, counts))
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'total_count': self.total_count,
+            'last': self.last,
+            'mean': self.mean,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': max(self.values) if self.values else 0,
+        }
+
+
+class Metrics:
+    """
+    process wide registry of the bot's counters, gauges and histograms
+
+    names are dotted strings grouped by subsystem, ex: `irc.reconnects`
+    """
+
+    def __init__(self):
+        self.counters: DefaultDict[str, float] = defaultdict(float)
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def increment(self, name: str, value: float = 1):
+        self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """records `value` in the histogram `name`, the histogram is created with the default buckets if needed"""
+        self.histogram(name).observe(value)
+
+    def histogram(self, name: str) -> Histogram:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        return self.histograms[name]
+
+    def snapshot(self) -> dict:
+        """returns a copy of all current values, histograms are summarized"""
+        return {
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'histograms': {name: histogram.summary() for name, histogram in self.histograms.items()},
+        }
+
+    def reset(self):
+        self.counters.clear()
+        self.gauges.clear()
+        self.histograms.clear()
+
+
+metrics = Metrics()
+
+
+async def measure_loop_lag(interval: float = LOOP_LAG_INTERVAL, name: str = 'loop.lag'):
+    """
+    records how late the event loop wakes up from a `interval` second sleep in the histogram `name`,
+    anything blocking the loop (ex: a synchronous database query) shows up as lag
+    """
+    loop = get_event_loop()
+    while True:
+        start = loop.time()
+        await sleep(interval)
+        metrics.observe(name, max(0.0, loop.time() - start - interval))
@@ -1,4 +1,8 @@
 from .register_util import *
+from .http_util import *
+from .helix_scheduler import *
+from .user_resolver import *
+from .response_cache import *
 from .twitch_api_util import *
 from .connection_util import *
 from .message_util import *
@@ -4,16 +4,29 @@ import ssl
 from ..config import get_nick, get_oauth
 from ..irc import Irc
 
-__all__ = ('SSL_PORT', 'HTTP_PORT', 'create_connection', 'send_auth', 'create_irc')
+__all__ = ('SSL_PORT', 'HTTP_PORT', 'IRC_HOST', 'IRC_CAPABILITIES', 'create_connection', 'send_auth',
+           'request_capabilities', 'create_irc')
 
+IRC_HOST = 'irc.chat.twitch.tv'
 SSL_PORT = 443
 HTTP_PORT = 6667
 
+IRC_CAPABILITIES = (
+    # enable receiving/sending whispers
+    'twitch.tv/commands',
+    # enable seeing bit donations and such
+    'twitch.tv/tags',
+    # enable seeing user joins
+    'twitch.tv/membership',
+)
 
-async def create_connection():
-    ssl_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
-    ssl_context.get_ciphers()
-    return await asyncio.open_connection('irc.chat.twitch.tv', SSL_PORT, ssl=ssl_context)
+
+async def create_connection(host: str = IRC_HOST, port: int = SSL_PORT, use_ssl: bool = True):
+    ssl_context = None
+    if use_ssl:
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        ssl_context.get_ciphers()
+    return await asyncio.open_connection(host, port, ssl=ssl_context)
 
 
 def send_auth(irc: Irc):
@@ -22,6 +35,11 @@ def send_auth(irc: Irc):
         f'NICK {get_nick()}')
 
 
+def request_capabilities(irc: Irc, capabilities=IRC_CAPABILITIES):
+    """requests the capabilities from twitch needed to get message tags, receive whispers, ect"""
+    irc.send_all(*(f'CAP REQ :{cap}' for cap in capabilities))
+
+
 async def create_irc() -> Irc:
     reader, writer = await create_connection()
     return Irc(reader=reader, writer=writer)
@@ -0,0 +1,126 @@
+import time
+from asyncio import CancelledError, Future, TimerHandle, get_event_loop
+from heapq import heappop, heappush
+from itertools import count
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from ..data import RateLimit
+from ..enums import RequestPriority
+from ..metrics import metrics
+
+__all__ = ('HelixScheduler', 'helix_scheduler', 'HELIX_PRIORITY_RESERVE', 'HELIX_DEFAULT_RESET_SECONDS')
+
+# fraction of the ratelimit bucket a priority leaves for higher priorities,
+# ex: low priority requests wait once less than 20% of the bucket is left
+HELIX_PRIORITY_RESERVE: Dict[RequestPriority, float] = {
+    RequestPriority.HIGH: 0,
+    RequestPriority.NORMAL: .05,
+    RequestPriority.LOW: .2,
+}
+# seconds waited for the bucket to refill when a response had no usable Ratelimit-Reset header
+HELIX_DEFAULT_RESET_SECONDS = 1
+
+
+class HelixScheduler:
+    """
+    keeps helix requests within the ratelimit twitch reports in the Ratelimit-* headers of every response
+
+    requests wait in a queue ordered by priority once the budget left for their priority is used up,
+    and are sent once the bucket resets, so a burst of low priority lookups waits instead of
+    using up the requests the stream status polls need
+
+    the budget is unknown until the first response, until then every request is sent right away
+    """
+
+    def __init__(self, reserve: Mapping[RequestPriority, float] = None):
+        self.reserve: Mapping[RequestPriority, float] = reserve or HELIX_PRIORITY_RESERVE
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        # unix time the bucket is full again
+        self.reset: float = 0
+        self.in_flight: int = 0
+        self._queue: List[Tuple[int, int, Future]] = []
+        self._counter: Iterator[int] = count()
+        self._timer: Optional[TimerHandle] = None
+
+    def available(self, priority: RequestPriority = RequestPriority.NORMAL) -> bool:
+        """returns True if a request with this priority can be sent now"""
+        if self.remaining is None:
+            return True
+
+        if self.reset <= time.time():
+            # the bucket refilled, the next response tells us the real budget
+            self.remaining = self.limit
+
+        return self.remaining - self.in_flight > self.limit * self.reserve.get(priority, 0)
+
+    async def acquire(self, priority: RequestPriority = RequestPriority.NORMAL):
+        """waits until a request with this priority can be sent, `release()` must be called once it is done"""
+        if not self._queue and self.available(priority):
+            self.in_flight += 1
+            return
+
+        future = get_event_loop().create_future()
+        heappush(self._queue, (priority, next(self._counter), future))
+        metrics.increment('helix.delayed_requests')
+        start = time.perf_counter()
+        self._dispatch()
+
+        try:
+            await future
+        except CancelledError:
+            # the slot was given to this request just before it was cancelled
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+        metrics.observe('helix.wait_seconds', time.perf_counter() - start)
+
+    def release(self, headers: Mapping[str, str] = None):
+        """marks a request as done, updating the budget from the response's headers if it has them"""
+        self.in_flight = max(0, self.in_flight - 1)
+
+        ratelimit = self._parse_headers(headers)
+        if ratelimit is not None:
+            self.limit, self.remaining, self.reset = ratelimit.limit, ratelimit.remaining, ratelimit.reset
+            metrics.set_gauge('helix.ratelimit_remaining', ratelimit.remaining)
+        elif self.remaining is not None:
+            self.remaining = max(0, self.remaining - 1)
+
+        self._dispatch()
+
+    @staticmethod
+    def _parse_headers(headers: Optional[Mapping[str, str]]) -> Optional[RateLimit]:
+        if not headers or 'Ratelimit-Remaining' not in headers:
+            return None
+
+        try:
+            return RateLimit.from_headers(headers)
+        except (TypeError, ValueError):
+            return None
+
+    def _dispatch(self):
+        while self._queue:
+            priority, _, future = self._queue[0]
+            if future.done():
+                heappop(self._queue)
+                continue
+
+            # the queue is ordered by priority, if the first request has to wait everyone after it does too
+            if not self.available(priority):
+                break
+
+            heappop(self._queue)
+            self.in_flight += 1
+            future.set_result(None)
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._queue:
+            delay = self.reset - time.time() if self.reset > time.time() else HELIX_DEFAULT_RESET_SECONDS
+            self._timer = get_event_loop().call_later(delay, self._dispatch)
+
+
+helix_scheduler = HelixScheduler()
@@ -0,0 +1,51 @@
+from asyncio import AbstractEventLoop, get_event_loop
+from typing import Optional
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+__all__ = ('get_http_session', 'close_http_session', 'HTTP_CONNECTION_LIMIT', 'HTTP_CONNECTIONS_PER_HOST',
+           'HTTP_DNS_CACHE_SECONDS', 'HTTP_KEEPALIVE_SECONDS', 'HTTP_TIMEOUT_SECONDS')
+
+# open connections across all hosts, requests past this wait for a connection to be free
+HTTP_CONNECTION_LIMIT = 100
+# open connections to a single host (ex: api.twitch.tv)
+HTTP_CONNECTIONS_PER_HOST = 20
+# seconds a resolved hostname is reused before it is looked up again
+HTTP_DNS_CACHE_SECONDS = 300
+# seconds a idle connection is kept open to be reused by the next request
+HTTP_KEEPALIVE_SECONDS = 30
+HTTP_TIMEOUT_SECONDS = 10
+
+_session: Optional[ClientSession] = None
+_session_loop: Optional[AbstractEventLoop] = None
+
+
+def get_http_session() -> ClientSession:
+    """
+    returns the ClientSession shared by every request the bot makes, it is created on first use
+
+    the session keeps connections open between requests, so requests to the same host do not pay for
+    a new DNS lookup, TCP connection and TLS handshake every time
+    """
+    global _session, _session_loop
+
+    loop = get_event_loop()
+    # a session can only be used on the event loop it was created on
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session = ClientSession(connector=TCPConnector(limit=HTTP_CONNECTION_LIMIT,
+                                                        limit_per_host=HTTP_CONNECTIONS_PER_HOST,
+                                                        ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+                                                        keepalive_timeout=HTTP_KEEPALIVE_SECONDS),
+                                 timeout=ClientTimeout(total=HTTP_TIMEOUT_SECONDS))
+        _session_loop = loop
+
+    return _session
+
+
+async def close_http_session():
+    """closes the shared session and its open connections, the next request creates a new session"""
+    global _session, _session_loop
+
+    session, _session, _session_loop = _session, None, None
+    if session is not None and not session.closed:
+        await session.close()
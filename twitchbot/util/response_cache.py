@@ -0,0 +1,114 @@
+import time
+from asyncio import Future, Task, ensure_future, shield
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from ..metrics import metrics
+
+__all__ = ('ResponseCache', 'API_CACHE_TTLS', 'API_CACHE_MAX_SIZE')
+
+# endpoint -> (seconds a response is fresh, seconds after that it is still returned while it is refreshed)
+API_CACHE_TTLS: Dict[str, Tuple[float, float]] = {
+    'followers': (60, 300),
+    'stream': (30, 60),
+    # every page of a channel's followers, refreshing a large channel takes many requests
+    'all_followers': (600, 3600),
+}
+# the least recently used responses are removed once this many are cached
+API_CACHE_MAX_SIZE = 5000
+
+CacheKey = Tuple[str, Hashable]
+# (fresh until, stale until, response)
+CacheEntry = Tuple[float, float, Any]
+
+
+class ResponseCache:
+    """
+    caches api responses per endpoint and key (ex: ('followers', 'channel')), the ttls of a endpoint are in API_CACHE_TTLS
+
+    - fresh responses are returned without a request
+    - stale responses are returned right away, and refreshed in the background
+    - concurrent requests for the same endpoint and key share one request
+    - if the request raises, the error is returned to everyone waiting on it and nothing is cached,
+      a failed background refresh keeps the stale response
+
+    hits, stale hits and misses are counted in the metrics as `api_cache.<endpoint>.<hits|stale_hits|misses>`
+    """
+
+    def __init__(self, max_size: int = API_CACHE_MAX_SIZE):
+        self.max_size: int = max(1, max_size)
+        # ordered from least to most recently used
+        self.entries: 'OrderedDict[CacheKey, CacheEntry]' = OrderedDict()
+        self._requests: Dict[CacheKey, Task] = {}
+
+    async def get(self, endpoint: str, key: Hashable, fetch: Callable[[], Awaitable[Any]],
+                  ttl: Optional[float] = None, stale_ttl: Optional[float] = None) -> Any:
+        """
+        returns the cached response of `endpoint` for `key`, calling `fetch` to request it if needed
+
+        :param ttl: seconds the response is fresh, defaults to the endpoint's ttl
+        :param stale_ttl: seconds the response is returned while being refreshed after it stops being fresh
+        """
+        default_ttl, default_stale_ttl = API_CACHE_TTLS.get(endpoint, (0, 0))
+        ttl = default_ttl if ttl is None else ttl
+        stale_ttl = default_stale_ttl if stale_ttl is None else stale_ttl
+        cache_key = endpoint, key
+
+        entry = self.entries.get(cache_key)
+        if entry is not None:
+            fresh_until, stale_until, response = entry
+            now = time.monotonic()
+            if now < fresh_until:
+                self.entries.move_to_end(cache_key)
+                metrics.increment(f'api_cache.{endpoint}.hits')
+                return response
+
+            if now < stale_until:
+                self.entries.move_to_end(cache_key)
+                metrics.increment(f'api_cache.{endpoint}.stale_hits')
+                self._request(cache_key, fetch, ttl, stale_ttl)
+                return response
+
+            del self.entries[cache_key]
+
+        metrics.increment(f'api_cache.{endpoint}.misses')
+        # shielded so a cancelled caller does not cancel the request everyone else is waiting on
+        return await shield(self._request(cache_key, fetch, ttl, stale_ttl))
+
+    def invalidate(self, endpoint: str = None, key: Hashable = None):
+        """removes the response of `key`, every response of `endpoint`, or every response if neither is given"""
+        if endpoint is None:
+            self.entries.clear()
+        elif key is not None:
+            self.entries.pop((endpoint, key), None)
+        else:
+            for cache_key in [cache_key for cache_key in self.entries if cache_key[0] == endpoint]:
+                del self.entries[cache_key]
+
+    def _request(self, cache_key: CacheKey, fetch: Callable[[], Awaitable[Any]], ttl: float,
+                 stale_ttl: float) -> Future:
+        request = self._requests.get(cache_key)
+        if request is None:
+            request = self._requests[cache_key] = ensure_future(self._fetch(cache_key, fetch, ttl, stale_ttl))
+            request.add_done_callback(self._request_done)
+        return request
+
+    async def _fetch(self, cache_key: CacheKey, fetch: Callable[[], Awaitable[Any]], ttl: float,
+                     stale_ttl: float) -> Any:
+        try:
+            response = await fetch()
+        finally:
+            self._requests.pop(cache_key, None)
+
+        now = time.monotonic()
+        self.entries[cache_key] = now + ttl, now + ttl + stale_ttl, response
+        self.entries.move_to_end(cache_key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return response
+
+    @staticmethod
+    def _request_done(request: Task):
+        # retrieves the error, background refreshes have nobody awaiting them to do it
+        if not request.cancelled() and request.exception() is not None:
+            metrics.increment('api_cache.request_failures')
@@ -1,40 +1,140 @@
+import time
 from datetime import datetime
-from typing import Dict, Tuple
-
-from aiohttp import ClientSession, ClientResponse
-from async_timeout import timeout
-
-from ..config import get_client_id, get_oauth
-from ..data import UserFollowers, UserInfo, RateLimit
+from functools import partial
+from typing import AsyncIterator, Dict, Iterable, List, Tuple
+from urllib.parse import urlencode
+
+from aiohttp import ClientResponse
+
+from ..config import cfg, get_client_id, get_oauth
+from ..data import Follower, FollowerList, UserFollowers, UserInfo
+from ..enums import RequestPriority
+from ..exceptions import BadTwitchAPIResponse
+from ..metrics import metrics
+from .helix_scheduler import helix_scheduler
+from .http_util import get_http_session
+from .response_cache import ResponseCache
+from .user_resolver import UserResolver, is_valid_login
 
 __all__ = ('CHANNEL_CHATTERS_URL', 'get_channel_chatters', 'get_stream_data', 'get_url', 'get_user_data', 'get_user_id',
            'STREAM_API_URL', 'USER_API_URL', 'get_user_followers', 'USER_FOLLOWERS_API_URL', 'get_headers',
-           'get_user_info', 'get_user_creation_date', 'USER_ACCOUNT_AGE_API')
+           'get_user_info', 'get_user_creation_date', 'USER_ACCOUNT_AGE_API', 'STREAMS_API_URL',
+           'STREAMS_API_MAX_LOGINS', 'get_streams_data', 'USERS_API_URL', 'get_users_data', 'user_resolver',
+           'api_cache', 'HELIX_API_URL', 'iter_user_followers', 'get_all_user_followers',
+           'USER_FOLLOWERS_PAGE_SIZE', 'set_api_base_urls', 'TWITCH_API_BASE_URL', 'TMI_API_BASE_URL',
+           'EMOTE_API_BASE_URL', 'get_api_base_urls', 'GLOBAL_EMOTE_API_URL')
+
+# the hosts the api helpers send requests to, the config's twitch_api_url / tmi_api_url / emote_api_url
+# can point them somewhere else, ex: a local stand-in server, see set_api_base_urls()
+TWITCH_API_BASE_URL = 'https://api.twitch.tv'
+TMI_API_BASE_URL = 'https://tmi.twitch.tv'
+EMOTE_API_BASE_URL = 'https://api.twitchemotes.com/api/v4'
+# the most user_login parameters helix accepts in one streams request
+STREAMS_API_MAX_LOGINS = 100
+# the most followers helix returns in one page
+USER_FOLLOWERS_PAGE_SIZE = 100
+
+
+def set_api_base_urls(twitch: str = None, tmi: str = None, emotes: str = None):
+    """
+    points the api helpers at other hosts, hosts that are not given keep their current url,
+    ex: set_api_base_urls(twitch='http://127.0.0.1:8080') sends helix requests to http://127.0.0.1:8080/helix/...
+    """
+    global HELIX_API_URL, USER_API_URL, USERS_API_URL, STREAM_API_URL, STREAMS_API_URL, CHANNEL_CHATTERS_URL, \
+        USER_FOLLOWERS_API_URL, USER_ACCOUNT_AGE_API, GLOBAL_EMOTE_API_URL, _twitch_api_url, _tmi_api_url, \
+        _emote_api_url
+
+    _twitch_api_url = (twitch or _twitch_api_url).rstrip('/')
+    _tmi_api_url = (tmi or _tmi_api_url).rstrip('/')
+    _emote_api_url = (emotes or _emote_api_url).rstrip('/')
+
+    # requests to urls starting with this go through `helix_scheduler`, which keeps them within the ratelimit
+    HELIX_API_URL = f'{_twitch_api_url}/helix/'
+    USER_API_URL = f'{HELIX_API_URL}users?login={{}}'
+    USERS_API_URL = f'{HELIX_API_URL}users'
+    STREAM_API_URL = f'{HELIX_API_URL}streams?user_login={{}}'
+    STREAMS_API_URL = f'{HELIX_API_URL}streams'
+    USER_FOLLOWERS_API_URL = f'{HELIX_API_URL}users/follows?to_id={{}}'
+    USER_ACCOUNT_AGE_API = f'{_twitch_api_url}/kraken/users/{{}}'
+    CHANNEL_CHATTERS_URL = f'{_tmi_api_url}/group/user/{{}}/chatters'
+    GLOBAL_EMOTE_API_URL = f'{_emote_api_url}/channels/0'
+
+
+def get_api_base_urls() -> Dict[str, str]:
+    return {'twitch': _twitch_api_url, 'tmi': _tmi_api_url, 'emotes': _emote_api_url}
+
+
+_twitch_api_url = cfg.twitch_api_url or TWITCH_API_BASE_URL
+_tmi_api_url = cfg.tmi_api_url or TMI_API_BASE_URL
+_emote_api_url = cfg.emote_api_url or EMOTE_API_BASE_URL
+set_api_base_urls()
+
+
+async def get_url(url: str, headers: dict = None,
+                  priority: RequestPriority = RequestPriority.NORMAL) -> Tuple[ClientResponse, dict]:
+    """
+    requests the url using the shared http session (see get_http_session()), returns the response and its json
+
+    helix requests wait in `helix_scheduler` by `priority` while the ratelimit budget is low,
+    a helix request that is ratelimited anyway is retried once after the bucket resets
+    """
+    headers = headers or get_headers()
+    if not url.startswith(HELIX_API_URL):
+        return await _request_url(url, headers)
+
+    resp, json = await _request_helix_url(url, headers, priority)
+    if resp.status == 429:
+        metrics.increment('helix.ratelimited_requests')
+        resp, json = await _request_helix_url(url, headers, priority)
+    return resp, json
+
+
+async def _request_helix_url(url: str, headers: dict, priority: RequestPriority) -> Tuple[ClientResponse, dict]:
+    await helix_scheduler.acquire(priority)
+    resp = None
+    try:
+        resp, json = await _request_url(url, headers)
+    finally:
+        helix_scheduler.release(resp.headers if resp is not None else None)
+    return resp, json
 
-USER_API_URL = 'https://api.twitch.tv/helix/users?login={}'
-STREAM_API_URL = 'https://api.twitch.tv/helix/streams?user_login={}'
-CHANNEL_CHATTERS_URL = 'https://tmi.twitch.tv/group/user/{}/chatters'
-USER_FOLLOWERS_API_URL = 'https://api.twitch.tv/helix/users/follows?to_id={}'
-USER_ACCOUNT_AGE_API = 'https://api.twitch.tv/kraken/users/{}'
 
-user_id_cache: Dict[str, int] = {}
+async def _request_url(url: str, headers: dict) -> Tuple[ClientResponse, dict]:
+    start = time.perf_counter()
+    async with get_http_session().get(url, headers=headers) as resp:
+        json = await resp.json()
 
+    metrics.increment('http.requests')
+    metrics.observe('http.request_seconds', time.perf_counter() - start)
+    return resp, json
 
-async def get_url(url: str, headers: dict = None) -> Tuple[ClientResponse, dict]:
+
+async def get_users_data(logins: Iterable[str], headers: dict = None) -> Dict[str, dict]:
+    """
+    requests the data of up to 100 users at once, returns login -> user data for the users that exist,
+    raises BadTwitchAPIResponse if twitch responds with a error (ex: a invalid client id)
+    """
     headers = headers or get_headers()
-    async with ClientSession(headers=headers) as session:
-        async with timeout(10):
-            async with session.get(url) as resp:
-                return resp, await resp.json()
+    _, json = await get_url(f'{USERS_API_URL}?{urlencode([("login", login) for login in logins])}', headers)
+
+    if 'error' in json:
+        raise BadTwitchAPIResponse(USERS_API_URL, f'{json.get("status")} {json["error"]}: {json.get("message")}')
+
+    return {user['login'].lower(): user for user in json.get('data') or ()}
+
+
+# user lookups go through this, so looking up many users at once (ex: for shoutouts) takes a few requests
+user_resolver = UserResolver(get_users_data)
+# responses of the other endpoints are cached here, so a command spammed in chat makes one request
+api_cache = ResponseCache()
 
 
 async def get_user_info(user: str) -> UserInfo:
-    _, json = await get_url(USER_API_URL.format(user), get_headers())
+    data = await get_user_data(user)
 
-    if 'error' in json or not json.get('data', None):
+    if not data:
         return UserInfo(-1, '', '', '', '', '', '', '', -1)
 
-    data = json['data'][0]
     return UserInfo(
         id=int(data['id']),
         login=data['login'],
@@ -49,60 +149,135 @@ async def get_user_info(user: str) -> UserInfo:
 
 
 async def get_user_creation_date(user: str) -> datetime:
-    _, json = await get_url(USER_ACCOUNT_AGE_API.format(user), get_headers(use_kraken=True))
+    data = await get_user_data(user)
 
-    if 'created_at' not in json:
-        return datetime.min()
+    if 'created_at' not in data:
+        return datetime.min
     #                                            2012-09-03T01:30:56Z
-    return datetime.strptime(json['created_at'], '%Y-%m-%dT%H:%M:%SZ')
+    return datetime.strptime(data['created_at'], '%Y-%m-%dT%H:%M:%SZ')
 
 
 async def get_user_followers(user: str, headers: dict = None) -> UserFollowers:
+    """returns the user's followers, cached for a minute (see API_CACHE_TTLS)"""
+    try:
+        return await api_cache.get('followers', user.lower(), partial(_request_user_followers, user, headers))
+    # covers invalid user id, or some other API error, such as invalid client-id
+    except BadTwitchAPIResponse:
+        return UserFollowers(-1, '', -1, '', -1, [])
+
+
+async def _request_user_followers(user: str, headers: dict = None) -> UserFollowers:
     headers = headers or get_headers()
     user_id = await get_user_id(user, headers)
-    _, json = await get_url(USER_FOLLOWERS_API_URL.format(user_id), get_headers())
-    ratelimit = RateLimit.from_headers(_.headers)
+    _, json = await get_url(USER_FOLLOWERS_API_URL.format(user_id), headers, RequestPriority.LOW)
 
-    # covers invalid user id, or some other API error, such as invalid client-id
-    if not json or json.get('status', -1) == 400:
-        return UserFollowers(-1, '', -1, '', -1, [])
+    if not json or 'error' in json:
+        raise BadTwitchAPIResponse(USER_FOLLOWERS_API_URL, f'failed to get the followers of {user}: {json}')
 
     return UserFollowers(follower_count=json['total'],
                          following=user,
                          following_id=user_id,
                          name=user,
-                         id=user_id_cache[user],
+                         id=user_id,
                          followers=json['data'])
 
 
-async def get_user_data(user: str, headers: dict = None) -> dict:
+async def _iter_follower_pages(user_id: int, headers: dict = None) -> AsyncIterator[List[dict]]:
+    """yields the pages of the user's followers, following the pagination cursor until the last page"""
+    cursor = None
+    while True:
+        url = f'{USER_FOLLOWERS_API_URL.format(user_id)}&first={USER_FOLLOWERS_PAGE_SIZE}'
+        # pages are low priority, walking a large channel's followers waits for the ratelimit instead of using it up
+        _, json = await get_url(f'{url}&after={cursor}' if cursor else url, headers, RequestPriority.LOW)
+
+        if not json or 'error' in json:
+            raise BadTwitchAPIResponse(USER_FOLLOWERS_API_URL, f'failed to get the followers of {user_id}: {json}')
+
+        page = json.get('data') or []
+        if page:
+            yield page
+
+        cursor = (json.get('pagination') or {}).get('cursor')
+        if not page or not cursor:
+            return
+
+
+async def iter_user_followers(user: str, headers: dict = None) -> AsyncIterator[Follower]:
+    """
+    yields every follower of the user, a page at a time,
+    raises BadTwitchAPIResponse if the user does not exist or twitch responds with a error
+    """
     headers = headers or get_headers()
-    _, json = await get_url(USER_API_URL.format(user), headers)
+    user_id = int(await get_user_id(user, headers))
+    if user_id == -1:
+        raise BadTwitchAPIResponse(USER_FOLLOWERS_API_URL, f'failed to get the followers of {user}: user does not exist')
+    async for page in _iter_follower_pages(user_id, headers):
+        for json in page:
+            if 'from_id' in json and 'from_name' in json:
+                yield Follower(following_id=user_id, following=user, id=int(json['from_id']), name=json['from_name'])
 
-    if not json.get('data'):
-        return {}
 
-    return json['data'][0]
+async def get_all_user_followers(user: str, headers: dict = None) -> FollowerList:
+    """
+    returns every follower of the user (get_user_followers() only returns the first page), cached for 10 minutes,
+    raises BadTwitchAPIResponse if the user does not exist or twitch responds with a error
+    """
+    return await api_cache.get('all_followers', user.lower(), partial(_request_all_user_followers, user, headers))
 
 
-async def get_user_id(user: str, headers: dict = None) -> int:
+async def _request_all_user_followers(user: str, headers: dict = None) -> FollowerList:
     headers = headers or get_headers()
-    # shortcut if the this user's id was already requested
-    if user in user_id_cache:
-        return user_id_cache[user]
+    user_id = int(await get_user_id(user, headers))
+    if user_id == -1:
+        raise BadTwitchAPIResponse(USER_FOLLOWERS_API_URL, f'failed to get the followers of {user}: user does not exist')
+    followers = FollowerList(user, user_id)
+    # pages go straight into the columns, no Follower is created per follower
+    async for page in _iter_follower_pages(user_id, headers):
+        followers.extend(page)
+    return followers
+
+
+async def get_user_data(user: str, headers: dict = None) -> dict:
+    """
+    returns the user's helix data, or {} if the user does not exist (or twitch responded with a error),
+    users are looked up through `user_resolver`, which requests them with the default headers,
+    users looked up with other headers are requested on their own with those headers
+    """
+    try:
+        if headers is None or headers == get_headers():
+            return await user_resolver.get(user) or {}
+
+        login = user.lower()
+        if not is_valid_login(login):
+            return {}
+        return (await get_users_data([login], headers)).get(login, {})
+    except BadTwitchAPIResponse:
+        return {}
+
 
+async def get_user_id(user: str, headers: dict = None) -> int:
     data = await get_user_data(user, headers)
 
     if not data:
         return -1
 
-    user_id_cache[user] = data['id']
     return data['id']
 
 
 async def get_stream_data(user_id: str, headers: dict = None) -> dict:
+    """returns the user's stream, or {} if they are offline, cached for 30 seconds (see API_CACHE_TTLS)"""
+    try:
+        return await api_cache.get('stream', user_id.lower(), partial(_request_stream_data, user_id, headers))
+    except BadTwitchAPIResponse:
+        return {}
+
+
+async def _request_stream_data(user_id: str, headers: dict = None) -> dict:
     headers = headers or get_headers()
-    _, json = await get_url(STREAM_API_URL.format(user_id), headers)
+    _, json = await get_url(STREAM_API_URL.format(user_id), headers, RequestPriority.HIGH)
+
+    if 'error' in json:
+        raise BadTwitchAPIResponse(STREAM_API_URL, f'{json.get("status")} {json["error"]}: {json.get("message")}')
 
     if not json.get('data'):
         return {}
@@ -110,6 +285,26 @@ async def get_stream_data(user_id: str, headers: dict = None) -> dict:
     return json['data'][0]
 
 
+async def get_streams_data(logins: Iterable[str], headers: dict = None) -> Dict[str, dict]:
+    """
+    requests the streams of up to `STREAMS_API_MAX_LOGINS` channels at once,
+    returns login -> stream data for the channels that are live, channels that are offline are left out,
+    raises BadTwitchAPIResponse if twitch responds with a error
+    """
+    logins = [login.lower() for login in logins]
+    assert len(logins) <= STREAMS_API_MAX_LOGINS, f'at most {STREAMS_API_MAX_LOGINS} logins can be requested at once'
+
+    headers = headers or get_headers()
+    query = urlencode([('first', STREAMS_API_MAX_LOGINS), *(('user_login', login) for login in logins)])
+    _, json = await get_url(f'{STREAMS_API_URL}?{query}', headers, RequestPriority.HIGH)
+
+    # a error must not be mistaken for every channel in the batch being offline
+    if 'error' in json:
+        raise BadTwitchAPIResponse(STREAMS_API_URL, f'{json.get("status")} {json["error"]}: {json.get("message")}')
+
+    return {(stream.get('user_login') or stream['user_name']).lower(): stream for stream in json.get('data') or ()}
+
+
 async def get_channel_chatters(channel: str) -> dict:
     _, data = await get_url(CHANNEL_CHATTERS_URL.format(channel))
     return data
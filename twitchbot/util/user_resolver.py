@@ -0,0 +1,153 @@
+import re
+import time
+from asyncio import Future, Task, ensure_future, gather, get_event_loop, shield, sleep
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..metrics import metrics
+
+__all__ = ('UserResolver', 'USER_CACHE_TTL', 'USER_NEGATIVE_CACHE_TTL', 'USER_CACHE_MAX_SIZE', 'USER_BATCH_WINDOW',
+           'USER_BATCH_SIZE', 'is_valid_login')
+
+# seconds a user's data is cached
+USER_CACHE_TTL = 3600
+# seconds a user that does not exist is remembered as not existing
+USER_NEGATIVE_CACHE_TTL = 300
+# the least recently used users are removed once this many are cached
+USER_CACHE_MAX_SIZE = 10000
+# seconds lookups are collected for before they are requested together
+USER_BATCH_WINDOW = .05
+# the most logins helix accepts in one users request
+USER_BATCH_SIZE = 100
+# a twitch login, helix answers a users request containing any other login with a 400 for the whole request
+RE_LOGIN = re.compile(r'[a-z0-9_]{1,25}')
+
+# (expires at, user data or None if the user does not exist)
+CacheEntry = Tuple[float, Optional[dict]]
+FetchUsers = Callable[[List[str]], Awaitable[Dict[str, dict]]]
+
+
+class UserResolver:
+    """
+    looks up users by login, lookups made within `batch_window` seconds of each other are requested together,
+    `batch_size` logins per request, users are cached for `ttl` seconds, users that do not exist for `negative_ttl`
+
+    `fetch` requests a list of logins and returns login -> user data for the users that exist,
+    if it raises, the lookups waiting on it raise the same error and nothing is cached,
+    invalid logins (see `is_valid_login`) are never requested and are cached as not existing
+    """
+
+    def __init__(self, fetch: FetchUsers, ttl: float = USER_CACHE_TTL, negative_ttl: float = USER_NEGATIVE_CACHE_TTL,
+                 max_size: int = USER_CACHE_MAX_SIZE, batch_window: float = USER_BATCH_WINDOW,
+                 batch_size: int = USER_BATCH_SIZE):
+        self.fetch: FetchUsers = fetch
+        self.ttl: float = ttl
+        self.negative_ttl: float = negative_ttl
+        self.max_size: int = max(1, max_size)
+        self.batch_window: float = batch_window
+        self.batch_size: int = max(1, batch_size)
+        # ordered from least to most recently used
+        self.cache: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._queue: List[str] = []
+        self._flush_task: Optional[Task] = None
+
+    async def get(self, login: str) -> Optional[dict]:
+        """returns the user's data, or None if the user does not exist"""
+        return (await self.get_many((login,)))[login.lower()]
+
+    async def get_many(self, logins: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """returns login -> user data (None for users that do not exist) for every login"""
+        results: Dict[str, Optional[dict]] = {}
+        waiting: Dict[str, Future] = {}
+
+        # deduplicated in the order given, so batches are requested in a predictable order
+        for login in dict.fromkeys(login.lower() for login in logins):
+            hit, data = self._cached(login)
+            if hit:
+                results[login] = data
+                continue
+
+            if not is_valid_login(login):
+                # kept out of the batch so it does not make the request fail for every other user in it
+                self._store(login, None)
+                results[login] = None
+                metrics.increment('users.invalid_logins')
+                continue
+
+            future = self._pending.get(login)
+            if future is None:
+                future = self._pending[login] = get_event_loop().create_future()
+                self._queue.append(login)
+            waiting[login] = future
+
+        metrics.increment('users.cache_hits', len(results))
+        metrics.increment('users.cache_misses', len(waiting))
+
+        if waiting:
+            self._schedule_flush()
+            # shielded so a cancelled lookup does not cancel the lookup of everyone else waiting on the same user
+            results.update(zip(waiting, await gather(*map(shield, waiting.values()))))
+
+        return results
+
+    def invalidate(self, login: str = None):
+        """removes the user (or everyone if None) from the cache"""
+        if login is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(login.lower(), None)
+
+    def _cached(self, login: str) -> Tuple[bool, Optional[dict]]:
+        entry = self.cache.get(login)
+        if entry is None:
+            return False, None
+
+        expires_at, data = entry
+        if expires_at <= time.monotonic():
+            del self.cache[login]
+            return False, None
+
+        self.cache.move_to_end(login)
+        return True, data
+
+    def _store(self, login: str, data: Optional[dict]):
+        ttl = self.ttl if data is not None else self.negative_ttl
+        self.cache[login] = time.monotonic() + ttl, data
+        self.cache.move_to_end(login)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = ensure_future(self._flush_after_window())
+
+    async def _flush_after_window(self):
+        await sleep(self.batch_window)
+        # lookups made while this batch is being requested start the next batch
+        queue, self._queue, self._flush_task = self._queue, [], None
+        await gather(*(self._fetch_batch(queue[i:i + self.batch_size])
+                       for i in range(0, len(queue), self.batch_size)))
+
+    async def _fetch_batch(self, logins: List[str]):
+        metrics.increment('users.requests')
+        try:
+            found = await self.fetch(logins)
+        except Exception as e:
+            for login in logins:
+                future = self._pending.pop(login, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for login in logins:
+            data = found.get(login)
+            self._store(login, data)
+            future = self._pending.pop(login, None)
+            if future is not None and not future.done():
+                future.set_result(data)
+
+
+def is_valid_login(login: str) -> bool:
+    """returns if the login can be a twitch login (1 to 25 lowercase letters, digits or underscores)"""
+    return RE_LOGIN.fullmatch(login) is not None
@@ -0,0 +1,37 @@
+"""
+exports a table to a .jsonl or .csv file, or imports one, without starting the bot
+
+usage:
+    python bulk_data.py export <table> <file> [--channel CHANNEL]
+    python bulk_data.py import <table> <file> [--channel CHANNEL] [--replace] [--new-ids]
+
+<table> is one of: balances, quotes, commands
+the format is picked from the file's extension, rows are streamed so files of any size can be used,
+stop the bot before importing, it keeps balances in memory and would not see the imported ones
+"""
+import argparse
+import time
+
+from twitchbot import EXPORT_TABLES, init_tables, export_to_file, import_from_file
+
+parser = argparse.ArgumentParser(description='exports or imports balances, quotes and custom commands')
+parser.add_argument('action', choices=('export', 'import'))
+parser.add_argument('table', choices=tuple(EXPORT_TABLES))
+parser.add_argument('file')
+parser.add_argument('--channel', help='only export this channel / import every row into this channel')
+parser.add_argument('--replace', action='store_true', help="delete a channel's existing rows before importing")
+parser.add_argument('--new-ids', action='store_true', help='give imported quotes new ids')
+parser.add_argument('--chunk-size', type=int, default=1000, help='rows read or inserted at a time')
+args = parser.parse_args()
+
+init_tables()
+start = time.perf_counter()
+
+if args.action == 'export':
+    count = export_to_file(args.table, args.file, args.channel, chunk_size=args.chunk_size)
+else:
+    count = import_from_file(args.table, args.file, args.channel, batch_size=args.chunk_size,
+                             replace=args.replace, keep_ids=not args.new_ids)
+
+seconds = time.perf_counter() - start
+print(f'{args.action}ed {count} {args.table} row(s) in {seconds:.2f}s ({count / max(seconds, 1e-9):,.0f} rows/s)')
@@ -0,0 +1,29 @@
+"""
+copies the channels of a single file database into one database per channel (see `database_per_channel`)
+
+usage:
+    python split_database.py                            splits the database.sqlite in the current folder
+    python split_database.py <file.sqlite>              splits the sqlite database file
+    python split_database.py <file.sqlite> <channel>... only copies the listed channels
+
+the channel databases are written to the channel_databases folder, the source database is not changed,
+channels that already have a database get their rows replaced by the ones from the source
+"""
+import sys
+
+from sqlalchemy import create_engine
+
+from twitchbot import DB_FILENAME, DatabaseRouter, upgrade_database, split_database
+
+source = create_engine(f'sqlite:///{sys.argv[1] if len(sys.argv) > 1 else DB_FILENAME}')
+channels = sys.argv[2:] or None
+
+# the rows are copied as they are on the latest schema version
+upgrade_database(source)
+
+router = DatabaseRouter(partitioned=True)
+copied = split_database(source, router, channels)
+
+for channel, rows in copied.items():
+    print(f'{channel}: copied {rows} row(s) to {router.database_file(channel)}')
+print(f'split {len(copied)} channel(s), set "database_per_channel" to true in config.json to use them')